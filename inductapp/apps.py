@@ -4,4 +4,6 @@ from django.apps import AppConfig
 class InductappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inductapp'
-    verbose_name = 'Kochi Metro Induction'
\ No newline at end of file
+    verbose_name = 'Kochi Metro Induction'
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,56 @@
+"""
+Fleet-wide certificate validity.
+
+Each train carries certificates_valid_until, the earliest expiry date among
+its certificates (null when none has one), refreshed by the Certificate
+signals on every save and delete. Fleet questions such as "which trains
+become unschedulable in the next 72 hours" are then a range scan of the
+train_cert_horizon_idx index rather than a pass over every certificate.
+
+A certificate is valid through its expiry date, so a train becomes
+unschedulable at the start of the day after certificates_valid_until.
+"""
+from datetime import timedelta
+
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Certificate, Train
+
+
+DEFAULT_WINDOW_HOURS = 72
+
+
+def refresh_horizons(train_ids):
+    """Recompute certificates_valid_until for the given trains in one UPDATE."""
+    train_ids = [pk for pk in set(train_ids) if pk is not None]
+    if not train_ids:
+        return
+    Train.objects.filter(pk__in=train_ids).update(certificates_valid_until=Subquery(
+        Certificate.objects.filter(train=OuterRef('pk'), expiry_date__isnull=False)
+        .order_by('expiry_date').values('expiry_date')[:1]
+    ))
+
+
+def window(hours=DEFAULT_WINDOW_HOURS, now=None):
+    """
+    Return (today, cutoff): a train lapses within hours of now if its
+    certificates_valid_until falls on or after today and before cutoff.
+    """
+    now = now or timezone.now()
+    return timezone.localdate(now), timezone.localdate(now + timedelta(hours=hours))
+
+
+def lapsing_within(hours=DEFAULT_WINDOW_HOURS, now=None):
+    """Trains that are schedulable now but whose certificates lapse within hours, soonest first."""
+    today, cutoff = window(hours, now)
+    return (
+        Train.objects.filter(certificates_valid_until__gte=today, certificates_valid_until__lt=cutoff)
+        .order_by('certificates_valid_until', 'id')
+    )
+
+
+def expired(today=None):
+    """Trains with an expired certificate, longest expired first."""
+    today = today or timezone.localdate()
+    return Train.objects.filter(certificates_valid_until__lt=today).order_by('certificates_valid_until', 'id')
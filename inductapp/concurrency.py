@@ -0,0 +1,111 @@
+"""
+Helpers for the async API views.
+
+Under ASGI these views run on the event loop, so nothing in them may block:
+ORM calls use the async queryset API, session loads go through
+sync_to_async, and file hashing, upload parsing and report encoding run
+on a shared worker thread pool (ASYNC_EXECUTOR_WORKERS). Django 4.2's
+csrf_exempt and condition decorators wrap views in sync functions, so
+async-aware equivalents live here.
+
+process_pool() builds the process pools for CPU-bound work (OCR, the fault
+sweep). Their callers are multi-threaded (the job worker, ASGI servers),
+so workers are spawned rather than forked: a fork copies whatever locks
+other threads held at that moment.
+"""
+import asyncio
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import wraps
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+_executor = None
+
+
+def executor():
+    """Return the shared worker pool for blocking and CPU-bound work."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'ASYNC_EXECUTOR_WORKERS', None),
+            thread_name_prefix='inductapp-async',
+        )
+    return _executor
+
+
+def process_pool(max_workers=None):
+    """Return a new process pool whose spawned workers set up Django first."""
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    )
+
+
+def _run_and_close(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Pool threads outlive the request; don't leave their connections open
+        connections.close_all()
+
+
+async def run_in_executor(func, *args, **kwargs):
+    """Run func on the worker pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), _run_and_close, func, args, kwargs)
+
+
+async def load_session(request):
+    """Load the session off the event loop; later reads and writes stay in memory."""
+    await sync_to_async(request.session.keys)()
+    return request.session
+
+
+def async_csrf_exempt(view):
+    """csrf_exempt for async views (Django 4.2's version hides the coroutine)."""
+    view.csrf_exempt = True
+    return view
+
+
+def async_condition(etag_func=None, last_modified_func=None):
+    """django.views.decorators.http.condition for async views; validators run in a thread."""
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag, last_modified = await sync_to_async(_validators)(
+                etag_func, last_modified_func, request, args, kwargs,
+            )
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+
+def _validators(etag_func, last_modified_func, request, args, kwargs):
+    etag = etag_func(request, *args, **kwargs) if etag_func else None
+    etag = quote_etag(etag) if etag is not None else None
+
+    last_modified = last_modified_func(request, *args, **kwargs) if last_modified_func else None
+    if last_modified:
+        if not timezone.is_aware(last_modified):
+            last_modified = timezone.make_aware(last_modified, datetime.timezone.utc)
+        last_modified = int(last_modified.timestamp())
+    return etag, last_modified
@@ -0,0 +1,141 @@
+"""
+Live fleet deltas over Server-Sent Events.
+
+Train changes are appended to the FleetEvent table in the same transaction
+as the change (by the Train signals, and explicitly by the bulk rank and
+import writes), so every process sees them. Each open page holds one
+/api/fleet/stream/ connection; the stream only queries the table when the
+fleet version counter has moved, and resumes from Last-Event-ID after a
+reconnect.
+"""
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from . import fleetcache
+from .models import FleetEvent
+
+
+# Compact keys sent to the browser
+DELTA_FIELDS = {
+    'train_number': 'n',
+    'status': 's',
+    'rank': 'r',
+    'current_mileage': 'm',
+    'cleaning_status': 'c',
+    'current_stabling_bay': 'b',
+    'status_notes': 't',
+}
+
+FETCH_LIMIT = 500
+HEARTBEAT_SECONDS = 15
+
+
+def publish_train(train):
+    """Record the current state of a saved train."""
+    data = {key: getattr(train, field) for field, key in DELTA_FIELDS.items()}
+    event = FleetEvent.objects.create(train_id=train.pk, kind='update', data=data)
+    # Prune occasionally rather than on every save
+    if event.pk % 100 == 0:
+        prune()
+
+
+def publish_delete(train_id):
+    """Record that a train was deleted."""
+    FleetEvent.objects.create(train_id=train_id, kind='delete')
+
+
+def publish_ranks(ranks_by_id):
+    """Record a batch of rank changes."""
+    FleetEvent.objects.bulk_create(
+        [FleetEvent(train_id=pk, kind='rank', data={'r': rank}) for pk, rank in ranks_by_id.items()],
+        batch_size=500,
+    )
+    prune()
+
+
+def publish_reload():
+    """Tell open pages that too much changed to patch row by row (e.g. an import)."""
+    FleetEvent.objects.create(kind='reload')
+
+
+def prune():
+    """Delete events older than FLEET_EVENT_RETENTION seconds (default one hour)."""
+    retention = getattr(settings, 'FLEET_EVENT_RETENTION', 3600)
+    return FleetEvent.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=retention)).delete()[0]
+
+
+def latest_id():
+    """Return the id of the newest event (0 if there is none)."""
+    return FleetEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def fetch(after):
+    """Return up to FETCH_LIMIT events newer than the given id."""
+    return list(FleetEvent.objects.filter(id__gt=after).order_by('id')[:FETCH_LIMIT])
+
+
+def format_event(event):
+    """Encode one event as an SSE message."""
+    payload = dict(event.data, id=event.train_id) if event.train_id else dict(event.data)
+    return f'id: {event.pk}\nevent: {event.kind}\ndata: {json.dumps(payload, separators=(",", ":"))}\n\n'
+
+
+def _stream_settings():
+    return (
+        getattr(settings, 'FLEET_STREAM_POLL', 1.0),
+        getattr(settings, 'FLEET_STREAM_MAX_AGE', 300),
+    )
+
+
+def stream(after):
+    """Yield SSE messages (blocking); used when served over WSGI."""
+    poll, max_age = _stream_settings()
+    started = last_beat = time.monotonic()
+    version = None
+    yield f'retry: {int(poll * 1000)}\n\n'
+
+    # Close after max_age so proxies and workers recycle; the browser reconnects
+    while time.monotonic() - started < max_age:
+        current = fleetcache.fleet_version()
+        if current != version:
+            version = current
+            events = fetch(after)
+            for event in events:
+                after = event.pk
+                yield format_event(event)
+            if len(events) == FETCH_LIMIT:
+                version = None  # more to send on the next pass
+        if time.monotonic() - last_beat > HEARTBEAT_SECONDS:
+            last_beat = time.monotonic()
+            yield ': keepalive\n\n'
+        time.sleep(poll)
+
+
+async def astream(after):
+    """Yield SSE messages without holding a thread; used when served over ASGI."""
+    poll, max_age = _stream_settings()
+    started = last_beat = time.monotonic()
+    version = None
+    yield f'retry: {int(poll * 1000)}\n\n'
+
+    while time.monotonic() - started < max_age:
+        current = await sync_to_async(fleetcache.fleet_version)()
+        if current != version:
+            version = current
+            sent = 0
+            async for event in FleetEvent.objects.filter(id__gt=after).order_by('id')[:FETCH_LIMIT]:
+                after = event.pk
+                sent += 1
+                yield format_event(event)
+            if sent == FETCH_LIMIT:
+                version = None  # more to send on the next pass
+        if time.monotonic() - last_beat > HEARTBEAT_SECONDS:
+            last_beat = time.monotonic()
+            yield ': keepalive\n\n'
+        await asyncio.sleep(poll)
@@ -0,0 +1,94 @@
+"""
+Fleet-versioned caching for the ranklist and train detail pages.
+
+A fleet version token lives in a cache shared by every process (the
+'fleet' alias, file-based by default) and is replaced after any committed
+change to trains, job cards or certificates: by the model signals for
+ordinary saves and deletes, and explicitly by the bulk paths that bypass
+signals. Ranklist pages and train detail contexts are cached in the
+per-process 'ranklist' alias (local memory, LRU beyond MAX_ENTRIES) under
+keys that include the version, so a bump makes every cached page unreachable at once and the
+stale entries age out.
+"""
+import hashlib
+import time
+import uuid
+
+from django.core.cache import InvalidCacheBackendError, caches
+from django.db import transaction
+
+
+VERSION_KEY = 'fleet:version'
+CHANGED_AT_KEY = 'fleet:changed_at'
+
+
+def _cache(alias):
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def fleet_version():
+    """Return the current fleet version (an opaque token; compare for equality only)."""
+    cache = _cache('fleet')
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _new_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def fleet_changed_at():
+    """Return when the fleet version was last bumped (a Unix timestamp), or None."""
+    return _cache('fleet').get(CHANGED_AT_KEY)
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def _bump(version):
+    # A fresh token rather than incr(): the file cache's incr is a read then a
+    # write, so two processes bumping at once could land on the same version
+    cache = _cache('fleet')
+    cache.set(VERSION_KEY, version, timeout=None)
+    cache.set(CHANGED_AT_KEY, time.time(), timeout=None)
+
+
+def bump_fleet_version():
+    """
+    Invalidate every fleet-derived cache once the current transaction commits.
+
+    Returns the version the fleet will have after the commit (unless another
+    bump follows it).
+    """
+    version = _new_version()
+    transaction.on_commit(lambda: _bump(version))
+    return version
+
+
+def ranklist_key(kind, version, sort_by, search, cursor):
+    """Cache key for one ranklist page ('rows' or 'html')."""
+    digest = hashlib.md5(f'{sort_by}\0{search}\0{cursor}'.encode()).hexdigest()
+    return f'ranklist:{kind}:{version}:{digest}'
+
+
+def get_ranklist(kind, version, sort_by, search, cursor):
+    """Return a cached ranklist page, or None."""
+    return _cache('ranklist').get(ranklist_key(kind, version, sort_by, search, cursor))
+
+
+def set_ranklist(kind, version, sort_by, search, cursor, value):
+    """Cache a ranklist page."""
+    _cache('ranklist').set(ranklist_key(kind, version, sort_by, search, cursor), value)
+
+
+def get_train_detail(version, train_id):
+    """Return the cached detail context of one train, or None."""
+    return _cache('ranklist').get(f'train:{version}:{train_id}')
+
+
+def set_train_detail(version, train_id, value):
+    """Cache the detail context of one train."""
+    _cache('ranklist').set(f'train:{version}:{train_id}', value)
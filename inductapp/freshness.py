@@ -0,0 +1,72 @@
+"""
+Validators for conditional GET (ETag / Last-Modified).
+
+Used with django.views.decorators.http.condition so that a client holding
+the current version of a page or report gets a 304 before the view runs.
+The ETag combines the fleet version token with the max timestamps and
+row counts of the fleet tables (which also catches writes made outside
+this application), plus whatever else the response depends on: query
+string, user and pending flash messages.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from . import fleetcache
+from .models import Certificate, JobCard, Train
+
+
+def fleet_state(request):
+    """Return the fleet version, latest change time and row counts (cached on the request)."""
+    if not hasattr(request, '_fleet_state'):
+        trains = Train.objects.aggregate(last=Max('updated_at'), count=Count('id'))
+        job_cards = JobCard.objects.aggregate(
+            created=Max('created_at'), completed=Max('completed_at'), count=Count('id'),
+        )
+        certificates = Certificate.objects.aggregate(last=Max('id'), count=Count('id'))
+
+        changed_at = fleetcache.fleet_changed_at()
+        stamps = [trains['last'], job_cards['created'], job_cards['completed']]
+        if changed_at:
+            stamps.append(datetime.fromtimestamp(changed_at, tz=dt_timezone.utc))
+
+        request._fleet_state = {
+            'version': fleetcache.fleet_version(),
+            'last_modified': max((stamp for stamp in stamps if stamp), default=None),
+            'counts': (trains['count'], job_cards['count'], certificates['count'], certificates['last']),
+        }
+    return request._fleet_state
+
+
+def _etag(request, *parts):
+    state = fleet_state(request)
+    session = request.session
+    pending = len(messages.get_messages(request))
+    key = '|'.join(str(part) for part in (
+        *parts, state['version'], state['last_modified'], state['counts'],
+        session.get('username', ''), session.get('user_role', ''), pending,
+    ))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def last_modified(request, *args, **kwargs):
+    """Last-Modified for any page derived from the fleet tables."""
+    return fleet_state(request)['last_modified']
+
+
+def ranklist_etag(request):
+    """ETag for a ranklist page (sort, search and cursor come from the query string)."""
+    return _etag(request, 'ranklist', request.GET.urlencode(), timezone.localdate())
+
+
+def train_detail_etag(request, train_id):
+    """ETag for one train's detail page (certificate expiry is shown relative to today)."""
+    return _etag(request, 'train', train_id, timezone.localdate())
+
+
+def report_etag(request):
+    """ETag for a report download; the file name carries the date."""
+    return _etag(request, 'report', request.GET.urlencode(), timezone.localdate())
@@ -0,0 +1,153 @@
+"""
+Append-only train history and time-travel roster queries.
+
+Every change to a train appends a TrainDelta holding only the fields that
+changed: one row per save (the Train signals compare against the values
+the instance was loaded with) and one bulk insert per rank update or
+import batch. Whenever HISTORY_SNAPSHOT_INTERVAL more deltas have been
+written, the latest snapshot plus those deltas is folded into a new
+compact HistorySnapshot. Rebuilding the fleet at a moment therefore starts
+from the nearest earlier snapshot and replays only the deltas after it.
+"""
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import HistorySnapshot, TrainDelta
+
+
+# Must stay in step with the first snapshot written by migration 0009
+HISTORY_FIELDS = (
+    'train_number', 'train_name', 'status', 'rank', 'current_mileage',
+    'last_service_date', 'cleaning_status', 'current_stabling_bay', 'status_notes',
+)
+
+
+def json_value(value):
+    """Convert a field value to the form stored in the history."""
+    # The only date-like history field is a DateField
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    if hasattr(value, 'item'):  # NumPy scalars from the importer
+        return value.item()
+    return value
+
+
+def record_train(train, created=False, update_fields=None):
+    """Append a delta with the fields a save of this train changed."""
+    fields = HISTORY_FIELDS if update_fields is None else [f for f in HISTORY_FIELDS if f in update_fields]
+    deferred = train.get_deferred_fields()
+    changes = {field: json_value(getattr(train, field)) for field in fields if field not in deferred}
+
+    loaded = getattr(train, '_loaded_values', None)
+    if loaded is not None and not created:
+        changes = {
+            field: value for field, value in changes.items()
+            if field not in loaded or json_value(loaded[field]) != value
+        }
+    # A later save of the same instance compares against this one
+    train._loaded_values = {**(loaded or {}), **changes}
+
+    if changes or created:
+        _append([TrainDelta(train_id=train.pk, changes=changes)])
+
+
+def record_deleted(train_id):
+    """Append a delta marking a train as deleted."""
+    _append([TrainDelta(train_id=train_id, deleted=True)])
+
+
+def record_changes(changes_by_id):
+    """Append one delta per train for a bulk write: {train id: {field: new value}}."""
+    _append([
+        TrainDelta(train_id=pk, changes={field: json_value(value) for field, value in changes.items()})
+        for pk, changes in changes_by_id.items() if changes
+    ])
+
+
+def _append(deltas):
+    if not deltas:
+        return
+    now = timezone.now()
+    for delta in deltas:
+        delta.recorded_at = now
+    TrainDelta.objects.bulk_create(deltas, batch_size=500)
+
+    # Snapshot whenever this write crossed a multiple of the interval
+    interval = getattr(settings, 'HISTORY_SNAPSHOT_INTERVAL', 1000)
+    first, last = deltas[0].pk, deltas[-1].pk
+    if first is not None and (first - 1) // interval != last // interval:
+        transaction.on_commit(take_snapshot)
+
+
+def _base(when):
+    snapshot = (
+        HistorySnapshot.objects.filter(taken_at__lte=when)
+        .order_by('-taken_at', '-last_delta_id').first()
+    )
+    if snapshot is None:
+        first = HistorySnapshot.objects.order_by('taken_at').values_list('taken_at', flat=True).first()
+        raise ValueError(f'History starts at {first.isoformat()}' if first else 'No history has been recorded')
+    return snapshot
+
+
+def replay(when):
+    """
+    Rebuild the fleet as it was at a moment.
+
+    Returns (state, snapshot, applied, last delta id): state maps train id
+    to its field values, snapshot is the base the deltas were applied to.
+    """
+    snapshot = _base(when)
+    fields = snapshot.state['fields']
+    state = {row[0]: dict(zip(fields, row[1:])) for row in snapshot.state['rows']}
+
+    deltas = (
+        TrainDelta.objects.filter(id__gt=snapshot.last_delta_id, recorded_at__lte=when)
+        .order_by('id').values_list('id', 'train_id', 'changes', 'deleted')
+    )
+    applied, last_id = 0, snapshot.last_delta_id
+    for last_id, train_id, changes, deleted in deltas.iterator(chunk_size=2000):
+        if deleted:
+            state.pop(train_id, None)
+        else:
+            state.setdefault(train_id, {}).update(changes)
+        applied += 1
+    return state, snapshot, applied, last_id
+
+
+def take_snapshot(until=None):
+    """Fold the deltas since the latest snapshot into a new one; None if there were none."""
+    until = until or timezone.now()
+    state, base, applied, last_id = replay(until)
+    if not applied or HistorySnapshot.objects.filter(last_delta_id=last_id).exists():
+        return None
+
+    taken_at = TrainDelta.objects.filter(pk=last_id).values_list('recorded_at', flat=True).get()
+    return HistorySnapshot.objects.create(
+        taken_at=taken_at,
+        last_delta_id=last_id,
+        state={
+            'fields': list(HISTORY_FIELDS),
+            'rows': [[pk, *(values.get(field) for field in HISTORY_FIELDS)] for pk, values in sorted(state.items())],
+        },
+    )
+
+
+def roster_at(when):
+    """Return the fleet and its ranks as they were at a moment, best rank first."""
+    state, snapshot, applied, _ = replay(when)
+    trains = sorted(
+        ({'id': pk, **values} for pk, values in state.items()),
+        key=lambda train: (train.get('rank') if train.get('rank') is not None else 99, train.get('train_number') or ''),
+    )
+    return {
+        'at': when.isoformat(),
+        'snapshot_at': snapshot.taken_at.isoformat(),
+        'deltas_applied': applied,
+        'trains': trains,
+    }
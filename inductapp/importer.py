@@ -0,0 +1,332 @@
+"""
+Streaming import pipeline for train CSV/Excel uploads.
+
+Uploads are parsed in fixed-size chunks, each chunk is validated against the
+Train schema, and valid rows are staged to an on-disk CSV file. Only a small
+summary (token, counts, first-chunk preview) goes into the session, so memory
+and session size stay flat however many rows the file has.
+"""
+import os
+import re
+import uuid
+from itertools import islice
+
+import pandas as pd
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from . import events, history, mileage, search
+from .fleetcache import bump_fleet_version
+from .models import Train, STATUS_CHOICES
+
+
+CHUNK_SIZE = 5000
+IMPORT_BATCH_SIZE = 1000
+PREVIEW_ROWS = 10
+MAX_REPORTED_ERRORS = 10
+
+REQUIRED_COLUMNS = ('train_number', 'train_name')
+
+# Importable Train fields and their max lengths (None for unbounded text)
+IMPORT_FIELDS = {
+    'train_number': 20,
+    'train_name': 100,
+    'current_mileage': None,
+    'last_service_date': None,
+    'status': 20,
+    'status_notes': None,
+    'current_stabling_bay': 50,
+    'cleaning_status': 100,
+    'maintenance_notes': None,
+}
+
+VALID_STATUSES = {value for value, _ in STATUS_CHOICES}
+
+_TOKEN_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def get_staging_root():
+    """Return the directory staged imports are written to, creating it if needed."""
+    root = getattr(settings, 'IMPORT_STAGING_ROOT', settings.BASE_DIR / 'staging' / 'imports')
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def staged_path(token):
+    """Return the staging file path for a token, rejecting anything that is not one of ours."""
+    if not token or not _TOKEN_RE.match(token):
+        raise ValueError('Invalid import token')
+    return os.path.join(get_staging_root(), f'{token}.csv')
+
+
+def normalise_column(name):
+    """Map a header like ' Train Number ' to 'train_number'."""
+    return re.sub(r'\W+', '_', str(name).strip().lower()).strip('_')
+
+
+def iter_chunks(uploaded_file, chunksize=CHUNK_SIZE):
+    """Yield DataFrames of at most chunksize rows from a CSV or Excel upload."""
+    name = uploaded_file.name.lower()
+    if name.endswith('.csv'):
+        yield from pd.read_csv(uploaded_file, chunksize=chunksize, dtype=str, keep_default_na=False)
+    elif name.endswith('.xlsx'):
+        yield from _iter_xlsx_chunks(uploaded_file, chunksize)
+    elif name.endswith('.xls'):
+        # The legacy binary format cannot be read row by row
+        df = pd.read_excel(uploaded_file, dtype=str).fillna('')
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+    else:
+        raise ValueError('Please upload a CSV or Excel file')
+
+
+def _iter_xlsx_chunks(uploaded_file, chunksize):
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(cell) if cell is not None else '' for cell in header]
+        while True:
+            block = list(islice(rows, chunksize))
+            if not block:
+                break
+            yield pd.DataFrame(block, columns=columns).fillna('').astype(str)
+    finally:
+        workbook.close()
+
+
+def validate_chunk(chunk, first_row_number):
+    """
+    Validate one chunk against the Train schema.
+
+    Returns (valid_rows, rejected) where valid_rows is a DataFrame of the
+    importable columns and rejected is a list of (row_number, message).
+    Row numbers are 1-based spreadsheet rows, counting the header.
+    """
+    chunk = chunk.rename(columns=normalise_column)
+    missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise ValueError(f'Missing required column(s): {", ".join(missing)}')
+
+    chunk = chunk[[column for column in IMPORT_FIELDS if column in chunk.columns]].copy()
+    for column in chunk.columns:
+        chunk[column] = chunk[column].astype(str).str.strip()
+
+    errors = pd.Series('', index=chunk.index)
+
+    def flag(mask, message):
+        errors[mask] = errors[mask] + message + '; '
+
+    for column in REQUIRED_COLUMNS:
+        flag(chunk[column] == '', f'{column} is required')
+
+    for column, max_length in IMPORT_FIELDS.items():
+        if max_length and column in chunk.columns:
+            flag(chunk[column].str.len() > max_length, f'{column} longer than {max_length} characters')
+
+    if 'current_mileage' in chunk.columns:
+        mileage = pd.to_numeric(chunk['current_mileage'].replace('', '0'), errors='coerce')
+        flag(mileage.isna() | (mileage < 0), 'current_mileage must be a non-negative number')
+        chunk['current_mileage'] = mileage.fillna(0).astype(int)
+
+    if 'status' in chunk.columns:
+        chunk['status'] = chunk['status'].replace('', 'ok')
+        flag(~chunk['status'].isin(VALID_STATUSES), 'unknown status')
+
+    if 'last_service_date' in chunk.columns:
+        present = chunk['last_service_date'] != ''
+        parsed = pd.to_datetime(chunk['last_service_date'].where(present), errors='coerce')
+        flag(present & parsed.isna(), 'last_service_date is not a date')
+        chunk['last_service_date'] = parsed.dt.strftime('%Y-%m-%d').fillna('')
+
+    invalid = errors != ''
+    row_numbers = [first_row_number + position for position in range(len(chunk))]
+    rejected = [
+        (row_number, message.rstrip('; '))
+        for row_number, message, bad in zip(row_numbers, errors, invalid)
+        if bad
+    ]
+    return chunk[~invalid], rejected
+
+
+def stage_upload(uploaded_file, chunksize=CHUNK_SIZE, progress=None):
+    """
+    Parse, validate and stage an upload chunk by chunk.
+
+    Returns a JSON-serialisable summary: the staging token, row counts, the
+    staged columns, a preview taken from the first chunk and a sample of the
+    rejected rows. progress, if given, is called with the running row count
+    after each chunk.
+    """
+    token = uuid.uuid4().hex
+    path = staged_path(token)
+    summary = {
+        'token': token,
+        'file_name': uploaded_file.name,
+        'total_rows': 0,
+        'valid_rows': 0,
+        'rejected_rows': 0,
+        'columns': [],
+        'preview': [],
+        'errors': [],
+    }
+
+    try:
+        for chunk in iter_chunks(uploaded_file, chunksize):
+            first_row_number = summary['total_rows'] + 2
+            valid, rejected = validate_chunk(chunk, first_row_number)
+
+            if not summary['columns']:
+                summary['columns'] = list(valid.columns)
+                summary['preview'] = valid.head(PREVIEW_ROWS).to_dict('records')
+                valid.to_csv(path, index=False)
+            else:
+                valid.reindex(columns=summary['columns']).to_csv(path, mode='a', header=False, index=False)
+
+            summary['total_rows'] += len(chunk)
+            summary['valid_rows'] += len(valid)
+            summary['rejected_rows'] += len(rejected)
+            room = MAX_REPORTED_ERRORS - len(summary['errors'])
+            summary['errors'].extend(f'Row {row}: {message}' for row, message in rejected[:room])
+            if progress:
+                progress(summary['total_rows'])
+    except Exception:
+        discard_staged(token)
+        raise
+
+    return summary
+
+
+def iter_staged(token, chunksize=CHUNK_SIZE):
+    """Yield staged rows back as DataFrames of at most chunksize rows."""
+    path = staged_path(token)
+    if not os.path.exists(path):
+        return
+    yield from pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False)
+
+
+def discard_staged(token):
+    """Delete a staged import file if it exists."""
+    try:
+        os.remove(staged_path(token))
+    except (FileNotFoundError, ValueError):
+        pass
+
+
+def _row_to_fields(row):
+    fields = dict(row)
+    if 'current_mileage' in fields:
+        fields['current_mileage'] = int(fields['current_mileage'] or 0)
+    if 'last_service_date' in fields:
+        fields['last_service_date'] = fields['last_service_date'] or None
+    return fields
+
+
+def upsert_trains(token, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """
+    Insert or update Train rows from a staged import, keyed on train_number.
+
+    Each batch is written in its own transaction with one bulk statement;
+    a batch the database refuses is rolled back and counted as rejected.
+    Returns {'inserted': n, 'updated': n, 'duplicates': n, 'rejected': n},
+    where duplicates are rows overridden by a later row for the same train
+    in their batch and never written. progress, if given, is called with
+    the running row count after each batch.
+    """
+    counts = {'inserted': 0, 'updated': 0, 'duplicates': 0, 'rejected': 0}
+    for batch in iter_staged(token, chunksize=batch_size):
+        # Later rows for the same train supersede earlier ones in the batch
+        # (train numbers compare case-insensitively, as in the database)
+        deduped = batch[~batch['train_number'].str.upper().duplicated(keep='last')]
+        superseded = len(batch) - len(deduped)
+        records = [_row_to_fields(row) for row in deduped.to_dict('records')]
+
+        try:
+            with transaction.atomic():
+                inserted, updated = _write_batch(records, [c for c in deduped.columns if c != 'train_number'])
+                # Bulk writes send no signals
+                bump_fleet_version()
+                if search.NOTE_FIELDS & set(deduped.columns):
+                    search.index_trains(
+                        Train.objects.filter(train_number__in=deduped['train_number'].tolist())
+                        .only('status_notes', 'maintenance_notes')
+                    )
+        except DatabaseError:
+            counts['rejected'] += len(batch)
+        else:
+            counts['inserted'] += inserted
+            counts['updated'] += updated
+            counts['duplicates'] += superseded
+
+        if progress:
+            progress(sum(counts.values()))
+
+    if counts['inserted'] or counts['updated']:
+        events.publish_reload()
+    return counts
+
+
+def _write_batch(records, update_fields):
+    numbers = [record['train_number'] for record in records]
+    # Keyed by upper-cased number: train_number is a NOCASE column
+    previous = {
+        row['train_number'].upper(): row
+        for row in Train.objects.filter(train_number__in=numbers).values('id', *history.HISTORY_FIELDS)
+    }
+    existing = {number: row['id'] for number, row in previous.items()}
+
+    if connection.features.supports_update_conflicts_with_target:
+        Train.objects.bulk_create(
+            [Train(**record) for record in records],
+            update_conflicts=True,
+            unique_fields=['train_number'],
+            update_fields=[*update_fields, 'updated_at'],
+        )
+    else:
+        Train.objects.bulk_create([Train(**r) for r in records if r['train_number'].upper() not in existing])
+        to_update = [
+            Train(pk=existing[r['train_number'].upper()], **r) for r in records if r['train_number'].upper() in existing
+        ]
+        if to_update:
+            # bulk_update skips auto_now, so stamp updated_at explicitly
+            now = timezone.now()
+            for train in to_update:
+                train.updated_at = now
+            Train.objects.bulk_update(to_update, [*update_fields, 'updated_at'])
+
+    changes = _record_history(records, previous)
+    mileage.record_readings({
+        pk: fields['current_mileage'] for pk, fields in changes.items() if 'current_mileage' in fields
+    })
+    return len(records) - len(existing), len(existing)
+
+
+def _record_history(records, previous):
+    # Log what each row changed; new trains are logged in full, defaults included
+    changes = {}
+    for record in records:
+        before = previous.get(record['train_number'].upper())
+        if before is not None:
+            changes[before['id']] = {
+                field: value for field, value in record.items()
+                if field in history.HISTORY_FIELDS and history.json_value(value) != history.json_value(before[field])
+            }
+    created = [record['train_number'] for record in records if record['train_number'].upper() not in previous]
+    for row in Train.objects.filter(train_number__in=created).values('id', *history.HISTORY_FIELDS):
+        changes[row.pop('id')] = row
+    history.record_changes(changes)
+    return changes
+
+
+def save_raw_upload(uploaded_file):
+    """Copy an upload to the staging directory in chunks and return its path."""
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    path = os.path.join(get_staging_root(), f'{uuid.uuid4().hex}.upload{extension}')
+    with open(path, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+    return path
@@ -0,0 +1,281 @@
+"""
+Exact induction planner: assigns every train to revenue service, standby,
+the inspection bay line (IBL) or a hold in its stabling bay.
+
+The assignment is a min-cost flow from trains to four role nodes with role
+capacities (required service trains, standby places, and IBL places
+limited by both IBL bays and maintenance slots). Each train's cost for a
+role combines its ranking score, maintenance need, the shunt needed to
+reach the role's location and a small penalty for departing from the
+previous night's plan.
+
+The solver is cycle cancelling started from the previous night's plan
+(repaired to be feasible). Every residual cycle passes through role nodes
+only, so the residual graph contracts to the four roles plus the sink: the
+edge X -> Y costs the cheapest single move of a train from X to Y. With no
+negative cycle left in that five-node graph the plan is optimal. If the
+time budget runs out first, the best plan so far is returned and marked
+as not proven optimal.
+"""
+import re
+import time
+from datetime import timedelta
+from itertools import permutations
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import InductionPlan, Train
+from .ranking import compute_scores, load_fleet_frame
+
+
+ROLES = ('service', 'standby', 'ibl', 'hold')
+SERVICE, STANDBY, IBL, HOLD = range(len(ROLES))
+SINK = len(ROLES)
+
+# Relative cost terms; override with INDUCTION_PLAN_COSTS
+DEFAULT_COSTS = {
+    'service_reward': 10.0,   # filling a required service slot
+    'standby_reward': 5.0,    # filling a standby place
+    'ibl_reward': 6.0,        # per unit of maintenance need met on the IBL
+    'shunt': 0.5,             # moving between a stabling line and the IBL
+    'change': 0.1,            # departing from the previous night's plan
+}
+
+FORBIDDEN = 1e6
+
+IBL_BAY_RE = re.compile(r'maint|ibl|inspection', re.IGNORECASE)
+
+
+def get_costs(costs=None):
+    """Return the configured cost terms."""
+    merged = dict(DEFAULT_COSTS)
+    merged.update(getattr(settings, 'INDUCTION_PLAN_COSTS', {}))
+    merged.update(costs or {})
+    return merged
+
+
+def cost_matrix(frame, previous=None, costs=None):
+    """
+    Build the (trains, roles) cost matrix for a fleet frame.
+
+    frame needs the ranking columns plus 'current_stabling_bay'; previous
+    maps train id to last night's role. Assignments a train may not take
+    cost FORBIDDEN.
+    """
+    costs = get_costs(costs)
+    scores = compute_scores(frame)
+    score = scores['score'].to_numpy()
+
+    # Only trains without critical issues or lapsed certificates may run
+    expired = frame['cert_days_left'].to_numpy(dtype=float) < 0
+    runnable = (scores['tier'].to_numpy() < 2) & ~expired
+    need = np.clip(scores['maintenance'].to_numpy() + scores['certificates'].to_numpy(), 0.0, 1.0)
+
+    on_ibl = frame['current_stabling_bay'].fillna('').str.contains(IBL_BAY_RE).to_numpy()
+
+    matrix = np.zeros((len(frame), len(ROLES)))
+    matrix[:, SERVICE] = np.where(runnable, score - costs['service_reward'], FORBIDDEN)
+    matrix[:, STANDBY] = np.where(runnable, 0.5 * score - costs['standby_reward'], FORBIDDEN)
+    matrix[:, IBL] = -costs['ibl_reward'] * need
+
+    # Shunts: into the IBL from a stabling line, or out of the IBL to run
+    matrix[:, IBL] += np.where(on_ibl, 0.0, costs['shunt'])
+    matrix[:, SERVICE] += np.where(on_ibl, costs['shunt'], 0.0)
+    matrix[:, STANDBY] += np.where(on_ibl, costs['shunt'], 0.0)
+
+    if previous:
+        last = np.array([ROLES.index(previous.get(str(pk), 'hold')) for pk in frame['id']])
+        changed = np.arange(len(ROLES))[None, :] != last[:, None]
+        matrix += np.where(changed, costs['change'], 0.0)
+
+    return matrix
+
+
+def repair(assignment, matrix, capacity):
+    """Make a warm-start assignment feasible by moving offending trains to hold."""
+    assignment = assignment.copy()
+    rows = np.arange(len(assignment))
+    assignment[matrix[rows, assignment] >= FORBIDDEN] = HOLD
+
+    for role in (SERVICE, STANDBY, IBL):
+        members = np.flatnonzero(assignment == role)
+        if len(members) > capacity[role]:
+            # Keep the cheapest members, hold the rest
+            excess = members[np.argsort(matrix[members, role])[capacity[role]:]]
+            assignment[excess] = HOLD
+    return assignment
+
+
+def _best_moves(assignment, matrix):
+    # moves[x][y] = (cost change, train) of the cheapest single move from role x to y
+    moves = {}
+    for source in range(len(ROLES)):
+        members = np.flatnonzero(assignment == source)
+        if not len(members):
+            continue
+        deltas = matrix[members] - matrix[members, source][:, None]
+        for target in range(len(ROLES)):
+            if target == source:
+                continue
+            best = int(np.argmin(deltas[:, target]))
+            if matrix[members[best], target] < FORBIDDEN:
+                moves[source, target] = (float(deltas[best, target]), int(members[best]))
+    return moves
+
+
+def _cheapest_cycle(assignment, moves, capacity):
+    # Enumerate the simple cycles of the contracted residual graph (roles + sink)
+    counts = np.bincount(assignment, minlength=len(ROLES))
+    best_cost, best_cycle = -1e-9, None
+    for length in range(2, len(ROLES) + 2):
+        for cycle in permutations(range(len(ROLES) + 1), length):
+            if cycle[0] != min(cycle):
+                continue
+            cost, ok = 0.0, True
+            for here, there in zip(cycle, cycle[1:] + cycle[:1]):
+                if there == SINK:
+                    ok = counts[here] < capacity[here]
+                elif here == SINK:
+                    ok = counts[there] > 0
+                elif (here, there) in moves:
+                    cost += moves[here, there][0]
+                else:
+                    ok = False
+                if not ok:
+                    break
+            if ok and cost < best_cost:
+                best_cost, best_cycle = cost, cycle
+    return best_cycle
+
+
+def solve(matrix, capacity, start=None, time_budget=None):
+    """
+    Find the minimum-cost assignment of trains to roles.
+
+    capacity is the per-role limit (hold is unlimited). start is a warm
+    start assignment of role indices. Returns (assignment, optimal,
+    iterations).
+    """
+    time_budget = time_budget or getattr(settings, 'INDUCTION_SOLVER_TIME_BUDGET', 5.0)
+    deadline = time.perf_counter() + time_budget
+    capacity = list(capacity) + [len(matrix)]
+
+    if start is None:
+        start = np.full(len(matrix), HOLD)
+    assignment = repair(np.asarray(start), matrix, capacity)
+
+    iterations = 0
+    while time.perf_counter() < deadline:
+        moves = _best_moves(assignment, matrix)
+        cycle = _cheapest_cycle(assignment, moves, capacity)
+        if cycle is None:
+            return assignment, True, iterations
+
+        # Apply every move on the cycle at once; sink edges move no train
+        edges = [
+            (here, there) for here, there in zip(cycle, cycle[1:] + cycle[:1])
+            if SINK not in (here, there)
+        ]
+        assignment[[moves[edge][1] for edge in edges]] = [there for _, there in edges]
+        iterations += 1
+
+    return assignment, False, iterations
+
+
+def next_service_date():
+    """Tonight's plan is for tomorrow's service."""
+    return timezone.localdate() + timedelta(days=1)
+
+
+def load_plan_frame():
+    """Load the ranking frame plus each train's stabling bay."""
+    frame = load_fleet_frame()
+    bays = dict(Train.objects.order_by().values_list('id', 'current_stabling_bay'))
+    frame['current_stabling_bay'] = frame['id'].map(bays)
+    return frame
+
+
+def plan_induction(service_date=None, required=None, standby=None, ibl_bays=None,
+                   maintenance_slots=None, time_budget=None, save=True):
+    """
+    Solve and (optionally) store the induction plan for a service date.
+
+    Capacities default to the INDUCTION_SERVICE_TRAINS, INDUCTION_STANDBY_TRAINS,
+    INDUCTION_IBL_BAYS and INDUCTION_MAINTENANCE_SLOTS settings. The latest
+    earlier plan is used both as the warm start and for the change penalty.
+    """
+    started = time.perf_counter()
+    service_date = service_date or next_service_date()
+
+    frame = load_plan_frame()
+    required = required if required is not None else getattr(settings, 'INDUCTION_SERVICE_TRAINS', 18)
+    standby = standby if standby is not None else getattr(settings, 'INDUCTION_STANDBY_TRAINS', 4)
+    ibl_bays = ibl_bays if ibl_bays is not None else getattr(settings, 'INDUCTION_IBL_BAYS', 3)
+    slots = maintenance_slots if maintenance_slots is not None else getattr(settings, 'INDUCTION_MAINTENANCE_SLOTS', 3)
+    capacity = (required, standby, min(ibl_bays, slots))
+
+    previous_plan = (
+        InductionPlan.objects.filter(service_date__lt=service_date).order_by('-service_date').first()
+    )
+    previous = previous_plan.assignments if previous_plan else {}
+
+    matrix = cost_matrix(frame, previous)
+    start = np.array([ROLES.index(previous.get(str(pk), 'hold')) for pk in frame['id']], dtype=int)
+    assignment, optimal, iterations = solve(matrix, capacity, start=start, time_budget=time_budget)
+
+    rows = np.arange(len(assignment))
+    on_ibl = frame['current_stabling_bay'].fillna('').str.contains(IBL_BAY_RE).to_numpy()
+    shunts = int(np.sum(np.where(assignment == IBL, ~on_ibl, on_ibl & (assignment != HOLD))))
+    assignments = {str(pk): ROLES[role] for pk, role in zip(frame['id'], assignment)}
+
+    result = {
+        'service_date': service_date.isoformat(),
+        'roles': {
+            role: frame['train_number'][assignment == index].tolist()
+            for index, role in enumerate(ROLES)
+        },
+        'capacity': dict(zip(ROLES, capacity)),
+        'objective': round(float(matrix[rows, assignment].sum()), 4),
+        'optimal': optimal,
+        'iterations': iterations,
+        'shunting_moves': shunts,
+        'changed_from_previous': sum(
+            1 for pk, role in assignments.items() if previous and previous.get(pk, 'hold') != role
+        ),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+    if save:
+        InductionPlan.objects.update_or_create(
+            service_date=service_date,
+            defaults={
+                'assignments': assignments,
+                'objective': result['objective'],
+                'optimal': optimal,
+                'shunting_moves': shunts,
+            },
+        )
+    return result
+
+
+def stored_plan(service_date):
+    """Return a saved plan in the same shape as plan_induction(), or None."""
+    plan = InductionPlan.objects.filter(service_date=service_date).first()
+    if plan is None:
+        return None
+
+    numbers = dict(Train.objects.filter(pk__in=plan.assignments).values_list('id', 'train_number'))
+    roles = {role: [] for role in ROLES}
+    for pk, role in plan.assignments.items():
+        if int(pk) in numbers:
+            roles[role].append(numbers[int(pk)])
+    return {
+        'service_date': plan.service_date.isoformat(),
+        'roles': {role: sorted(trains) for role, trains in roles.items()},
+        'objective': plan.objective,
+        'optimal': plan.optimal,
+        'shunting_moves': plan.shunting_moves,
+        'updated_at': plan.updated_at.isoformat(),
+    }
@@ -0,0 +1,332 @@
+"""
+Structured fleet queries for the chat.
+
+parse() recognises the questions that are really fleet queries
+("certificates expiring this week", "top 5 by mileage", "pending critical
+job cards") and turns them into an Intent. Parsing is cached per normalised
+message; relative periods stay symbolic ("week") and are resolved when the
+intent runs, so a cached intent never goes stale. run() compiles an intent
+to a single ORM query (select_related for the train, annotate for job card
+counts, a window count for the total) and returns a table for the chat.
+"""
+import calendar
+import re
+from collections import namedtuple
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Avg, Case, Count, F, IntegerField, Value, When, Window
+from django.utils import timezone
+
+from .models import STATUS_CHOICES, Certificate, JobCard, Train
+from .worklist import PRIORITY_FIELDS
+
+
+Intent = namedtuple(
+    'Intent', 'name period statuses priorities order descending limit',
+    defaults=(None, (), (), None, False, 10),
+)
+
+MAX_ROWS = 50
+
+OPEN_JOB_STATUSES = ('pending', 'in_progress')
+PRIORITIES = ('critical', 'high', 'medium', 'low')
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+}
+
+CERTIFICATE_RE = re.compile(r'\bcert(?:ificate)?s?\b|\bfitness\b')
+EXPIRY_RE = re.compile(r'\bexpir|\bdue\b|\blaps|\brenew')
+JOB_CARD_RE = re.compile(r'\bjob ?cards?\b|\bwork ?orders?\b|\bjobs\b')
+TRAIN_RE = re.compile(r'\btrains?\b|\brakes?\b')
+SUPERLATIVE_RE = re.compile(r'\b(top|bottom|highest|lowest|most|least|best|worst|longest|oldest|latest|recent)\b')
+LIMIT_RE = re.compile(r'\b(?:top|first|bottom|last|best|worst)\s+(\d+|' + '|'.join(NUMBER_WORDS) + r')\b'
+                      r'|\b(\d+|' + '|'.join(NUMBER_WORDS) + r')\s+(?:trains?|rakes?|job|cert)')
+DAYS_RE = re.compile(r'\b(?:next|within|in)\s+(\d+)\s+days?\b')
+SUMMARY_RE = re.compile(r'\bsummary\b|\boverview\b|\bbreakdown\b|\bfleet status\b|\bhow many trains\b')
+
+# Sort keys for "top N by ..." -> (field, descending unless asked for the least)
+ORDER_KEYS = (
+    (re.compile(r'\bmileage\b|\bkm\b|\bkilomet'), 'current_mileage', True),
+    (re.compile(r'\bjob ?cards?\b|\bwork ?orders?\b'), 'open_job_cards', True),
+    (re.compile(r'\bservic'), 'last_service_date', False),
+    (re.compile(r'\brank'), 'rank', False),
+)
+
+# Train status words, most specific first
+TRAIN_STATUSES = (
+    (re.compile(r'\bcritical\b|\bcannot (?:be )?schedul|\bunschedul|\bout of service\b|\bgrounded\b'), 'cannot_schedule'),
+    (re.compile(r'\bminor\b|\bmaintenance\b|\bwarning\b'), 'minor_maintenance'),
+    (re.compile(r'\bready\b|\bok\b|\bavailable\b|\bhealthy\b|\bin service\b'), 'ok'),
+)
+
+JOB_STATUSES = (
+    (re.compile(r'\bin progress\b|\bongoing\b'), 'in_progress'),
+    (re.compile(r'\bpending\b|\bwaiting\b'), 'pending'),
+    (re.compile(r'\bcompleted?\b|\bdone\b|\bclosed\b'), 'completed'),
+    (re.compile(r'\bcancell?ed\b'), 'cancelled'),
+)
+
+
+def normalise(message):
+    """Lowercase a message and reduce it to words separated by single spaces."""
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', (message or '').lower()).split())
+
+
+def parse(message):
+    """Return the Intent for a chat message, or None if it is not a fleet query."""
+    return _parse(normalise(message))
+
+
+@lru_cache(maxsize=getattr(settings, 'CHAT_INTENT_CACHE_SIZE', 1024))
+def _parse(text):
+    if not text:
+        return None
+    limit = _limit(text)
+
+    if CERTIFICATE_RE.search(text) and EXPIRY_RE.search(text):
+        return Intent('certificates', period=_period(text), limit=limit or 20)
+
+    superlative = SUPERLATIVE_RE.search(text)
+    if superlative or (limit and TRAIN_RE.search(text)):
+        for pattern, field, descending in ORDER_KEYS:
+            if pattern.search(text):
+                if superlative and superlative.group(1) in ('bottom', 'lowest', 'least', 'worst'):
+                    descending = not descending
+                if field == 'last_service_date' and superlative and superlative.group(1) in ('latest', 'recent'):
+                    descending = True
+                return Intent('top_trains', order=field, descending=descending, limit=limit or 5)
+
+    if JOB_CARD_RE.search(text):
+        statuses = tuple(status for pattern, status in JOB_STATUSES if pattern.search(text))
+        if not statuses and re.search(r'\bopen\b|\boutstanding\b', text):
+            statuses = OPEN_JOB_STATUSES
+        priorities = tuple(priority for priority in PRIORITIES if re.search(rf'\b{priority}\b', text))
+        return Intent('job_cards', statuses=statuses or OPEN_JOB_STATUSES, priorities=priorities, limit=limit or 20)
+
+    if TRAIN_RE.search(text) or re.search(r'\bunschedul', text):
+        for pattern, status in TRAIN_STATUSES:
+            if pattern.search(text):
+                return Intent('trains', statuses=(status,), limit=limit or 20)
+
+    if SUMMARY_RE.search(text):
+        return Intent('summary')
+    return None
+
+
+def _limit(text):
+    match = LIMIT_RE.search(text)
+    if not match:
+        return None
+    word = match.group(1) or match.group(2)
+    return max(1, min(MAX_ROWS, int(NUMBER_WORDS.get(word, word))))
+
+
+def _period(text):
+    if re.search(r'\bexpired\b|\blapsed\b', text):
+        return 'expired'
+    days = DAYS_RE.search(text)
+    if days:
+        return int(days.group(1))
+    for word in ('today', 'tomorrow', 'week', 'month'):
+        if re.search(rf'\b{word}\b', text):
+            return word
+    return 30
+
+
+def period_range(period, today):
+    """Resolve a symbolic period to (first day, last day), or None for 'expired'."""
+    if period == 'expired':
+        return None
+    if period == 'today':
+        return today, today
+    if period == 'tomorrow':
+        return today, today + timedelta(days=1)
+    if period == 'week':
+        # A rolling seven days: "this week" asked on a Sunday still looks ahead
+        return today, today + timedelta(days=7)
+    if period == 'month':
+        return today, today.replace(day=calendar.monthrange(today.year, today.month)[1])
+    return today, today + timedelta(days=period)
+
+
+def run(intent, today=None):
+    """Run an intent; returns {'intent', 'response', 'table': {'columns', 'rows'}, 'total'}."""
+    today = today or timezone.localdate()
+    return RUNNERS[intent.name](intent, today)
+
+
+def _table(intent, summary, columns, rows, total):
+    return {
+        'intent': intent.name,
+        'response': summary,
+        'table': {'columns': columns, 'rows': rows},
+        'total': total,
+    }
+
+
+def _certificates(intent, today):
+    certificates = (
+        Certificate.objects.select_related('train')
+        .only('name', 'expiry_date', 'is_verified', 'train__train_number')
+        .annotate(total=Window(Count('id')))
+    )
+    window = period_range(intent.period, today)
+    if window is None:
+        certificates = certificates.filter(expiry_date__lt=today).order_by('expiry_date', 'train__train_number')
+        phrase = 'have expired'
+    else:
+        certificates = certificates.filter(expiry_date__range=window).order_by('expiry_date', 'train__train_number')
+        phrase = f'expire by {window[1].isoformat()}'
+
+    certificates = list(certificates[:intent.limit])
+    total = certificates[0].total if certificates else 0
+    rows = [
+        [
+            certificate.train.train_number,
+            certificate.name,
+            certificate.expiry_date.isoformat(),
+            (certificate.expiry_date - today).days,
+            'Yes' if certificate.is_verified else 'No',
+        ]
+        for certificate in certificates
+    ]
+    return _table(
+        intent, f'{total} certificate(s) {phrase}.' + _shown(len(rows), total),
+        ['Train', 'Certificate', 'Expiry date', 'Days left', 'Verified'], rows, total,
+    )
+
+
+def _job_cards(intent, today):
+    severity = Case(
+        *[When(priority=priority, then=Value(position)) for position, priority in enumerate(PRIORITIES)],
+        default=Value(len(PRIORITIES)), output_field=IntegerField(),
+    )
+    cards = (
+        JobCard.objects.select_related('train')
+        .only('title', 'status', 'priority', 'created_at', 'train__train_number')
+        .filter(status__in=intent.statuses)
+    )
+    if intent.priorities:
+        cards = cards.filter(priority__in=intent.priorities)
+    cards = list(
+        cards.annotate(severity=severity, total=Window(Count('id')))
+        .order_by('severity', '-created_at')[:intent.limit]
+    )
+
+    total = cards[0].total if cards else 0
+    rows = [
+        [
+            card.train.train_number,
+            card.title,
+            card.get_priority_display(),
+            card.get_status_display(),
+            timezone.localdate(card.created_at).isoformat(),
+        ]
+        for card in cards
+    ]
+    described = ' '.join([
+        '/'.join(intent.priorities),
+        '/'.join(status.replace('_', ' ') for status in intent.statuses),
+    ]).strip()
+    return _table(
+        intent, f'{total} {described} job card(s).' + _shown(len(rows), total),
+        ['Train', 'Job card', 'Priority', 'Status', 'Opened'], rows, total,
+    )
+
+
+def _fleet(queryset):
+    return queryset.only(
+        'train_number', 'status', 'rank', 'current_mileage', 'last_service_date',
+    ).annotate(open_job_cards=sum((F(field) for field in PRIORITY_FIELDS.values()), Value(0)))
+
+
+def _train_rows(trains):
+    return [
+        [
+            train.rank,
+            train.train_number,
+            train.get_status_display(),
+            train.current_mileage,
+            train.last_service_date.isoformat() if train.last_service_date else None,
+            train.open_job_cards,
+        ]
+        for train in trains
+    ]
+
+
+TRAIN_COLUMNS = ['Rank', 'Train', 'Status', 'Mileage (km)', 'Last service', 'Open job cards']
+
+
+def _top_trains(intent, today):
+    field = F(intent.order)
+    # Never-serviced trains count as the longest since service
+    order = field.desc(nulls_last=True) if intent.descending else field.asc(nulls_first=True)
+    trains = list(_fleet(Train.objects.all()).order_by(order, 'train_number')[:intent.limit])
+
+    label = {
+        'current_mileage': 'mileage',
+        'open_job_cards': 'open job cards',
+        'last_service_date': 'last service date',
+        'rank': 'rank',
+    }[intent.order]
+    direction = 'highest' if intent.descending else 'lowest'
+    if intent.order == 'last_service_date':
+        direction = 'most recent' if intent.descending else 'longest ago'
+    elif intent.order == 'rank':
+        direction = 'worst' if intent.descending else 'best'
+    return _table(
+        intent, f'Top {len(trains)} trains by {label} ({direction} first).',
+        TRAIN_COLUMNS, _train_rows(trains), len(trains),
+    )
+
+
+def _trains(intent, today):
+    trains = list(
+        _fleet(Train.objects.filter(status__in=intent.statuses))
+        .annotate(total=Window(Count('id')))
+        .order_by('rank', 'train_number')[:intent.limit]
+    )
+    total = trains[0].total if trains else 0
+    label = dict(STATUS_CHOICES)[intent.statuses[0]]
+    return _table(
+        intent, f'{total} train(s): {label}.' + _shown(len(trains), total),
+        TRAIN_COLUMNS, _train_rows(trains), total,
+    )
+
+
+def _summary(intent, today):
+    labels = dict(STATUS_CHOICES)
+    groups = list(
+        Train.objects.order_by().values('status')
+        .annotate(trains=Count('id'), mileage=Avg('current_mileage'))
+        .order_by('status')
+    )
+    total = sum(group['trains'] for group in groups)
+    rows = [
+        [labels.get(group['status'], group['status']), group['trains'], round(group['mileage'] or 0)]
+        for group in groups
+    ]
+    return _table(intent, f'{total} train(s) in the fleet.', ['Status', 'Trains', 'Average mileage (km)'], rows, total)
+
+
+def _shown(shown, total):
+    return f' Showing the first {shown}.' if total > shown else ''
+
+
+RUNNERS = {
+    'certificates': _certificates,
+    'job_cards': _job_cards,
+    'top_trains': _top_trains,
+    'trains': _trains,
+    'summary': _summary,
+}
+
+
+def answer(message):
+    """Answer a chat message that is a fleet query; None otherwise."""
+    intent = parse(message)
+    return run(intent) if intent else None
@@ -0,0 +1,117 @@
+"""
+Local background job runner.
+
+Requests enqueue a Job row and return its id straight away; the worker
+process (``python manage.py run_jobs``) claims queued jobs from the database
+and runs them on a thread pool, so no external broker is needed. Handlers
+report progress on their Job row, which the front end polls through
+``/api/jobs/<id>/``.
+"""
+import logging
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+# kind -> handler(job) returning a JSON-serialisable result
+HANDLERS = {}
+
+
+def register(kind):
+    """Register a function as the handler for a job kind."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, **payload):
+    """Queue a job for the worker and return it."""
+    return Job.objects.create(kind=kind, payload=payload)
+
+
+async def aenqueue(kind, **payload):
+    """Async version of enqueue()."""
+    return await Job.objects.acreate(kind=kind, payload=payload)
+
+
+def report_progress(job, progress=None, message=None):
+    """Record progress on a running job without touching its other fields."""
+    changes = {}
+    if progress is not None:
+        changes['progress'] = max(0.0, min(1.0, progress))
+    if message is not None:
+        changes['message'] = message[:200]
+    if changes:
+        Job.objects.filter(pk=job.pk).update(**changes)
+
+
+def claim_next():
+    """Atomically move the oldest queued job to running; returns None if there is none."""
+    while True:
+        pk = Job.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        # Another worker may have claimed it between the select and the update
+        if Job.objects.filter(pk=pk, status='queued').update(status='running', started_at=timezone.now()):
+            return Job.objects.get(pk=pk)
+
+
+def run_job(job):
+    """Run one claimed job and store its result or error."""
+    close_old_connections()
+    try:
+        handler = HANDLERS.get(job.kind)
+        if handler is None:
+            raise ValueError(f'No handler registered for job kind "{job.kind}"')
+        result = handler(job)
+    except Exception as e:
+        logger.exception('Job %s failed', job.pk)
+        Job.objects.filter(pk=job.pk).update(
+            status='failed', error=f'{e}\n\n{traceback.format_exc()}',
+            finished_at=timezone.now(),
+        )
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status='succeeded', result=result, progress=1.0, finished_at=timezone.now(),
+        )
+    finally:
+        close_old_connections()
+
+
+def fail_interrupted():
+    """Mark jobs left running by a worker that died as failed."""
+    return Job.objects.filter(status='running').update(
+        status='failed', error='Interrupted: the worker stopped before the job finished',
+        finished_at=timezone.now(),
+    )
+
+
+def run_worker(max_workers=None, poll_interval=None, once=False):
+    """Claim and run queued jobs until interrupted (or until the queue is empty if once)."""
+    max_workers = max_workers or getattr(settings, 'JOB_WORKER_THREADS', 4)
+    poll_interval = poll_interval or getattr(settings, 'JOB_POLL_INTERVAL', 1.0)
+
+    running = set()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job') as pool:
+        while True:
+            running = {future for future in running if not future.done()}
+            claimed = False
+            while len(running) < max_workers:
+                job = claim_next()
+                if job is None:
+                    break
+                claimed = True
+                running.add(pool.submit(run_job, job))
+
+            if once and not claimed and not running:
+                return
+            time.sleep(poll_interval)
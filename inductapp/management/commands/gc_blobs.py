@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from inductapp.storage import collect_garbage
+
+
+class Command(BaseCommand):
+    help = 'Delete stored files no certificate references and abandoned temporary uploads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Keep unreferenced files saved more recently than this (default 24)',
+        )
+
+    def handle(self, *args, **options):
+        blobs, freed, temps = collect_garbage(timedelta(hours=options['grace_hours']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {blobs} unreferenced file(s) ({freed / 1024:.1f} KiB) and {temps} temporary file(s)'
+        ))
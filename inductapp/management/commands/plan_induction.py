@@ -0,0 +1,44 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inductapp.induction import plan_induction
+
+
+class Command(BaseCommand):
+    help = 'Solve the service / standby / IBL induction plan for a night.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Service date (YYYY-MM-DD, default tomorrow)')
+        parser.add_argument('--required', type=int, help='Trains needed in revenue service')
+        parser.add_argument('--standby', type=int, help='Standby places')
+        parser.add_argument('--ibl-bays', type=int, help='Inspection bay line bays')
+        parser.add_argument('--maintenance-slots', type=int, help='Maintenance slots available tonight')
+        parser.add_argument('--time-budget', type=float, help='Solver time budget in seconds')
+        parser.add_argument('--dry-run', action='store_true', help='Solve without saving the plan')
+
+    def handle(self, *args, **options):
+        try:
+            service_date = date.fromisoformat(options['date']) if options['date'] else None
+        except ValueError:
+            raise CommandError('--date must be in YYYY-MM-DD format')
+
+        result = plan_induction(
+            service_date,
+            required=options['required'],
+            standby=options['standby'],
+            ibl_bays=options['ibl_bays'],
+            maintenance_slots=options['maintenance_slots'],
+            time_budget=options['time_budget'],
+            save=not options['dry_run'],
+        )
+
+        status = 'optimal' if result['optimal'] else 'best found within the time budget'
+        self.stdout.write(self.style.SUCCESS(
+            f"Plan for {result['service_date']}: {status}, objective {result['objective']}, "
+            f"{result['shunting_moves']} shunting moves, solved in {result['elapsed_ms']:.0f} ms"
+        ))
+        for role, trains in result['roles'].items():
+            if role != 'hold':
+                self.stdout.write(f"  {role:<8} {len(trains):>3}  {', '.join(trains)}")
+        self.stdout.write(f"  hold     {len(result['roles']['hold']):>3}")
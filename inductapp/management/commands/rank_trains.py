@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inductapp.ranking import rank_fleet
+
+
+class Command(BaseCommand):
+    help = 'Recompute the nightly induction rank of every train.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Score the fleet without saving ranks')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        frame = rank_fleet(dry_run=options['dry_run'])
+        elapsed = (time.perf_counter() - started) * 1000
+
+        changed = int((frame['new_rank'] != frame['rank']).sum()) if len(frame) else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Ranked {len(frame)} trains in {elapsed:.1f} ms ({changed} ranks changed)'
+        ))
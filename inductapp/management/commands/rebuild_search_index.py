@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inductapp.search import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the fleet assistant search index from train notes, job cards and certificates.'
+
+    def handle(self, *args, **options):
+        documents = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {documents} document(s)'))
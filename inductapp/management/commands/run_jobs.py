@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from inductapp import jobs, tasks  # noqa: F401 - registers the job handlers
+
+
+class Command(BaseCommand):
+    help = 'Run the background job worker (imports, certificate extraction, ranking).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, help='Worker threads (default JOB_WORKER_THREADS)')
+        parser.add_argument('--poll', type=float, help='Seconds between queue polls (default JOB_POLL_INTERVAL)')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--recover', action='store_true',
+                            help='Fail jobs left running by a crashed worker (only with a single worker)')
+
+    def handle(self, *args, **options):
+        if options['recover']:
+            interrupted = jobs.fail_interrupted()
+            self.stdout.write(self.style.WARNING(f'Marked {interrupted} interrupted job(s) as failed'))
+
+        self.stdout.write(self.style.SUCCESS('Job worker started'))
+        try:
+            jobs.run_worker(max_workers=options['threads'], poll_interval=options['poll'], once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write('Job worker stopped')
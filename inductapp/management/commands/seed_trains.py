@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand
+
+from inductapp.models import Train
+
+
+# The sample Kochi Metro fleet
+SAMPLE_TRAINS = [
+    {
+        'train_number': 'KM-001',
+        'train_name': 'Aluva Express',
+        'status': 'ok',
+        'rank': 1,
+        'current_mileage': 45320,
+        'status_notes': 'All systems operational',
+        'current_stabling_bay': 'Bay-A1',
+        'cleaning_status': 'Clean',
+        'last_service_date': '2024-01-15',
+    },
+    {
+        'train_number': 'KM-002',
+        'train_name': 'Kochi Central',
+        'status': 'minor_maintenance',
+        'rank': 2,
+        'current_mileage': 38750,
+        'status_notes': 'Minor brake pad replacement needed',
+        'current_stabling_bay': 'Bay-B2',
+        'cleaning_status': 'Needs cleaning',
+        'last_service_date': '2024-01-10',
+    },
+    {
+        'train_number': 'KM-003',
+        'train_name': 'Ernakulam South',
+        'status': 'cannot_schedule',
+        'rank': 5,
+        'current_mileage': 52100,
+        'status_notes': 'Critical electrical system fault - requires immediate attention',
+        'current_stabling_bay': 'Maintenance Bay',
+        'cleaning_status': 'Clean',
+        'last_service_date': '2024-01-05',
+    },
+    {
+        'train_number': 'KM-004',
+        'train_name': 'Marine Drive',
+        'status': 'ok',
+        'rank': 3,
+        'current_mileage': 41200,
+        'status_notes': 'Recently serviced, all systems green',
+        'current_stabling_bay': 'Bay-A2',
+        'cleaning_status': 'Clean',
+        'last_service_date': '2024-01-20',
+    },
+    {
+        'train_number': 'KM-005',
+        'train_name': 'Kaloor Specialist',
+        'status': 'minor_maintenance',
+        'rank': 4,
+        'current_mileage': 33900,
+        'status_notes': 'Scheduled maintenance due next week',
+        'current_stabling_bay': 'Bay-B1',
+        'cleaning_status': 'Needs deep cleaning',
+        'last_service_date': '2024-01-12',
+    },
+    {
+        'train_number': 'KM-006',
+        'train_name': 'Aluva Express',
+        'status': 'ok',
+        'rank': 1,
+        'current_mileage': 45320,
+        'status_notes': 'All systems operational',
+        'current_stabling_bay': 'Bay-A1',
+        'cleaning_status': 'Clean',
+        'last_service_date': '2024-01-15',
+    },
+]
+
+
+class Command(BaseCommand):
+    help = 'Seed the database with the sample Kochi Metro fleet.'
+
+    def handle(self, *args, **options):
+        created_count = 0
+        for sample in SAMPLE_TRAINS:
+            defaults = {key: value for key, value in sample.items() if key != 'train_number'}
+            _, created = Train.objects.update_or_create(train_number=sample['train_number'], defaults=defaults)
+            created_count += created
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(SAMPLE_TRAINS)} trains ({created_count} created)'
+        ))
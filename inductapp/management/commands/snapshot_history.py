@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from inductapp.history import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Fold the train history recorded since the last snapshot into a new snapshot.'
+
+    def handle(self, *args, **options):
+        snapshot = take_snapshot()
+        if snapshot is None:
+            self.stdout.write('No changes since the last snapshot')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Snapshot of {len(snapshot.state["rows"])} train(s) up to delta {snapshot.last_delta_id}'
+            ))
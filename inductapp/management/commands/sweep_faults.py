@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inductapp.sweep import sweep
+
+
+class Command(BaseCommand):
+    help = 'Evaluate every combination of failing service trains for the contingency plan.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=2, help='Trains failing per scenario (default 2)')
+        parser.add_argument('--required', type=int, help='Trains the timetable needs in service')
+        parser.add_argument('--workers', type=int, help='Worker processes (default SWEEP_WORKERS or CPU count)')
+        parser.add_argument('--top', type=int, default=10, help='Critical trains to report (default 10)')
+        parser.add_argument('--output', help='Also write the full result as JSON to this file')
+
+    def handle(self, *args, **options):
+        try:
+            result = sweep(
+                size=options['size'], required=options['required'],
+                workers=options['workers'], top=options['top'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(result, handle, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Evaluated {result['scenarios']} scenarios of {result['scenario_size']} failing trains "
+            f"in {result['elapsed_ms']:.0f} ms"
+        ))
+        self.stdout.write(
+            f"Eligible trains: {result['eligible_trains']}, required: {result['required_trains']}, "
+            f"worst-case shortfall: {result['worst_shortfall']}"
+        )
+        worst = result['worst_scenario']
+        self.stdout.write(f"Worst scenario: {', '.join(worst['trains'])} (roster loss {worst['roster_loss']})")
+        self.stdout.write('Critical trains:')
+        for train in result['critical_trains']:
+            self.stdout.write(
+                f"  {train['train_number']}  position {train['service_position']}  "
+                f"max loss {train['max_roster_loss']}  mean loss {train['mean_roster_loss']}"
+            )
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:07
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='train',
+            index=models.Index(fields=['rank', 'train_number'], name='train_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='train',
+            index=models.Index(fields=['-current_mileage', 'id'], name='train_mileage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='train',
+            index=models.Index(fields=['-last_service_date', 'id'], name='train_service_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='train',
+            index=models.Index(django.db.models.functions.text.Upper('train_number'), name='train_number_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='train',
+            index=models.Index(django.db.models.functions.text.Upper('train_name'), name='train_name_upper_idx'),
+        ),
+    ]
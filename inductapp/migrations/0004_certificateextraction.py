@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0003_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CertificateExtraction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('extracted_data', models.JSONField()),
+                ('confidence_score', models.FloatField(default=0.0)),
+                ('page_count', models.PositiveIntegerField(default=1)),
+                ('engine', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
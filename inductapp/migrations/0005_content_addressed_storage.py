@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:15
+
+from django.db import migrations, models
+import django.utils.timezone
+import inductapp.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0004_certificateextraction'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='certificate',
+            name='file',
+            field=models.FileField(storage=inductapp.storage.blob_storage, upload_to='certificates/'),
+        ),
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_saved_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'last_saved_at'], name='blob_gc_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0005_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InductionPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_date', models.DateField(unique=True)),
+                ('assignments', models.JSONField(default=dict)),
+                ('objective', models.FloatField(default=0.0)),
+                ('optimal', models.BooleanField(default=False)),
+                ('shunting_moves', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-service_date'],
+            },
+        ),
+    ]
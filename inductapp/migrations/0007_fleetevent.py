@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0006_inductionplan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FleetEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('train_id', models.BigIntegerField(blank=True, null=True)),
+                ('kind', models.CharField(max_length=20)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
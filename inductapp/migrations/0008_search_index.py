@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0007_fleetevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('text', models.TextField()),
+                ('length', models.IntegerField(default=0)),
+                ('train', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='inductapp.train')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.IntegerField(default=1)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='inductapp.searchdocument')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'document', 'frequency'], name='search_posting_term_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('source', 'object_id'), name='search_document_source_uniq'),
+        ),
+    ]
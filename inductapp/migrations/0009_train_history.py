@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:36
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# Must match inductapp.history.HISTORY_FIELDS at the time of this migration
+HISTORY_FIELDS = [
+    'train_number', 'train_name', 'status', 'rank', 'current_mileage',
+    'last_service_date', 'cleaning_status', 'current_stabling_bay', 'status_notes',
+]
+
+
+def snapshot_current_fleet(apps, schema_editor):
+    """History starts now: record the current fleet as the first snapshot."""
+    Train = apps.get_model('inductapp', 'Train')
+    HistorySnapshot = apps.get_model('inductapp', 'HistorySnapshot')
+    rows = [
+        [pk, *(value.isoformat() if hasattr(value, 'isoformat') else value for value in values)]
+        for pk, *values in Train.objects.order_by('pk').values_list('pk', *HISTORY_FIELDS)
+    ]
+    HistorySnapshot.objects.create(
+        taken_at=django.utils.timezone.now(),
+        last_delta_id=0,
+        state={'fields': HISTORY_FIELDS, 'rows': rows},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(db_index=True)),
+                ('last_delta_id', models.BigIntegerField(default=0)),
+                ('state', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-taken_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrainDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('train_id', models.BigIntegerField()),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('changes', models.JSONField(blank=True, default=dict)),
+                ('deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recorded_at', 'id'], name='train_delta_time_idx')],
+            },
+        ),
+        migrations.RunPython(snapshot_current_fleet, migrations.RunPython.noop),
+    ]
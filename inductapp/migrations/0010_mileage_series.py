@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def record_baseline(apps, schema_editor):
+    """The series starts now: today's odometer is every train's baseline reading."""
+    Train = apps.get_model('inductapp', 'Train')
+    MileageReading = apps.get_model('inductapp', 'MileageReading')
+    today = django.utils.timezone.localdate()
+    MileageReading.objects.bulk_create(
+        [
+            MileageReading(train_id=pk, date=today, odometer=mileage)
+            for pk, mileage in Train.objects.values_list('pk', 'current_mileage')
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0009_train_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MileageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('start', models.DateField()),
+                ('distance', models.IntegerField(default=0)),
+                ('train', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mileage_rollups', to='inductapp.train')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MileageReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('odometer', models.IntegerField()),
+                ('distance', models.IntegerField(default=0)),
+                ('train', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mileage_readings', to='inductapp.train')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='mileagerollup',
+            constraint=models.UniqueConstraint(fields=('train', 'period', 'start'), name='mileage_rollup_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='mileagereading',
+            constraint=models.UniqueConstraint(fields=('train', 'date'), name='mileage_reading_day_uniq'),
+        ),
+        migrations.RunPython(record_baseline, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:42
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_horizons(apps, schema_editor):
+    """Set every train's certificates_valid_until from its certificates."""
+    Train = apps.get_model('inductapp', 'Train')
+    Certificate = apps.get_model('inductapp', 'Certificate')
+    Train.objects.update(certificates_valid_until=Subquery(
+        Certificate.objects.filter(train=OuterRef('pk'), expiry_date__isnull=False)
+        .order_by('expiry_date').values('expiry_date')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0010_mileage_series'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='train',
+            name='certificates_valid_until',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['expiry_date', 'train'], name='certificate_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['train', 'expiry_date'], name='certificate_train_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='train',
+            index=models.Index(fields=['certificates_valid_until', 'id'], name='train_cert_horizon_idx'),
+        ),
+        migrations.RunPython(fill_horizons, migrations.RunPython.noop),
+    ]
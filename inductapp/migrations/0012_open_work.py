@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:43
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+PRIORITY_FIELDS = {
+    'critical': 'open_jobs_critical',
+    'high': 'open_jobs_high',
+    'medium': 'open_jobs_medium',
+    'low': 'open_jobs_low',
+}
+
+
+def fill_open_work(apps, schema_editor):
+    """Count every train's open job cards by priority (inductapp.worklist.refresh_workloads)."""
+    Train = apps.get_model('inductapp', 'Train')
+    JobCard = apps.get_model('inductapp', 'JobCard')
+    trains = {}
+    groups = (
+        JobCard.objects.filter(status__in=('pending', 'in_progress'))
+        .order_by().values_list('train_id', 'priority')
+        .annotate(n=Count('id'), oldest=Min('created_at'))
+    )
+    for train_id, priority, n, oldest in groups:
+        train = trains.setdefault(train_id, Train(pk=train_id, oldest_open_job_at=oldest))
+        field = PRIORITY_FIELDS.get(priority, 'open_jobs_medium')
+        setattr(train, field, getattr(train, field) + n)
+        train.oldest_open_job_at = min(train.oldest_open_job_at, oldest)
+    Train.objects.bulk_update(
+        trains.values(), [*PRIORITY_FIELDS.values(), 'oldest_open_job_at'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0011_certificate_horizon'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='train',
+            name='oldest_open_job_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='train',
+            name='open_jobs_critical',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='train',
+            name='open_jobs_high',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='train',
+            name='open_jobs_low',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='train',
+            name='open_jobs_medium',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='jobcard',
+            index=models.Index(fields=['status', 'priority', 'created_at'], name='jobcard_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='train',
+            index=models.Index(fields=['-open_jobs_critical', 'oldest_open_job_at', 'id'], name='train_open_work_idx'),
+        ),
+        migrations.RunPython(fill_open_work, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0012_open_work'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='certificateextraction',
+            name='content_hash',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='certificateextraction',
+            constraint=models.UniqueConstraint(fields=('content_hash', 'engine'), name='certificate_extraction_engine_uniq'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:57
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0013_extraction_engine_key'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='train',
+            name='train_number_upper_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='train',
+            name='train_name_upper_idx',
+        ),
+    ]
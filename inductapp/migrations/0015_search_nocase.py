@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inductapp', '0014_drop_upper_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='train',
+            name='train_name',
+            field=models.CharField(db_collation='NOCASE', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='train',
+            name='train_number',
+            field=models.CharField(db_collation='NOCASE', max_length=20, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='train',
+            index=models.Index(fields=['train_name'], name='train_name_idx'),
+        ),
+    ]
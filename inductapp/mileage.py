@@ -0,0 +1,194 @@
+"""
+Daily mileage series and wear projections.
+
+Each train's odometer is stored at most once per day in MileageReading,
+with the distance run since its previous reading; the (train, date) unique
+index makes every per-train lookup an index seek. Weekly and monthly
+MileageRollup rows are adjusted by the distance each new reading adds, so
+wear-balancing views never re-sum the daily series. fleet_wear() computes
+km since last service, the recent daily average and the projected date of
+the next mileage-based maintenance for the whole fleet in one query plus
+NumPy arithmetic; the nightly ranking uses it for every train.
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import MileageReading, MileageRollup, Train
+
+
+# Distance between mileage-based maintenance services
+DEFAULT_SERVICE_INTERVAL_KM = 5000
+
+# The daily average is taken over readings from the last this many days
+RATE_WINDOW_DAYS = 28
+
+
+def service_interval():
+    return getattr(settings, 'MAINTENANCE_INTERVAL_KM', DEFAULT_SERVICE_INTERVAL_KM)
+
+
+def period_starts(day):
+    """Return {period: first day of the week (Monday) or month containing day}."""
+    return {'week': day - timedelta(days=day.weekday()), 'month': day.replace(day=1)}
+
+
+def record_readings(odometers, day=None):
+    """
+    Record {train id: odometer km} as the readings for a day (today by default).
+
+    A second reading on the same day replaces the first. A train's first
+    reading is its baseline and runs no distance; so does an odometer that
+    went backwards (a meter replacement).
+    """
+    if not odometers:
+        return
+    day = day or timezone.localdate()
+    ids = list(odometers)
+
+    with transaction.atomic():
+        previous = dict(
+            Train.objects.filter(pk__in=ids).order_by()
+            .annotate(odometer=Subquery(
+                MileageReading.objects.filter(train=OuterRef('pk'), date__lt=day)
+                .order_by('-date').values('odometer')[:1]
+            ))
+            .values_list('pk', 'odometer')
+        )
+        stored = {
+            train_id: (pk, distance)
+            for pk, train_id, distance in MileageReading.objects.filter(train_id__in=ids, date=day)
+            .values_list('pk', 'train_id', 'distance')
+        }
+
+        created, updated, added = [], [], {}
+        for train_id, odometer in odometers.items():
+            if train_id not in previous:
+                continue
+            before = previous[train_id]
+            distance = max(0, odometer - before) if before is not None else 0
+            pk, stored_distance = stored.get(train_id, (None, 0))
+            reading = MileageReading(pk=pk, train_id=train_id, date=day, odometer=odometer, distance=distance)
+            (updated if pk else created).append(reading)
+            added[train_id] = distance - stored_distance
+
+        MileageReading.objects.bulk_create(created, batch_size=500)
+        MileageReading.objects.bulk_update(updated, ['odometer', 'distance'], batch_size=500)
+        _add_to_rollups(added, day)
+
+
+def _add_to_rollups(added, day):
+    # Adjust (or open) this week's and this month's rollup by each train's change in distance
+    added = {train_id: distance for train_id, distance in added.items() if distance}
+    if not added:
+        return
+    starts = period_starts(day)
+    existing = {
+        (rollup.train_id, rollup.period): rollup
+        for rollup in MileageRollup.objects.filter(
+            Q(period='week', start=starts['week']) | Q(period='month', start=starts['month']),
+            train_id__in=list(added),
+        )
+    }
+
+    created, updated = [], []
+    for train_id, distance in added.items():
+        for period, start in starts.items():
+            rollup = existing.get((train_id, period))
+            if rollup is None:
+                created.append(MileageRollup(train_id=train_id, period=period, start=start, distance=distance))
+            else:
+                rollup.distance += distance
+                updated.append(rollup)
+    MileageRollup.objects.bulk_create(created, batch_size=500)
+    MileageRollup.objects.bulk_update(updated, ['distance'], batch_size=500)
+
+
+def rollups(train, period='week', limit=12):
+    """Return the latest limit (start, distance) rollups of one train, oldest first."""
+    rows = list(
+        MileageRollup.objects.filter(train=train, period=period)
+        .order_by('-start').values_list('start', 'distance')[:limit]
+    )
+    return rows[::-1]
+
+
+def days_to_threshold(km_since_service, daily_km):
+    """
+    Days until each train reaches the service interval at its daily rate.
+
+    0 for trains already past it, NaN where the rate is unknown or zero.
+    """
+    km_since_service = np.asarray(km_since_service, dtype=float)
+    daily_km = np.asarray(daily_km, dtype=float)
+    remaining = np.maximum(service_interval() - km_since_service, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days = np.where(daily_km > 0, remaining / daily_km, np.nan)
+    return np.where(remaining == 0, 0.0, days)
+
+
+def fleet_wear(today=None):
+    """
+    Wear figures for every train, as a DataFrame indexed by train id.
+
+    Columns: km_since_service (the whole odometer for a train never
+    serviced; NaN if the series has no reading to measure from),
+    daily_km (NaN without two readings in the rate window),
+    days_to_threshold and threshold_date (NaT when not projectable).
+    """
+    today = today or timezone.localdate()
+    window_start = today - timedelta(days=RATE_WINDOW_DAYS)
+    readings = MileageReading.objects.filter(train=OuterRef('pk'))
+
+    def latest(queryset, field):
+        return Subquery(queryset.order_by('-date').values(field)[:1])
+
+    def earliest(queryset, field):
+        return Subquery(queryset.order_by('date').values(field)[:1])
+
+    in_window = readings.filter(date__gte=window_start, date__lte=today)
+    rows = list(
+        Train.objects.order_by('pk')
+        .annotate(
+            # Odometer when last serviced: the reading on or before that day, else the first one after
+            service_odometer=Coalesce(
+                latest(readings.filter(date__lte=OuterRef('last_service_date')), 'odometer'),
+                earliest(readings.filter(date__gt=OuterRef('last_service_date')), 'odometer'),
+            ),
+            window_odometer=earliest(in_window, 'odometer'),
+            window_date=earliest(in_window, 'date'),
+            latest_odometer=latest(in_window, 'odometer'),
+            latest_date=latest(in_window, 'date'),
+        )
+        .values_list(
+            'pk', 'current_mileage', 'last_service_date', 'service_odometer',
+            'window_odometer', 'window_date', 'latest_odometer', 'latest_date',
+        )
+    )
+    columns = ['id', 'current_mileage', 'last_service_date', 'service_odometer',
+               'window_odometer', 'window_date', 'latest_odometer', 'latest_date']
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+
+    current = frame['current_mileage'].to_numpy(dtype=float)
+    service_odometer = frame['service_odometer'].to_numpy(dtype=float)
+    never_serviced = frame['last_service_date'].isna().to_numpy()
+    km_since_service = np.where(never_serviced, current, np.maximum(current - service_odometer, 0.0))
+
+    span = (pd.to_datetime(frame['latest_date']) - pd.to_datetime(frame['window_date'])).dt.days.to_numpy(dtype=float)
+    run = frame['latest_odometer'].to_numpy(dtype=float) - frame['window_odometer'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        daily_km = np.where(span > 0, np.maximum(run, 0.0) / span, np.nan)
+
+    days = days_to_threshold(km_since_service, daily_km)
+    return pd.DataFrame({
+        'km_since_service': km_since_service,
+        'daily_km': daily_km,
+        'days_to_threshold': days,
+        'threshold_date': pd.Timestamp(today) + pd.to_timedelta(np.ceil(days), unit='D'),
+    }, index=frame['id'].to_numpy())
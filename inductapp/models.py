@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone  # <<< --- ADD THIS IMPORT
 
+from .storage import blob_storage
+
 # Role choices for staff
 ROLE_CHOICES = [
     ('admin', 'Administrator'),
@@ -33,8 +35,10 @@ class UserProfile(models.Model):
 
 class Train(models.Model):
     """Train model with all induction-related data."""
-    train_number = models.CharField(max_length=20, unique=True)
-    train_name = models.CharField(max_length=100)
+    # NOCASE (SQLite) so the ranklist's case-insensitive prefix search is an
+    # index range on the unique index and train_name_idx
+    train_number = models.CharField(max_length=20, unique=True, db_collation='NOCASE')
+    train_name = models.CharField(max_length=100, db_collation='NOCASE')
     current_mileage = models.IntegerField(default=0)
     last_service_date = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ok')
@@ -43,15 +47,43 @@ class Train(models.Model):
     current_stabling_bay = models.CharField(max_length=50, blank=True)
     cleaning_status = models.CharField(max_length=100, default='Clean')
     maintenance_notes = models.TextField(blank=True)
+    # Earliest certificate expiry, kept current by the Certificate signals
+    certificates_valid_until = models.DateField(null=True, blank=True, editable=False)
+    # Open (pending or in-progress) job cards, kept current by the JobCard signals
+    open_jobs_critical = models.IntegerField(default=0, editable=False)
+    open_jobs_high = models.IntegerField(default=0, editable=False)
+    open_jobs_medium = models.IntegerField(default=0, editable=False)
+    open_jobs_low = models.IntegerField(default=0, editable=False)
+    oldest_open_job_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['rank', 'train_number']
+        indexes = [
+            # One composite index per ranklist sort mode, tie-breaker included
+            # so keyset pagination is a pure index range scan.
+            models.Index(fields=['rank', 'train_number'], name='train_rank_idx'),
+            models.Index(fields=['-current_mileage', 'id'], name='train_mileage_idx'),
+            models.Index(fields=['-last_service_date', 'id'], name='train_service_date_idx'),
+            # Ranklist search by name prefix (train_number has its unique index)
+            models.Index(fields=['train_name'], name='train_name_idx'),
+            # Trains whose certificates lapse in a window: one range scan
+            models.Index(fields=['certificates_valid_until', 'id'], name='train_cert_horizon_idx'),
+            # Depot worklist: trains with the most critical open work first
+            models.Index(fields=['-open_jobs_critical', 'oldest_open_job_at', 'id'], name='train_open_work_idx'),
+        ]
 
     def __str__(self):
         return f"{self.train_number} - {self.train_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded state so the history records only what a save changes
+        instance._loaded_values = dict(zip(field_names, (value for value in values if value is not models.DEFERRED)))
+        return instance
+
     def get_status_color(self):
         color_map = {'ok': 'success', 'minor_maintenance': 'warning', 'cannot_schedule': 'danger'}
         return color_map.get(self.status, 'secondary')
@@ -61,12 +93,19 @@ class Certificate(models.Model):
     """Train certificates and documents."""
     train = models.ForeignKey(Train, on_delete=models.CASCADE, related_name='certificates')
     name = models.CharField(max_length=200)
-    file = models.FileField(upload_to='certificates/')
+    file = models.FileField(upload_to='certificates/', storage=blob_storage)
     issue_date = models.DateField(null=True)
     expiry_date = models.DateField(null=True)
     is_verified = models.BooleanField(default=False)
     extracted_data = models.JSONField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Fleet-wide expiry windows, and each train's earliest expiry
+            models.Index(fields=['expiry_date', 'train'], name='certificate_expiry_idx'),
+            models.Index(fields=['train', 'expiry_date'], name='certificate_train_expiry_idx'),
+        ]
+
     def __str__(self):
         return f"{self.train.train_number} - {self.name}"
 
@@ -93,5 +132,219 @@ class JobCard(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # The open work queue: status and priority filter, oldest first
+            models.Index(fields=['status', 'priority', 'created_at'], name='jobcard_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.train.train_number} - {self.title}"
+
+    # The signals refresh the train's open-work counts; run them in the same transaction
+    def save(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            return super().delete(*args, **kwargs)
+
+JOB_STATUS_CHOICES = [
+    ('queued', 'Queued'),
+    ('running', 'Running'),
+    ('succeeded', 'Succeeded'),
+    ('failed', 'Failed'),
+]
+
+
+class Job(models.Model):
+    """Background job executed by the local worker (manage.py run_jobs)."""
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=JOB_STATUS_CHOICES, default='queued')
+    payload = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    progress = models.FloatField(default=0.0, help_text="Fraction complete, 0 to 1")
+    message = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The worker claims the oldest queued job
+            models.Index(fields=['status', 'created_at'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+
+class CertificateExtraction(models.Model):
+    """OCR result cached by the SHA-256 of the certificate file's content and the engine that read it."""
+    content_hash = models.CharField(max_length=64)
+    extracted_data = models.JSONField()
+    confidence_score = models.FloatField(default=0.0)
+    page_count = models.PositiveIntegerField(default=1)
+    engine = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_hash', 'engine'], name='certificate_extraction_engine_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.engine})"
+
+
+class StoredBlob(models.Model):
+    """A file kept once by ContentAddressedStorage, with the number of records using it."""
+    name = models.CharField(max_length=255, unique=True)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_saved_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Garbage collection scans unreferenced blobs by age
+            models.Index(fields=['ref_count', 'last_saved_at'], name='blob_gc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class InductionPlan(models.Model):
+    """A night's service / standby / IBL assignment produced by the induction solver."""
+    service_date = models.DateField(unique=True)
+    assignments = models.JSONField(default=dict)  # str(train id) -> role
+    objective = models.FloatField(default=0.0)
+    optimal = models.BooleanField(default=False)
+    shunting_moves = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-service_date']
+
+    def __str__(self):
+        return f"Induction plan for {self.service_date}"
+
+
+class FleetEvent(models.Model):
+    """Append-only log of train changes, streamed to open pages as live deltas."""
+    train_id = models.BigIntegerField(null=True, blank=True)
+    kind = models.CharField(max_length=20)  # update, rank, delete or reload
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.train_id or ''}".strip()
+
+
+class SearchDocument(models.Model):
+    """One indexed text (a train's notes, a job card or a certificate) for the fleet assistant."""
+    source = models.CharField(max_length=20)  # train, job_card or certificate
+    object_id = models.BigIntegerField()
+    train = models.ForeignKey(Train, on_delete=models.CASCADE, related_name='search_documents')
+    text = models.TextField()
+    length = models.IntegerField(default=0)  # tokens, for BM25 length normalisation
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'object_id'], name='search_document_source_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.object_id}"
+
+
+class SearchPosting(models.Model):
+    """Inverted index entry: how often a term occurs in a document."""
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+    term = models.CharField(max_length=64)
+    frequency = models.IntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # Covers the per-term lookup at query time
+            models.Index(fields=['term', 'document', 'frequency'], name='search_posting_term_idx'),
+        ]
+
+
+class TrainDelta(models.Model):
+    """Append-only history of train changes: the fields one write changed."""
+    train_id = models.BigIntegerField()  # no foreign key, so deletions stay on record
+    recorded_at = models.DateTimeField(default=timezone.now)
+    changes = models.JSONField(default=dict, blank=True)  # field -> new value
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recorded_at', 'id'], name='train_delta_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"Train {self.train_id} at {self.recorded_at}"
+
+
+class HistorySnapshot(models.Model):
+    """Compact state of the whole fleet as of one TrainDelta, the base for time-travel queries."""
+    taken_at = models.DateTimeField(db_index=True)
+    last_delta_id = models.BigIntegerField(default=0)  # deltas after this one are not included
+    state = models.JSONField(default=dict)  # {'fields': [...], 'rows': [[train id, value, ...], ...]}
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-taken_at']
+
+    def __str__(self):
+        return f"Fleet snapshot at {self.taken_at}"
+
+
+class MileageReading(models.Model):
+    """A train's odometer on one day and the distance run since its previous reading."""
+    train = models.ForeignKey(Train, on_delete=models.CASCADE, related_name='mileage_readings')
+    date = models.DateField()
+    odometer = models.IntegerField()
+    distance = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the (train, date) index every per-train range lookup uses
+            models.UniqueConstraint(fields=['train', 'date'], name='mileage_reading_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.train} on {self.date}: {self.odometer} km"
+
+
+ROLLUP_PERIODS = [
+    ('week', 'Week'),
+    ('month', 'Month'),
+]
+
+
+class MileageRollup(models.Model):
+    """Distance a train ran in one week or month, adjusted as readings arrive."""
+    train = models.ForeignKey(Train, on_delete=models.CASCADE, related_name='mileage_rollups')
+    period = models.CharField(max_length=5, choices=ROLLUP_PERIODS)
+    start = models.DateField()
+    distance = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['train', 'period', 'start'], name='mileage_rollup_uniq'),
+        ]
+
     def __str__(self):
-        return f"{self.train.train_number} - {self.title}"
\ No newline at end of file
+        return f"{self.train} {self.period} of {self.start}: {self.distance} km"
@@ -0,0 +1,278 @@
+"""
+Certificate OCR pipeline.
+
+A certificate is split into pages, the pages are recognised in parallel on
+a process pool, and the fields parsed from the combined text are cached by
+the SHA-256 of the file content and the engine, so re-uploading identical
+bytes returns the stored result without running OCR again (and switching
+engines never serves another engine's results).
+
+The engine is pluggable through the OCR_ENGINE setting. The default,
+TesseractEngine, needs pytesseract, Pillow and pdf2image plus the
+tesseract and pdftoppm (Poppler) executables; without them extraction is
+refused with OCRUnavailable. StubEngine returns
+a fixed KM-001 certificate for every file and is only for tests and demos.
+"""
+import abc
+import hashlib
+import os
+import re
+import shutil
+from importlib.util import find_spec
+from datetime import date
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .concurrency import process_pool
+from .models import CertificateExtraction
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
+
+DEFAULT_ENGINE = 'inductapp.ocr.TesseractEngine'
+
+
+class OCRUnavailable(Exception):
+    """The configured OCR engine cannot run here."""
+
+
+class OCREngine(abc.ABC):
+    """Base class for OCR engines; subclasses recognise one page at a time."""
+    name = 'base'
+    # Modules the engine imports and executables it runs
+    requires = ()
+    executables = ()
+
+    @classmethod
+    def missing_dependencies(cls):
+        missing = [module for module in cls.requires if find_spec(module) is None]
+        return missing + [f'{name} (executable)' for name in cls.executables if shutil.which(name) is None]
+
+    @abc.abstractmethod
+    def recognise_page(self, path, page_index):
+        """Return (text, confidence) for one page of a PDF or image file."""
+
+
+class StubEngine(OCREngine):
+    """Deterministic engine returning a fixed certificate text whatever the file; tests and demos only."""
+    name = 'stub'
+
+    TEXT = (
+        'Safety Compliance Certificate\n'
+        'Certificate No: KM-SAFETY-2024-001\n'
+        'Issued to: Kochi Metro Rail Corporation\n'
+        'Train: KM-001\n'
+        'Issue Date: 2024-01-15\n'
+        'Expiry Date: 2025-01-15\n'
+        'Issuing Authority: Railway Safety Commissioner\n'
+    )
+
+    def recognise_page(self, path, page_index):
+        return (self.TEXT if page_index == 0 else ''), 0.95
+
+
+class TesseractEngine(OCREngine):
+    """Tesseract via pytesseract; PDF pages are rasterised with pdf2image."""
+    name = 'tesseract'
+    requires = ('pytesseract', 'PIL', 'pdf2image')
+    executables = ('tesseract', 'pdftoppm')
+
+    def recognise_page(self, path, page_index):
+        import pytesseract
+
+        image = load_page_image(path, page_index)
+        data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+
+        # Rebuild the text line by line from the word boxes, keeping confidences
+        lines, confidences = {}, []
+        for index, word in enumerate(data['text']):
+            if not word.strip():
+                continue
+            key = (data['block_num'][index], data['par_num'][index], data['line_num'][index])
+            lines.setdefault(key, []).append(word)
+            if float(data['conf'][index]) >= 0:
+                confidences.append(float(data['conf'][index]))
+
+        text = '\n'.join(' '.join(words) for _, words in sorted(lines.items()))
+        confidence = sum(confidences) / len(confidences) / 100 if confidences else 0.0
+        return text, confidence
+
+
+def load_page_image(path, page_index):
+    """Rasterise one page of a PDF, or one frame of an image, as a PIL image."""
+    if path.lower().endswith('.pdf'):
+        from pdf2image import convert_from_path
+        return convert_from_path(path, first_page=page_index + 1, last_page=page_index + 1)[0]
+
+    from PIL import Image
+    image = Image.open(path)
+    image.seek(page_index)
+    return image.convert('RGB')
+
+
+def configured_engine():
+    return getattr(settings, 'OCR_ENGINE', None) or DEFAULT_ENGINE
+
+
+def engine_class(dotted_path=None):
+    """Return the configured engine class, raising OCRUnavailable if it cannot run."""
+    dotted_path = dotted_path or configured_engine()
+    try:
+        engine = import_string(dotted_path)
+    except ImportError as e:
+        raise OCRUnavailable(f'OCR_ENGINE {dotted_path} cannot be imported: {e}')
+    missing = engine.missing_dependencies()
+    if missing:
+        raise OCRUnavailable(f'OCR engine "{engine.name}" is missing {", ".join(missing)}')
+    return engine
+
+
+@lru_cache(maxsize=None)
+def get_engine(dotted_path=None):
+    """Instantiate the configured OCR engine (cached per process)."""
+    return engine_class(dotted_path)()
+
+
+def file_sha256(path):
+    """Hash a file in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def count_pages(path):
+    """Count the pages of a PDF or the frames of a multi-page image."""
+    lower = path.lower()
+    if lower.endswith('.pdf'):
+        with open(path, 'rb') as handle:
+            # Page objects, not the /Pages tree nodes
+            return max(1, len(re.findall(rb'/Type\s*/Page\b(?!s)', handle.read())))
+    if lower.endswith(IMAGE_EXTENSIONS):
+        try:
+            from PIL import Image
+        except ImportError:
+            return 1
+        with Image.open(path) as image:
+            return getattr(image, 'n_frames', 1)
+    raise ValueError('Certificates must be PDF or image files')
+
+
+def _recognise(engine_path, path, page_index):
+    # Runs in a pool worker; the engine is built once per process
+    return get_engine(engine_path).recognise_page(path, page_index)
+
+
+_pool = None
+
+
+def get_pool():
+    """Return the shared OCR process pool, created on first use."""
+    global _pool
+    if _pool is None:
+        _pool = process_pool(getattr(settings, 'OCR_WORKERS', os.cpu_count()))
+    return _pool
+
+
+def recognise_pages(path, page_count, engine_path=None):
+    """Recognise every page, in parallel when there is more than one."""
+    engine_path = engine_path or configured_engine()
+    if page_count == 1:
+        return [_recognise(engine_path, path, 0)]
+    pool = get_pool()
+    futures = [pool.submit(_recognise, engine_path, path, index) for index in range(page_count)]
+    return [future.result() for future in futures]
+
+
+FIELD_PATTERNS = {
+    'certificate_type': r'^\s*([A-Za-z ]*Certificate)\s*$',
+    'certificate_number': r'Certificate\s*(?:No|Number)\.?\s*:?\s*([A-Z0-9-]+)',
+    'issued_to': r'Issued\s*to\s*:?\s*(.+)',
+    'train_number': r'\b(KM-\d{3,})\b',
+    'issue_date': r'Issue(?:d)?\s*Date\s*:?\s*(\d{4}-\d{2}-\d{2})',
+    'expiry_date': r'Expir(?:y|es)\s*(?:Date)?\s*:?\s*(\d{4}-\d{2}-\d{2})',
+    'issuing_authority': r'Issuing\s*Authority\s*:?\s*(.+)',
+}
+
+
+def parse_fields(text):
+    """Pull the known certificate fields out of recognised text."""
+    fields = {}
+    for name, pattern in FIELD_PATTERNS.items():
+        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+        fields[name] = match.group(1).strip() if match else ''
+    return fields
+
+
+def extract_certificate(path, content_hash=None):
+    """
+    Extract certificate fields from a file, using the content-hash cache.
+
+    Pass content_hash when it is already known (content-addressed files) to
+    skip rehashing. Returns (CertificateExtraction, cached) where cached
+    tells whether OCR was skipped. Raises OCRUnavailable when the
+    configured engine cannot run.
+    """
+    engine = get_engine()
+    content_hash = content_hash or file_sha256(path)
+    cached = CertificateExtraction.objects.filter(content_hash=content_hash, engine=engine.name).first()
+    if cached:
+        return cached, True
+
+    page_count = count_pages(path)
+    pages = recognise_pages(path, page_count)
+
+    text = '\n'.join(page_text for page_text, _ in pages)
+    fields = parse_fields(text)
+    found = sum(1 for value in fields.values() if value)
+    confidence = (sum(score for _, score in pages) / len(pages)) * found / len(fields)
+
+    try:
+        extraction = CertificateExtraction.objects.create(
+            content_hash=content_hash,
+            extracted_data=fields,
+            confidence_score=round(confidence, 3),
+            page_count=page_count,
+            engine=engine.name,
+        )
+    except IntegrityError:
+        # The same bytes were extracted concurrently; keep the first result
+        extraction = CertificateExtraction.objects.get(content_hash=content_hash, engine=engine.name)
+    return extraction, False
+
+
+def lookup(content_hash):
+    """Return the configured engine's cached extraction for a content hash, if any."""
+    return CertificateExtraction.objects.filter(content_hash=content_hash, engine=engine_class().name).first()
+
+
+async def alookup(content_hash):
+    """Async version of lookup()."""
+    return await CertificateExtraction.objects.filter(
+        content_hash=content_hash, engine=engine_class().name,
+    ).afirst()
+
+
+def to_response(extraction, cached):
+    """Serialise an extraction for the API, with compliance judged against today."""
+    data = dict(extraction.extracted_data)
+    try:
+        expired = date.fromisoformat(data.get('expiry_date', '')) < timezone.localdate()
+        data['compliance_status'] = 'EXPIRED' if expired else 'VALID'
+    except ValueError:
+        data['compliance_status'] = 'UNKNOWN'
+
+    return {
+        'extracted_data': data,
+        'confidence_score': extraction.confidence_score,
+        'page_count': extraction.page_count,
+        'content_hash': extraction.content_hash,
+        'cached': cached,
+    }
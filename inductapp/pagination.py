@@ -0,0 +1,138 @@
+"""
+Keyset (seek) pagination for the ranklist.
+
+Each sort mode orders by an indexed column plus a unique tie-breaker, and the
+cursor carries the last row's values for both, so fetching any page is a
+bounded index range scan instead of an OFFSET over the whole table. A
+cursor whose values do not fit the sort columns is ignored (first page).
+"""
+import base64
+import json
+from datetime import date
+
+from django.db.models import F, Q
+
+
+# sort mode -> (column, descending, tie-breaker column)
+SORT_KEYS = {
+    'rank': ('rank', False, 'train_number'),
+    'mileage': ('current_mileage', True, 'id'),
+    'date': ('last_service_date', True, 'id'),
+}
+
+
+# Type of each sort column's cursor value (nulls are allowed for dates only)
+CURSOR_TYPES = {
+    'rank': int,
+    'current_mileage': int,
+    'last_service_date': date,
+    'train_number': str,
+    'id': int,
+}
+
+
+def get_sort_key(sort_by):
+    """Return the sort key for a mode, defaulting to rank."""
+    return SORT_KEYS.get(sort_by, SORT_KEYS['rank'])
+
+
+def order_queryset(queryset, sort_by):
+    """Order a queryset by the sort mode's column and tie-breaker."""
+    column, descending, tiebreak = get_sort_key(sort_by)
+    primary = F(column).desc(nulls_last=True) if descending else F(column).asc(nulls_last=True)
+    return queryset.order_by(primary, tiebreak)
+
+
+def encode_cursor(value, tiebreak):
+    """Encode the last row's sort values into an opaque URL-safe cursor."""
+    if isinstance(value, date):
+        value = value.isoformat()
+    payload = json.dumps([value, tiebreak], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort_by='rank'):
+    """
+    Decode a cursor into (value, tiebreak) typed for the sort mode's columns;
+    returns None if it is malformed.
+    """
+    column, _, tiebreak_column = get_sort_key(sort_by)
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, tiebreak = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return _typed(column, value, nullable=True), _typed(tiebreak_column, tiebreak)
+    except (ValueError, TypeError):
+        return None
+
+
+def _typed(column, value, nullable=False):
+    kind = CURSOR_TYPES[column]
+    if value is None and nullable and kind is date:
+        return None
+    if kind is date and isinstance(value, str):
+        return date.fromisoformat(value)
+    # bool is an int subclass, but never a valid sort value
+    if isinstance(value, kind) and not isinstance(value, bool):
+        return value
+    raise TypeError(f'Bad cursor value for {column}')
+
+
+def seek(queryset, sort_by, cursor):
+    """
+    Filter a queryset to the rows that come after the cursor and hold a
+    value; the nulls of a nullable column come from null_tail().
+    """
+    decoded = decode_cursor(cursor, sort_by) if cursor else None
+    if decoded is None:
+        return queryset
+
+    column, descending, tiebreak = get_sort_key(sort_by)
+    value, last = decoded
+    after = Q(**{f'{tiebreak}__gt': last})
+
+    # Nulls sort last, so after a null only other nulls can follow
+    if value is None:
+        return queryset.filter(Q(**{f'{column}__isnull': True}) & after)
+
+    # column >= value AND (column > value OR tiebreak > last), mirrored for
+    # descending sorts: the first conjunct bounds the index range to seek
+    if descending:
+        bound, beyond = Q(**{f'{column}__lte': value}), Q(**{f'{column}__lt': value})
+    else:
+        bound, beyond = Q(**{f'{column}__gte': value}), Q(**{f'{column}__gt': value})
+    return queryset.filter(bound & (beyond | after))
+
+
+def null_tail(queryset, sort_by, cursor):
+    """
+    The rows with a null sort value that follow a cursor past the last
+    non-null one, or None if there are none to add.
+
+    Kept out of seek() because an OR with IS NULL turns its range seek into
+    a scan of the whole index.
+    """
+    column, _, tiebreak = get_sort_key(sort_by)
+    decoded = decode_cursor(cursor, sort_by) if cursor else None
+    if decoded is None or decoded[0] is None or not queryset.model._meta.get_field(column).null:
+        return None
+    return queryset.filter(**{f'{column}__isnull': True}).order_by(tiebreak)
+
+
+def keyset_page(queryset, sort_by, cursor=None, page_size=24):
+    """
+    Return one page of an ordered queryset.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    column, _, tiebreak = get_sort_key(sort_by)
+    rows = list(seek(order_queryset(queryset, sort_by), sort_by, cursor)[:page_size + 1])
+    tail = null_tail(queryset, sort_by, cursor)
+    if tail is not None and len(rows) <= page_size:
+        rows += tail[:page_size + 1 - len(rows)]
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, column), getattr(last, tiebreak))
+    return rows, next_cursor
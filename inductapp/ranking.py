@@ -0,0 +1,345 @@
+"""
+Induction ranking engine.
+
+Loads the whole fleet (with its materialised certificate expiry and open job
+card counts) and its mileage wear in one pass, scores every train with
+vectorised multi-objective terms and writes all ranks back with a single bulk_update.
+Rank 1 is the train best suited for revenue service tomorrow.
+"""
+import bisect
+import threading
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import events, history
+from .fleetcache import bump_fleet_version, fleet_version
+from .mileage import days_to_threshold, fleet_wear
+from .models import Train
+from .worklist import PRIORITY_FIELDS
+
+
+# Relative weight of each objective; override with INDUCTION_RANKING_WEIGHTS
+DEFAULT_WEIGHTS = {
+    'mileage': 0.25,
+    'maintenance': 0.30,
+    'certificates': 0.25,
+    'cleaning': 0.10,
+    'wear': 0.10,
+}
+
+# Status is a hard tier: a train with critical issues never outranks a
+# ready one, whatever its other terms look like.
+STATUS_TIERS = {'ok': 0, 'minor_maintenance': 1, 'cannot_schedule': 2}
+
+PRIORITY_WEIGHTS = {'low': 0.25, 'medium': 0.5, 'high': 1.0, 'critical': 3.0}
+
+# Certificates expiring within this many days start to cost rank
+CERTIFICATE_HORIZON_DAYS = 30
+
+# Trains projected to reach their service interval within this many days start to cost rank
+WEAR_HORIZON_DAYS = 14
+
+COMPONENTS = ('mileage', 'maintenance', 'certificates', 'cleaning', 'wear')
+
+FLEET_FIELDS = (
+    'id', 'train_number', 'status', 'rank', 'current_mileage', 'cleaning_status', 'certificates_valid_until',
+    *PRIORITY_FIELDS.values(),
+)
+
+
+def get_weights(weights=None):
+    """Return the configured objective weights, normalised to sum to 1."""
+    merged = dict(DEFAULT_WEIGHTS)
+    merged.update(getattr(settings, 'INDUCTION_RANKING_WEIGHTS', {}))
+    merged.update(weights or {})
+    total = sum(merged[name] for name in COMPONENTS) or 1.0
+    return {name: merged[name] / total for name in COMPONENTS}
+
+
+def load_fleet_frame(today=None):
+    """Load trains, open job card backlog, certificate expiry and mileage wear into one DataFrame."""
+    today = today or timezone.localdate()
+
+    frame = pd.DataFrame.from_records(
+        list(Train.objects.order_by().values_list(*FLEET_FIELDS)),
+        columns=FLEET_FIELDS,
+    )
+    if frame.empty:
+        frame['job_backlog'] = pd.Series(dtype=float)
+        frame['cert_days_left'] = pd.Series(dtype=float)
+        frame['km_since_service'] = pd.Series(dtype=float)
+        frame['daily_km'] = pd.Series(dtype=float)
+        return frame
+
+    # Weighted open job cards, from the counts kept on each train
+    frame['job_backlog'] = sum(
+        frame[field].astype(float) * PRIORITY_WEIGHTS[priority] for priority, field in PRIORITY_FIELDS.items()
+    )
+
+    # Earliest certificate expiry, materialised on the train
+    earliest = pd.to_datetime(frame['certificates_valid_until'])
+    frame['cert_days_left'] = (earliest - pd.Timestamp(today)).dt.days.astype(float)
+
+    # Km since last service and recent daily average, from the mileage series
+    wear = fleet_wear(today)
+    frame['km_since_service'] = frame['id'].map(wear['km_since_service'])
+    frame['daily_km'] = frame['id'].map(wear['daily_km'])
+
+    return frame
+
+
+def fleet_stats(frame):
+    """Return the fleet-wide normalisation constants used by compute_scores."""
+    mileage = frame['current_mileage'].to_numpy(dtype=float)
+    if mileage.size == 0:
+        return {'mileage_mean': 0.0, 'mileage_std': 1.0}
+    return {
+        'mileage_mean': float(mileage.mean()),
+        'mileage_std': float(mileage.std()) or 1.0,
+    }
+
+
+def compute_scores(frame, weights=None, stats=None):
+    """
+    Score every row of a fleet frame.
+
+    Each component is a penalty in [0, 1]; the weighted sum is added to the
+    status tier so lower scores rank first. Returns a DataFrame with one
+    column per component plus 'tier' and 'score', aligned with frame.
+    """
+    weights = get_weights(weights)
+    stats = stats or fleet_stats(frame)
+
+    # Mileage balancing: trains above the fleet average should rest
+    mileage = frame['current_mileage'].to_numpy(dtype=float)
+    z = (mileage - stats['mileage_mean']) / stats['mileage_std']
+    mileage_term = 1.0 / (1.0 + np.exp(-z))
+
+    # Maintenance backlog saturates so one huge backlog does not flatten the rest
+    backlog = frame['job_backlog'].to_numpy(dtype=float)
+    maintenance_term = backlog / (backlog + 1.0)
+
+    # Certificates: expired costs the full term, near expiry costs linearly
+    days_left = frame['cert_days_left'].to_numpy(dtype=float)
+    certificates_term = np.clip(1.0 - days_left / CERTIFICATE_HORIZON_DAYS, 0.0, 1.0)
+    certificates_term = np.where(np.isnan(days_left), 0.0, certificates_term)
+
+    # Cleaning: 'Clean' is free, 'Needs deep cleaning' costs the most
+    cleaning = frame['cleaning_status'].fillna('').str.lower()
+    cleaning_term = np.where(
+        cleaning.str.contains('deep'), 1.0,
+        np.where(cleaning.str.startswith('clean'), 0.0, 0.5),
+    )
+
+    # Wear: trains about to reach their service interval should run less
+    if 'km_since_service' in frame:
+        days_due = days_to_threshold(frame['km_since_service'], frame['daily_km'])
+        wear_term = np.clip(1.0 - days_due / WEAR_HORIZON_DAYS, 0.0, 1.0)
+        wear_term = np.where(np.isnan(days_due), 0.0, wear_term)
+    else:
+        wear_term = np.zeros(len(frame))
+
+    tier = frame['status'].map(STATUS_TIERS).fillna(STATUS_TIERS['cannot_schedule']).to_numpy(dtype=float)
+
+    components = pd.DataFrame({
+        'mileage': mileage_term,
+        'maintenance': maintenance_term,
+        'certificates': certificates_term,
+        'cleaning': cleaning_term,
+        'wear': wear_term,
+    }, index=frame.index)
+    weighted = sum(components[name].to_numpy() * weights[name] for name in COMPONENTS)
+
+    components['tier'] = tier
+    components['score'] = tier + weighted
+    return components
+
+
+def assign_ranks(frame, scores):
+    """Return 1-based ranks ordered by score, ties broken by train number."""
+    order = np.lexsort((frame['train_number'].to_numpy(), scores['score'].to_numpy()))
+    ranks = np.empty(len(order), dtype=int)
+    ranks[order] = np.arange(1, len(order) + 1)
+    return ranks
+
+
+def rank_fleet(weights=None, today=None, dry_run=False):
+    """
+    Recompute the rank of every train and persist the changed ones.
+
+    Returns the scored fleet frame with a 'new_rank' column. Only rows whose
+    rank actually moved are written, in one bulk_update.
+    """
+    frame = load_fleet_frame(today=today)
+    if frame.empty:
+        frame['new_rank'] = pd.Series(dtype=int)
+        return frame
+
+    scores = compute_scores(frame, weights=weights)
+    frame = frame.join(scores)
+    frame['new_rank'] = assign_ranks(frame, scores)
+
+    if not dry_run:
+        changed = frame[frame['new_rank'] != frame['rank']]
+        save_ranks(dict(zip(changed['id'].tolist(), changed['new_rank'].tolist())))
+        invalidate_rank_index()
+
+    return frame
+
+
+def save_ranks(ranks_by_id):
+    """Write {train_id: rank} in a single bulk_update."""
+    if not ranks_by_id:
+        return 0
+    trains = [Train(pk=pk, rank=rank) for pk, rank in ranks_by_id.items()]
+    with transaction.atomic():
+        Train.objects.bulk_update(trains, ['rank'], batch_size=500)
+        # bulk_update sends no signals
+        events.publish_ranks(ranks_by_id)
+        history.record_changes({pk: {'rank': rank} for pk, rank in ranks_by_id.items()})
+        bump_fleet_version()
+    return len(trains)
+
+
+# Train fields whose edits move the train in the ranking
+RANKED_FIELDS = ('status', 'current_mileage', 'cleaning_status')
+
+
+class RankIndex:
+    """
+    Cached per-train score components kept in a sorted index.
+
+    Built once from a full scoring pass; afterwards a single edited train is
+    rescored against the cached fleet constants and moved within the sorted
+    index, so only the ranks between its old and new position shift.
+
+    The index is only valid for the fleet version it was built at (or last
+    wrote): any other process's change to trains, job cards or certificates
+    bumps the version, and the next edit rebuilds it from the database.
+    """
+
+    def __init__(self, frame, weights=None):
+        self.weights = get_weights(weights)
+        self.stats = fleet_stats(frame)
+        self.built_at = timezone.now()
+        self.version = fleet_version()
+        self.synced = False
+        scores = compute_scores(frame, weights=self.weights, stats=self.stats)
+        frame = frame.join(scores)
+
+        self.rows = {
+            row['id']: row
+            for row in frame[['id', 'train_number', 'status', 'current_mileage', 'cleaning_status',
+                              'job_backlog', 'cert_days_left', 'km_since_service', 'daily_km',
+                              *COMPONENTS, 'tier', 'score']].to_dict('records')
+        }
+        self.key_of = {pk: (row['score'], row['train_number'], pk) for pk, row in self.rows.items()}
+        self.keys = sorted(self.key_of.values())
+
+    def __contains__(self, train_id):
+        return train_id in self.rows
+
+    def __len__(self):
+        return len(self.keys)
+
+    def ranks(self):
+        """Return {train_id: rank} for the whole index."""
+        return {key[2]: position + 1 for position, key in enumerate(self.keys)}
+
+    def components(self, train_id):
+        """Return the cached score components of one train."""
+        row = self.rows[train_id]
+        return {name: row[name] for name in (*COMPONENTS, 'tier', 'score')}
+
+    def update(self, train):
+        """
+        Rescore one train and reposition it.
+
+        Returns {train_id: new_rank} for every train whose rank shifted.
+        """
+        row = self.rows[train.pk]
+        # Km run since the index was built count towards the next service
+        row['km_since_service'] += train.current_mileage - row['current_mileage']
+        row.update({
+            'train_number': train.train_number,
+            'status': train.status,
+            'current_mileage': train.current_mileage,
+            'cleaning_status': train.cleaning_status,
+        })
+        scores = compute_scores(pd.DataFrame([row]), weights=self.weights, stats=self.stats)
+        row.update(scores.iloc[0].to_dict())
+
+        old_position = bisect.bisect_left(self.keys, self.key_of[train.pk])
+        del self.keys[old_position]
+
+        new_key = (row['score'], row['train_number'], train.pk)
+        self.key_of[train.pk] = new_key
+        new_position = bisect.bisect_left(self.keys, new_key)
+        self.keys.insert(new_position, new_key)
+
+        low, high = sorted((old_position, new_position))
+        return {self.keys[position][2]: position + 1 for position in range(low, high + 1)}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_rank_index(refresh=False):
+    """Return the process-wide rank index, rebuilding it when stale."""
+    global _index
+    ttl = getattr(settings, 'INDUCTION_RANK_INDEX_TTL', 300)
+    with _index_lock:
+        stale = (
+            _index is None
+            or _index.version != fleet_version()
+            or (timezone.now() - _index.built_at).total_seconds() > ttl
+        )
+        if refresh or stale:
+            _index = RankIndex(load_fleet_frame())
+        return _index
+
+
+def invalidate_rank_index():
+    """Drop the cached index so the next edit rebuilds it from the database."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def rerank_train(train):
+    """
+    Incrementally re-rank one edited train and persist the shifted ranks.
+
+    Rebuilds the index when the train is missing from it (e.g. it was created
+    since the index was built) or the fleet changed since. The first edit
+    after a rebuild reconciles every stored rank once; later edits only touch
+    the ranks that shifted. Returns the number of rank rows written.
+
+    Call it in the same transaction as the train's save: that save's version
+    bump is then still pending, so the index is not needlessly rebuilt.
+    """
+    with transaction.atomic():
+        index = get_rank_index()
+        if train.pk not in index:
+            index = get_rank_index(refresh=True)
+
+        with _index_lock:
+            shifted = index.update(train)
+            if not index.synced:
+                shifted = index.ranks()
+                index.synced = True
+            # Ahead of the database until this commits; a rollback leaves it stale
+            index.version = None
+
+        stored = dict(Train.objects.filter(pk__in=shifted).values_list('id', 'rank'))
+        written = save_ranks({pk: rank for pk, rank in shifted.items() if stored.get(pk) != rank})
+
+        # Bumped last, so once committed the fleet is at this version unless someone else wrote
+        version = bump_fleet_version()
+        transaction.on_commit(lambda: setattr(index, 'version', version))
+    return written
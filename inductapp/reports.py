@@ -0,0 +1,231 @@
+"""
+Streaming report exports.
+
+Rows are read from the database with iterator(chunk_size=...) and encoded
+as the response is sent (CSV, NDJSON) or spooled chunk by chunk into a
+temporary file that is then streamed back (XLSX, Parquet), so memory use
+does not grow with the size of the report. abuild_response() is the ASGI
+counterpart: rows come from aiterator() and binary spooling runs on the
+worker pool.
+"""
+import csv
+import json
+import tempfile
+from datetime import date, datetime
+from itertools import islice
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .concurrency import run_in_executor
+from .models import Train
+
+
+REPORT_FIELDS = (
+    'rank', 'train_number', 'train_name', 'status',
+    'current_mileage', 'cleaning_status',
+    'current_stabling_bay', 'status_notes',
+)
+
+# Columns callers may pick with ?columns=
+EXPORT_FIELDS = REPORT_FIELDS + (
+    'id', 'last_service_date', 'maintenance_notes', 'created_at', 'updated_at',
+)
+
+CHUNK_SIZE = 2000
+
+# Formats encoded row by row as the response is sent
+STREAMED_FORMATS = ('csv', 'ndjson')
+
+# format -> (content type, file extension)
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class Echo:
+    """File-like object whose write() returns the value instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def parse_columns(param):
+    """Return the requested export columns, or the default report columns."""
+    if not param:
+        return list(REPORT_FIELDS)
+    columns = [column.strip() for column in param.split(',') if column.strip()]
+    unknown = [column for column in columns if column not in EXPORT_FIELDS]
+    if unknown:
+        raise ValueError(f'Unknown column(s): {", ".join(unknown)}')
+    return columns
+
+
+def filter_updated_between(queryset, updated_from=None, updated_to=None):
+    """
+    Restrict a queryset to rows whose updated_at date falls between two ISO
+    dates (inclusive).
+
+    This filters on each row's latest update only: a train edited inside the
+    range and again after it is left out. It does not reconstruct history.
+    """
+    try:
+        if updated_from:
+            queryset = queryset.filter(updated_at__date__gte=date.fromisoformat(updated_from))
+        if updated_to:
+            queryset = queryset.filter(updated_at__date__lte=date.fromisoformat(updated_to))
+    except ValueError:
+        raise ValueError('Dates must be in YYYY-MM-DD format')
+    return queryset
+
+
+def iter_batches(rows, size=CHUNK_SIZE):
+    """Group an iterator of rows into lists of at most size rows."""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_csv(rows, fieldnames):
+    """Yield a CSV header and then one encoded line per row dict."""
+    writer = csv.DictWriter(Echo(), fieldnames=fieldnames)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_ndjson(rows):
+    """Yield one JSON document per line."""
+    for row in rows:
+        yield json.dumps(row, default=str) + '\n'
+
+
+async def aiter_csv(rows, fieldnames):
+    """iter_csv() over an async iterator of row dicts."""
+    writer = csv.DictWriter(Echo(), fieldnames=fieldnames)
+    yield writer.writeheader()
+    async for row in rows:
+        yield writer.writerow(row)
+
+
+async def aiter_ndjson(rows):
+    """iter_ndjson() over an async iterator of row dicts."""
+    async for row in rows:
+        yield json.dumps(row, default=str) + '\n'
+
+
+async def aiter_file(fileobj, block_size=FileResponse.block_size):
+    """Yield a file's contents block by block, reading on the worker pool, then close it."""
+    try:
+        while True:
+            block = await run_in_executor(fileobj.read, block_size)
+            if not block:
+                return
+            yield block
+    finally:
+        fileobj.close()
+
+
+def write_xlsx(rows, fieldnames, fileobj):
+    """Write rows with openpyxl's write-only mode, which streams rows to disk."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Trains')
+    sheet.append(list(fieldnames))
+    for row in rows:
+        sheet.append([_excel_value(row[name]) for name in fieldnames])
+    workbook.save(fileobj)
+
+
+def _excel_value(value):
+    # Excel has no time zones
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+def write_parquet(rows, fieldnames, fileobj, model=Train):
+    """Write rows as Parquet, one row group per chunk. Requires pyarrow."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError('Parquet export requires the pyarrow package')
+
+    # Derive the schema from the model so all-null chunks keep their types
+    arrow_types = {
+        'CharField': pa.string(),
+        'TextField': pa.string(),
+        'IntegerField': pa.int64(),
+        'BigAutoField': pa.int64(),
+        'FloatField': pa.float64(),
+        'BooleanField': pa.bool_(),
+        'DateField': pa.date32(),
+        'DateTimeField': pa.timestamp('us', tz='UTC'),
+    }
+    schema = pa.schema([
+        (name, arrow_types.get(model._meta.get_field(name).get_internal_type(), pa.string()))
+        for name in fieldnames
+    ])
+
+    with pq.ParquetWriter(fileobj, schema) as writer:
+        for batch in iter_batches(rows):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+
+def build_response(rows, fieldnames, export_format, filename):
+    """Return a streaming response for rows in the requested format."""
+    content_type, extension = FORMATS[export_format]
+    filename = f'{filename}.{extension}'
+
+    if export_format == 'csv':
+        response = StreamingHttpResponse(iter_csv(rows, fieldnames), content_type=content_type)
+    elif export_format == 'ndjson':
+        response = StreamingHttpResponse(iter_ndjson(rows), content_type=content_type)
+    else:
+        # Binary formats are spooled to a temporary file, then streamed back
+        spool = spool_rows(rows, fieldnames, export_format)
+        return FileResponse(spool, as_attachment=True, filename=filename, content_type=content_type)
+
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+async def abuild_response(queryset, fieldnames, export_format, filename):
+    """build_response() for ASGI servers, taking a values() queryset."""
+    content_type, extension = FORMATS[export_format]
+    filename = f'{filename}.{extension}'
+
+    if export_format == 'csv':
+        content = aiter_csv(queryset.aiterator(chunk_size=CHUNK_SIZE), fieldnames)
+    elif export_format == 'ndjson':
+        content = aiter_ndjson(queryset.aiterator(chunk_size=CHUNK_SIZE))
+    else:
+        # FileResponse would be read into memory under ASGI; stream the spool instead
+        spool = await run_in_executor(
+            spool_rows, queryset.iterator(chunk_size=CHUNK_SIZE), fieldnames, export_format,
+        )
+        content = aiter_file(spool)
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def spool_rows(rows, fieldnames, export_format):
+    """Write rows in a binary format to a temporary file, rewound for reading."""
+    spool = tempfile.TemporaryFile()
+    writer = write_xlsx if export_format == 'xlsx' else write_parquet
+    try:
+        writer(rows, fieldnames, spool)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
@@ -0,0 +1,249 @@
+"""
+Retrieval index for the fleet assistant behind the chat.
+
+Train notes (status and maintenance), job cards (title and description)
+and certificates (name and extracted_data) are each stored as a
+SearchDocument with one SearchPosting per distinct term. The index is kept
+current incrementally: the model signals reindex the one row that changed
+and the import reindexes each bulk-written batch. A question is answered
+from the postings of its own terms only: one indexed query, then BM25
+scoring and the roll-up from documents to trains in NumPy.
+"""
+import re
+from collections import Counter
+from itertools import islice
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import Certificate, JobCard, SearchDocument, SearchPosting, Train
+
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Question words and words that occur in nearly every question
+STOP_WORDS = frozenset('''
+    a about all an and any are as at be by can do does for from has have how i in is it its
+    list me my no not of on or our show tell that the their there these this to was were
+    what when where which who why will with
+    fleet train issue problem
+'''.split())
+
+NOTE_FIELDS = frozenset(('status_notes', 'maintenance_notes'))
+
+SOURCE_LABELS = {'train': 'notes', 'job_card': 'job card', 'certificate': 'certificate'}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+BATCH_SIZE = 500
+
+
+def _stem(token):
+    # Light suffix stripping so "brakes" finds "brake" and "leaking" finds "leak"
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 5 and token.endswith('ing'):
+        return token[:-3]
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Split text into lowercase, stemmed index terms."""
+    terms = (_stem(token) for token in TOKEN_RE.findall((text or '').lower()))
+    return [term[:64] for term in terms if term not in STOP_WORDS and len(term) > 1]
+
+
+def train_text(train):
+    return '\n'.join(text for text in (train.status_notes, train.maintenance_notes) if text)
+
+
+def job_card_text(card):
+    return f'{card.title}\n{card.description}'
+
+
+def certificate_text(certificate):
+    return '\n'.join([certificate.name, *_flatten(certificate.extracted_data)])
+
+
+def _flatten(data):
+    # Every scalar value in a JSON document, depth first
+    if isinstance(data, dict):
+        for value in data.values():
+            yield from _flatten(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from _flatten(value)
+    elif data not in (None, ''):
+        yield str(data)
+
+
+def index_documents(source, rows):
+    """
+    (Re)index documents of one source from (object id, train id, text) rows.
+
+    A row whose text has no terms is dropped from the index.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    with transaction.atomic():
+        remove_documents(source, [object_id for object_id, _, _ in rows])
+
+        documents, counts = [], []
+        for object_id, train_id, text in rows:
+            terms = Counter(tokenize(text))
+            if terms:
+                documents.append(SearchDocument(
+                    source=source, object_id=object_id, train_id=train_id,
+                    text=text, length=sum(terms.values()),
+                ))
+                counts.append(terms)
+
+        SearchDocument.objects.bulk_create(documents, batch_size=BATCH_SIZE)
+        SearchPosting.objects.bulk_create(
+            [
+                SearchPosting(document=document, term=term, frequency=frequency)
+                for document, terms in zip(documents, counts)
+                for term, frequency in terms.items()
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+
+def remove_documents(source, object_ids):
+    """Drop documents (and their postings) from the index."""
+    SearchDocument.objects.filter(source=source, object_id__in=list(object_ids)).delete()
+
+
+def index_trains(trains):
+    """Reindex the notes of the given trains."""
+    index_documents('train', ((train.pk, train.pk, train_text(train)) for train in trains))
+
+
+def index_job_cards(cards):
+    """Reindex the given job cards."""
+    index_documents('job_card', ((card.pk, card.train_id, job_card_text(card)) for card in cards))
+
+
+def index_certificates(certificates):
+    """Reindex the given certificates."""
+    index_documents('certificate', (
+        (certificate.pk, certificate.train_id, certificate_text(certificate))
+        for certificate in certificates
+    ))
+
+
+def rebuild():
+    """Rebuild the whole index from the source tables; returns the document count."""
+    sources = (
+        (index_trains, Train.objects.only('status_notes', 'maintenance_notes')),
+        (index_job_cards, JobCard.objects.only('train_id', 'title', 'description')),
+        (index_certificates, Certificate.objects.only('train_id', 'name', 'extracted_data')),
+    )
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        for index, queryset in sources:
+            rows = queryset.order_by('pk').iterator(chunk_size=BATCH_SIZE)
+            while batch := list(islice(rows, BATCH_SIZE)):
+                index(batch)
+    return SearchDocument.objects.count()
+
+
+def search(query, limit=10):
+    """
+    Rank trains for a free-text question with BM25.
+
+    Returns (total matching trains, results), where results are the best
+    limit trains as JSON-serialisable dicts with their best-matching
+    snippets.
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return 0, []
+
+    postings = list(
+        SearchPosting.objects.filter(term__in=terms)
+        .values_list('document_id', 'term', 'frequency', 'document__length', 'document__train_id')
+    )
+    if not postings:
+        return 0, []
+    stats = SearchDocument.objects.aggregate(count=Count('id'), tokens=Sum('length'))
+
+    document_ids, term_names, frequency, length, train_ids = (np.array(column) for column in zip(*postings))
+    documents, document_index = np.unique(document_ids, return_inverse=True)
+    _, term_index = np.unique(term_names, return_inverse=True)
+    frequency, length = frequency.astype(float), length.astype(float)
+
+    # Each (document, term) pair is one posting, so postings per term is its document frequency
+    total, average_length = stats['count'], stats['tokens'] / stats['count']
+    df = np.bincount(term_index)
+    idf = np.log(1.0 + (total - df + 0.5) / (df + 0.5))
+    weight = idf[term_index] * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length / average_length))
+    document_score = np.bincount(document_index, weights=weight)
+
+    # A train scores the sum of its documents
+    document_train = np.empty(len(documents), dtype=np.int64)
+    document_train[document_index] = train_ids
+    trains, train_index = np.unique(document_train, return_inverse=True)
+    train_score = np.bincount(train_index, weights=document_score)
+    best = np.argsort(-train_score, kind='stable')[:limit]
+
+    # Up to three best documents per returned train
+    matches = {}
+    for position in best:
+        members = np.flatnonzero(train_index == position)
+        matches[position] = members[np.argsort(-document_score[members], kind='stable')[:3]]
+
+    found = Train.objects.only('train_number', 'train_name', 'status', 'rank').in_bulk(trains[best].tolist())
+    texts = SearchDocument.objects.only('source', 'text').in_bulk(
+        documents[np.concatenate(list(matches.values()))].tolist()
+    )
+
+    results = []
+    for position in best:
+        train = found.get(int(trains[position]))
+        if train is None:
+            continue
+        results.append({
+            'train_number': train.train_number,
+            'train_name': train.train_name,
+            'status': train.status,
+            'rank': train.rank,
+            'score': round(float(train_score[position]), 3),
+            'matches': [
+                {
+                    'source': texts[int(documents[member])].source,
+                    'snippet': snippet(texts[int(documents[member])].text, terms),
+                }
+                for member in matches[position]
+            ],
+        })
+    return len(trains), results
+
+
+def snippet(text, terms, width=140):
+    """Return the first line of text containing a query term, shortened to width."""
+    terms = set(terms)
+    lines = [line.strip() for line in re.split(r'[\n.;]+', text) if line.strip()]
+    line = next((line for line in lines if terms & set(tokenize(line))), lines[0] if lines else '')
+    return line if len(line) <= width else line[:width - 1].rstrip() + '…'
+
+
+def answer(question, limit=5):
+    """Answer a chat question from the index; None when nothing matches."""
+    total, results = search(question, limit)
+    if not results:
+        return None
+
+    lines = [
+        f'• {result["train_number"]} ({SOURCE_LABELS.get(match["source"], match["source"])}): {match["snippet"]}'
+        for result in results
+        for match in result['matches'][:1]
+    ]
+    heading = f'{total} train(s) match' + (f'; the top {len(results)}:' if total > len(results) else ':')
+    return {'response': '\n'.join([heading, *lines]), 'results': results}
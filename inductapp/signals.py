@@ -0,0 +1,136 @@
+"""
+Signal receivers, connected in InductappConfig.ready().
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import certificates, events, history, mileage, search, worklist
+from .fleetcache import bump_fleet_version
+from .models import Certificate, JobCard, Train
+from .storage import add_reference
+
+
+@receiver(pre_save, sender=Certificate)
+def remember_certificate_file(sender, instance, **kwargs):
+    """Note the file and train a certificate pointed to before this save."""
+    instance._previous_file, instance._previous_train_id = '', None
+    if instance.pk:
+        previous = Certificate.objects.filter(pk=instance.pk).values_list('file', 'train_id').first()
+        if previous:
+            instance._previous_file, instance._previous_train_id = previous[0] or '', previous[1]
+
+
+@receiver(post_save, sender=Certificate)
+def count_certificate_file(sender, instance, **kwargs):
+    """Move the blob reference when a certificate's file changes."""
+    previous, current = getattr(instance, '_previous_file', ''), instance.file.name or ''
+    if previous != current:
+        add_reference(current, 1)
+        add_reference(previous, -1)
+
+
+@receiver(post_delete, sender=Certificate)
+def release_certificate_file(sender, instance, **kwargs):
+    """Drop the blob reference of a deleted certificate."""
+    add_reference(instance.file.name, -1)
+
+
+@receiver(post_save, sender=Certificate)
+@receiver(post_delete, sender=Certificate)
+def refresh_certificate_horizon(sender, instance, **kwargs):
+    """Recompute the validity horizon of the certificate's train (and the one it moved from)."""
+    certificates.refresh_horizons([instance.train_id, getattr(instance, '_previous_train_id', None)])
+
+
+@receiver(pre_save, sender=JobCard)
+def remember_job_card_train(sender, instance, **kwargs):
+    """Note the train a job card belonged to before this save."""
+    instance._previous_train_id = None
+    if instance.pk:
+        instance._previous_train_id = JobCard.objects.filter(pk=instance.pk).values_list('train_id', flat=True).first()
+
+
+@receiver(post_save, sender=JobCard)
+@receiver(post_delete, sender=JobCard)
+def refresh_open_work(sender, instance, **kwargs):
+    """Recompute the open-work counts of the job card's train (and the one it moved from)."""
+    worklist.refresh_workloads([instance.train_id, getattr(instance, '_previous_train_id', None)])
+
+
+@receiver(post_save, sender=Train)
+@receiver(post_delete, sender=Train)
+@receiver(post_save, sender=JobCard)
+@receiver(post_delete, sender=JobCard)
+@receiver(post_save, sender=Certificate)
+@receiver(post_delete, sender=Certificate)
+def fleet_changed(sender, **kwargs):
+    """Invalidate fleet-derived caches after any train, job card or certificate change."""
+    bump_fleet_version()
+
+
+@receiver(post_save, sender=Train)
+def stream_train_change(sender, instance, **kwargs):
+    """Push the saved train's state to open pages."""
+    events.publish_train(instance)
+
+
+@receiver(post_delete, sender=Train)
+def stream_train_delete(sender, instance, **kwargs):
+    """Tell open pages to drop a deleted train."""
+    events.publish_delete(instance.pk)
+
+
+@receiver(post_save, sender=Train)
+def record_train_history(sender, instance, created, update_fields=None, **kwargs):
+    """Append the fields this save changed to the train history."""
+    history.record_train(instance, created, update_fields)
+
+
+@receiver(pre_save, sender=Train)
+def remember_mileage(sender, instance, update_fields=None, **kwargs):
+    """Note whether this save moves the train's odometer."""
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    instance._mileage_changed = (
+        (update_fields is None or 'current_mileage' in update_fields)
+        and 'current_mileage' not in instance.get_deferred_fields()
+        and loaded.get('current_mileage') != instance.current_mileage
+    )
+
+
+@receiver(post_save, sender=Train)
+def record_mileage(sender, instance, **kwargs):
+    """Record a new odometer as today's mileage reading."""
+    if getattr(instance, '_mileage_changed', False):
+        mileage.record_readings({instance.pk: instance.current_mileage})
+
+
+@receiver(post_delete, sender=Train)
+def record_train_deletion(sender, instance, **kwargs):
+    """Mark a deleted train in the history."""
+    history.record_deleted(instance.pk)
+
+
+@receiver(post_save, sender=Train)
+def index_train(sender, instance, update_fields=None, **kwargs):
+    """Reindex a train's notes for the fleet assistant."""
+    if update_fields is None or search.NOTE_FIELDS & set(update_fields):
+        search.index_trains([instance])
+
+
+@receiver(post_save, sender=JobCard)
+def index_job_card(sender, instance, **kwargs):
+    """Reindex a saved job card."""
+    search.index_job_cards([instance])
+
+
+@receiver(post_save, sender=Certificate)
+def index_certificate(sender, instance, **kwargs):
+    """Reindex a saved certificate."""
+    search.index_certificates([instance])
+
+
+@receiver(post_delete, sender=JobCard)
+@receiver(post_delete, sender=Certificate)
+def unindex_document(sender, instance, **kwargs):
+    """Drop a deleted job card or certificate from the index (a train's go with its row)."""
+    search.remove_documents('job_card' if sender is JobCard else 'certificate', [instance.pk])
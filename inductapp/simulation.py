@@ -0,0 +1,226 @@
+"""
+"What-If" fault simulation.
+
+A FleetSnapshot holds the fleet frame (trains, weighted open job card
+backlog, earliest certificate expiry, km since service) and its baseline ranking as read-only
+NumPy columns. Each simulation applies its faults to a FaultOverlay, which
+copies only the columns a fault actually touches, rescores the fleet
+against the snapshot's normalisation constants and diffs the result against
+the baseline roster. Nothing is written to the database.
+
+The snapshot is rebuilt once the fleet version moves on (see fleetcache),
+so simulations start from the same roster the ranklist shows;
+WHAT_IF_SNAPSHOT_TTL only bounds how long one can live.
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+
+from .fleetcache import fleet_version
+from .models import STATUS_CHOICES
+from .ranking import (
+    COMPONENTS, PRIORITY_WEIGHTS, assign_ranks, compute_scores, fleet_stats,
+    get_weights, load_fleet_frame,
+)
+
+
+SNAPSHOT_COLUMNS = (
+    'id', 'train_number', 'status', 'current_mileage', 'cleaning_status',
+    'job_backlog', 'cert_days_left', 'km_since_service', 'daily_km',
+)
+
+VALID_STATUSES = {value for value, _ in STATUS_CHOICES}
+
+MAX_FAULTS = 50
+
+
+class FleetSnapshot:
+    """Immutable fleet columns and baseline ranking shared by every simulation."""
+
+    def __init__(self, frame, weights=None, version=None):
+        self.weights = get_weights(weights)
+        self.stats = fleet_stats(frame)
+        self.built_at = timezone.now()
+        # The fleet version the frame was read at
+        self.version = version
+
+        self.columns = {}
+        for name in SNAPSHOT_COLUMNS:
+            column = frame[name].to_numpy(copy=True)
+            column.flags.writeable = False
+            self.columns[name] = column
+        self.position = {number: index for index, number in enumerate(self.columns['train_number'])}
+
+        self.scores = self.score(self.columns)
+        self.ranks = assign_ranks(self.scores, self.scores)
+        self.ranks.flags.writeable = False
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def score(self, columns):
+        """Score a set of fleet columns against the snapshot's constants."""
+        frame = pd.DataFrame(columns)
+        scores = compute_scores(frame, weights=self.weights, stats=self.stats)
+        scores['train_number'] = columns['train_number']
+        return scores
+
+
+class FaultOverlay:
+    """
+    Copy-on-write view of a snapshot.
+
+    Reads fall through to the shared snapshot columns; the first write to a
+    column copies that column only.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.columns = dict(snapshot.columns)
+        self.copied = set()
+
+    def get(self, name, index):
+        return self.columns[name][index]
+
+    def set(self, name, index, value):
+        if name not in self.copied:
+            self.columns[name] = self.columns[name].copy()
+            self.copied.add(name)
+        self.columns[name][index] = value
+
+    def apply(self, fault):
+        """
+        Apply one fault dict to the overlay.
+
+        A fault names a 'train' (train number) and any of: 'status',
+        'cleaning_status', 'add_mileage', 'job_card' (priority of a new open
+        job card) and 'certificate_days_left' (days until a certificate
+        lapses; 0 or less means expired).
+        """
+        number = str(fault.get('train', '')).strip()
+        index = self.snapshot.position.get(number)
+        if index is None:
+            raise ValueError(f'Unknown train "{number}"')
+
+        known = {'train', 'status', 'cleaning_status', 'add_mileage', 'job_card', 'certificate_days_left'}
+        unknown = set(fault) - known
+        if unknown:
+            raise ValueError(f'Unknown fault field(s): {", ".join(sorted(unknown))}')
+        if len(fault) == 1:
+            raise ValueError(f'Fault for {number} changes nothing')
+
+        if 'status' in fault:
+            if fault['status'] not in VALID_STATUSES:
+                raise ValueError(f'Unknown status "{fault["status"]}"')
+            self.set('status', index, fault['status'])
+
+        if 'cleaning_status' in fault:
+            self.set('cleaning_status', index, str(fault['cleaning_status']))
+
+        if 'add_mileage' in fault:
+            try:
+                added = int(fault['add_mileage'])
+            except (TypeError, ValueError):
+                raise ValueError('add_mileage must be a whole number of km')
+            self.set('current_mileage', index, max(0, self.get('current_mileage', index) + added))
+            self.set('km_since_service', index, np.maximum(0.0, self.get('km_since_service', index) + added))
+
+        if 'job_card' in fault:
+            if fault['job_card'] not in PRIORITY_WEIGHTS:
+                raise ValueError(f'Unknown job card priority "{fault["job_card"]}"')
+            self.set('job_backlog', index, self.get('job_backlog', index) + PRIORITY_WEIGHTS[fault['job_card']])
+
+        if 'certificate_days_left' in fault:
+            try:
+                days = float(fault['certificate_days_left'])
+            except (TypeError, ValueError):
+                raise ValueError('certificate_days_left must be a number')
+            current = self.get('cert_days_left', index)
+            # A lapsing certificate only matters if it is the earliest one
+            self.set('cert_days_left', index, days if np.isnan(current) else min(current, days))
+
+
+def simulate(snapshot, faults):
+    """
+    Re-rank the fleet with hypothetical faults applied.
+
+    Returns a JSON-serialisable dict with the simulated roster, the trains
+    whose rank moved, and the change in service-ready trains.
+    """
+    if len(faults) > MAX_FAULTS:
+        raise ValueError(f'At most {MAX_FAULTS} faults per simulation')
+
+    started = time.perf_counter()
+    overlay = FaultOverlay(snapshot)
+    for fault in faults:
+        if not isinstance(fault, dict):
+            raise ValueError('Each fault must be an object')
+        overlay.apply(fault)
+
+    scores = snapshot.score(overlay.columns)
+    ranks = assign_ranks(scores, scores)
+
+    base_scores = snapshot.scores['score'].to_numpy()
+    numbers = snapshot.columns['train_number']
+    statuses = overlay.columns['status']
+    tiers = scores['tier'].to_numpy()
+
+    moved = np.flatnonzero((ranks != snapshot.ranks) | (scores['score'].to_numpy() != base_scores))
+    diff = sorted(
+        (
+            {
+                'train_number': numbers[index],
+                'rank_before': int(snapshot.ranks[index]),
+                'rank_after': int(ranks[index]),
+                'score_before': round(float(base_scores[index]), 4),
+                'score_after': round(float(scores['score'].iat[index]), 4),
+            }
+            for index in moved
+        ),
+        key=lambda change: change['rank_after'],
+    )
+
+    roster = [
+        {
+            'rank': int(ranks[index]),
+            'train_number': numbers[index],
+            'status': statuses[index],
+            'score': round(float(scores['score'].iat[index]), 4),
+            **{name: round(float(scores[name].iat[index]), 4) for name in COMPONENTS},
+        }
+        for index in np.argsort(ranks)
+    ]
+
+    return {
+        'roster': roster,
+        'diff': diff,
+        'service_ready_before': int((snapshot.scores['tier'].to_numpy() == 0).sum()),
+        'service_ready_after': int((tiers == 0).sum()),
+        'snapshot_taken_at': snapshot.built_at.isoformat(),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot(refresh=False):
+    """Return the process-wide fleet snapshot, reloading it when the fleet has changed."""
+    global _snapshot
+    ttl = getattr(settings, 'WHAT_IF_SNAPSHOT_TTL', 60)
+    with _snapshot_lock:
+        # Read before the frame: a write during the load then forces the next rebuild
+        version = fleet_version()
+        stale = (
+            _snapshot is None
+            or _snapshot.version != version
+            or (timezone.now() - _snapshot.built_at).total_seconds() > ttl
+        )
+        if refresh or stale:
+            _snapshot = FleetSnapshot(load_fleet_frame(), version=version)
+        return _snapshot
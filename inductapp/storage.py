@@ -0,0 +1,118 @@
+"""
+Content-addressed, deduplicating file storage.
+
+Uploads are written to a temporary file in chunks while being hashed, then
+moved to blobs/<aa>/<bb>/<sha256><ext>. A file whose content already exists
+is discarded instead of being stored again under a random suffix. Each blob
+has a StoredBlob row whose ref_count is maintained by the Certificate
+signals; ``manage.py gc_blobs`` deletes blobs nobody references any more.
+"""
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils import timezone
+
+
+BLOB_DIR = 'blobs'
+TEMP_DIR = os.path.join(BLOB_DIR, 'tmp')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by the SHA-256 of their content."""
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from content in _save, so collisions are duplicates
+        return name
+
+    def _save(self, name, content):
+        from .models import StoredBlob
+
+        temp_dir = self.path(TEMP_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+        temp_path = os.path.join(temp_dir, uuid.uuid4().hex)
+
+        digest = hashlib.sha256()
+        size = 0
+        with open(temp_path, 'wb') as destination:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                size += len(chunk)
+                destination.write(chunk)
+
+        content_hash = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        blob_name = '/'.join((BLOB_DIR, content_hash[:2], content_hash[2:4], content_hash + extension))
+        blob_path = self.path(blob_name)
+
+        if os.path.exists(blob_path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(temp_path, blob_path)
+            if self.file_permissions_mode is not None:
+                os.chmod(blob_path, self.file_permissions_mode)
+
+        # Saving again restarts the grace period before an unreferenced blob is collected
+        StoredBlob.objects.update_or_create(
+            name=blob_name,
+            defaults={'content_hash': content_hash, 'size': size, 'last_saved_at': timezone.now()},
+        )
+        return blob_name
+
+
+_storage = None
+
+
+def blob_storage():
+    """Return the shared content-addressed storage (usable as a FileField storage callable)."""
+    global _storage
+    if _storage is None:
+        _storage = ContentAddressedStorage()
+    return _storage
+
+
+def content_hash_of(name):
+    """Return the SHA-256 a blob name was derived from."""
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def add_reference(name, delta=1):
+    """Adjust a blob's reference count."""
+    from .models import StoredBlob
+
+    if name:
+        StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') + delta)
+
+
+def collect_garbage(grace=timedelta(hours=24)):
+    """
+    Delete unreferenced blobs and abandoned temp files older than grace.
+
+    Returns (blobs_deleted, bytes_freed, temp_files_deleted).
+    """
+    from .models import StoredBlob
+
+    storage = blob_storage()
+    cutoff = timezone.now() - grace
+
+    blobs_deleted = bytes_freed = 0
+    for blob in StoredBlob.objects.filter(ref_count__lte=0, last_saved_at__lt=cutoff).iterator():
+        # Re-check under the filter so a concurrent reference keeps the blob
+        if StoredBlob.objects.filter(pk=blob.pk, ref_count__lte=0).delete()[0]:
+            storage.delete(blob.name)
+            blobs_deleted += 1
+            bytes_freed += blob.size
+
+    temp_deleted = 0
+    temp_dir = storage.path(TEMP_DIR)
+    if os.path.isdir(temp_dir):
+        for entry in os.scandir(temp_dir):
+            if entry.is_file() and entry.stat().st_mtime < cutoff.timestamp():
+                os.remove(entry.path)
+                temp_deleted += 1
+
+    return blobs_deleted, bytes_freed, temp_deleted
@@ -0,0 +1,193 @@
+"""
+Batch fault sweep for contingency planning.
+
+Loads the fleet once, scores it with the ranking engine and evaluates every
+combination of k failing service-eligible trains. Eligible scores are
+sorted and placed in shared memory; pool workers attach to that block and
+evaluate all combinations starting with one given train, vectorised in
+NumPy, returning only aggregates. The sweep reports the service shortfall
+(required trains that cannot be fielded) and, per scenario, the roster
+degradation: the rise in the summed score of the trains fielded once the
+failed ones are replaced by the next best.
+"""
+import time
+from itertools import combinations, islice
+from math import comb
+from multiprocessing import shared_memory
+
+import numpy as np
+from django.conf import settings
+
+from .concurrency import process_pool
+from .ranking import compute_scores, load_fleet_frame
+
+
+MAX_SCENARIOS = 5_000_000
+
+# A required train that cannot be fielded costs more than any fielded one
+# (the worst status tier plus the full weighted penalty)
+MISSING_TRAIN_COST = 3.0
+
+# Combinations are built and evaluated in blocks of this many rows
+BLOCK_SIZE = 50_000
+
+
+def eligible_fleet(frame):
+    """Return (train numbers, scores) of service-eligible trains, best first."""
+    if frame.empty:
+        return [], np.empty(0)
+    scores = compute_scores(frame)
+    expired = frame['cert_days_left'].to_numpy(dtype=float) < 0
+    eligible = (scores['tier'].to_numpy() == 0) & ~expired
+
+    numbers = frame['train_number'].to_numpy()[eligible]
+    values = scores['score'].to_numpy()[eligible]
+    order = np.argsort(values, kind='stable')
+    return numbers[order].tolist(), values[order]
+
+
+def evaluate_block(positions, sorted_scores, prefix, required):
+    """
+    Evaluate a block of scenarios.
+
+    positions is a (scenarios, k) array of failed train positions in the
+    sorted eligible order, each row ascending. Returns the roster loss of
+    each scenario: how much the summed score of the fielded trains rises,
+    counting each required train that cannot be fielded at MISSING_TRAIN_COST.
+    """
+    count, size = positions.shape
+    available = len(sorted_scores)
+
+    # The roster takes the best remaining trains: each failure inside the
+    # current cut-off pushes the cut-off one position further down
+    cutoff = np.full(count, required)
+    for column in range(size):
+        cutoff += positions[:, column] < cutoff
+    cutoff = np.minimum(cutoff, available)
+
+    failed_inside = positions < cutoff[:, None]
+    served = prefix[cutoff] - np.where(failed_inside, sorted_scores[positions], 0.0).sum(axis=1)
+    missing = required - (cutoff - failed_inside.sum(axis=1))
+
+    baseline = prefix[min(required, available)] + max(0, required - available) * MISSING_TRAIN_COST
+    return served + missing * MISSING_TRAIN_COST - baseline
+
+
+def _sweep_from(shm_name, available, required, size, first):
+    # Runs in a pool worker: every scenario whose lowest failed position is first
+    block = shared_memory.SharedMemory(name=shm_name)
+    sorted_scores = None
+    try:
+        sorted_scores = np.ndarray((available,), dtype=np.float64, buffer=block.buf)
+        prefix = np.concatenate(([0.0], np.cumsum(sorted_scores)))
+
+        worst_loss = -np.inf
+        worst_scenario = None
+        loss_sum = np.zeros(available)
+        loss_max = np.zeros(available)
+        scenarios = 0
+
+        rest = combinations(range(first + 1, available), size - 1)
+        while True:
+            tails = list(islice(rest, BLOCK_SIZE))
+            if not tails:
+                break
+            positions = np.empty((len(tails), size), dtype=np.int64)
+            positions[:, 0] = first
+            if size > 1:
+                positions[:, 1:] = tails
+            loss = evaluate_block(positions, sorted_scores, prefix, required)
+
+            best = int(np.argmax(loss))
+            if loss[best] > worst_loss:
+                worst_loss = float(loss[best])
+                worst_scenario = positions[best].tolist()
+
+            flat = positions.ravel()
+            repeated = np.repeat(loss, size)
+            loss_sum += np.bincount(flat, weights=repeated, minlength=available)
+            np.maximum.at(loss_max, flat, repeated)
+            scenarios += len(positions)
+
+        return {
+            'scenarios': scenarios,
+            'worst_loss': worst_loss,
+            'worst_scenario': worst_scenario,
+            'loss_sum': loss_sum,
+            'loss_max': loss_max,
+        }
+    finally:
+        del sorted_scores
+        block.close()
+
+
+def sweep(size=2, required=None, workers=None, top=10, frame=None):
+    """
+    Evaluate every combination of size failing eligible trains.
+
+    required is the number of trains the timetable needs in service
+    (INDUCTION_SERVICE_TRAINS by default). Returns a JSON-serialisable
+    summary: worst-case shortfall, the scenario with the worst roster
+    degradation, and the top most critical trains.
+    """
+    started = time.perf_counter()
+    frame = load_fleet_frame() if frame is None else frame
+    numbers, sorted_scores = eligible_fleet(frame)
+    available = len(numbers)
+
+    if required is None:
+        required = getattr(settings, 'INDUCTION_SERVICE_TRAINS', None) or available
+    if size < 1:
+        raise ValueError('Scenario size must be at least 1')
+    if size > available:
+        raise ValueError(f'Only {available} trains are eligible for service')
+    total = comb(available, size)
+    if total > MAX_SCENARIOS:
+        raise ValueError(f'{total} scenarios exceed the limit of {MAX_SCENARIOS}')
+
+    block = shared_memory.SharedMemory(create=True, size=max(sorted_scores.nbytes, 1))
+    try:
+        np.ndarray(sorted_scores.shape, dtype=np.float64, buffer=block.buf)[:] = sorted_scores
+        workers = workers or getattr(settings, 'SWEEP_WORKERS', None)
+        with process_pool(workers) as pool:
+            futures = [
+                pool.submit(_sweep_from, block.name, available, required, size, first)
+                for first in range(available - size + 1)
+            ]
+            parts = [future.result() for future in futures]
+    finally:
+        block.close()
+        block.unlink()
+
+    worst = max(parts, key=lambda part: part['worst_loss'])
+    loss_sum = sum(part['loss_sum'] for part in parts)
+    loss_max = np.max([part['loss_max'] for part in parts], axis=0)
+    shortfall = max(0, required - (available - size))
+
+    # Every train appears in the same number of scenarios
+    per_train = comb(available - 1, size - 1)
+    order = np.lexsort((-loss_sum, -loss_max))[:top]
+    critical = [
+        {
+            'train_number': numbers[index],
+            'service_position': int(index) + 1,
+            'max_roster_loss': round(float(loss_max[index]), 4),
+            'mean_roster_loss': round(float(loss_sum[index]) / per_train, 4),
+        }
+        for index in order
+    ]
+
+    return {
+        'scenario_size': size,
+        'scenarios': sum(part['scenarios'] for part in parts),
+        'eligible_trains': available,
+        'required_trains': required,
+        'worst_shortfall': shortfall,
+        'worst_scenario': {
+            'trains': [numbers[index] for index in worst['worst_scenario']],
+            'roster_loss': round(worst['worst_loss'], 4),
+            'shortfall': shortfall,
+        },
+        'critical_trains': critical,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,81 @@
+"""
+Handlers for the background job kinds; see jobs.py for the runner.
+"""
+import os
+
+from . import importer, ocr, ranking, sweep
+from .jobs import register, report_progress
+from .storage import blob_storage, content_hash_of
+
+
+@register('stage_upload')
+def stage_upload(job):
+    """Parse and validate a raw upload saved by upload_view."""
+    path = job.payload['path']
+    size = os.path.getsize(path) or 1
+    try:
+        with open(path, 'rb') as raw:
+            def progress(rows):
+                report_progress(job, raw.tell() / size, f'{rows} rows parsed')
+
+            summary = importer.stage_upload(raw, progress=progress)
+    finally:
+        os.remove(path)
+
+    summary['file_name'] = job.payload['file_name']
+    return summary
+
+
+@register('import_trains')
+def import_trains(job):
+    """Upsert a staged import into Train and re-rank the fleet."""
+    token = job.payload['token']
+    total = job.payload.get('valid_rows') or 1
+
+    def progress(rows):
+        report_progress(job, rows / total, f'{rows} of {total} rows written')
+
+    try:
+        counts = importer.upsert_trains(token, progress=progress)
+    finally:
+        importer.discard_staged(token)
+
+    counts['rejected'] += job.payload.get('rejected_rows', 0)
+    if counts['inserted'] or counts['updated']:
+        report_progress(job, message='Re-ranking fleet')
+        ranking.rank_fleet()
+    return counts
+
+
+@register('rank_fleet')
+def rank_fleet(job):
+    """Recompute every train's rank."""
+    frame = ranking.rank_fleet()
+    return {'ranked': len(frame)}
+
+
+@register('extract_certificate')
+def extract_certificate(job):
+    """OCR an uploaded certificate, reusing the cached result for identical files."""
+    file_name = job.payload['file_path']
+    storage = blob_storage()
+    if not storage.exists(file_name):
+        raise FileNotFoundError(file_name)
+
+    report_progress(job, message='Recognising pages')
+    extraction, cached = ocr.extract_certificate(storage.path(file_name), content_hash_of(file_name))
+
+    result = ocr.to_response(extraction, cached)
+    result['file_path'] = file_name
+    return result
+
+
+@register('fault_sweep')
+def fault_sweep(job):
+    """Evaluate every combination of failing trains (see sweep.py)."""
+    report_progress(job, message='Evaluating scenarios')
+    return sweep.sweep(
+        size=job.payload.get('size', 2),
+        required=job.payload.get('required'),
+        top=job.payload.get('top', 10),
+    )
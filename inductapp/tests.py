@@ -0,0 +1,459 @@
+import io
+import itertools
+import random
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import certificates, history, importer, induction, intents, mileage, pagination, ranking, sweep, worklist, yard
+from .models import Certificate, JobCard, MileageReading, MileageRollup, Train
+from .views import get_ranklist_page, save_train_field
+
+
+def one_track(*bays, kind='stabling', name='T0'):
+    return {'name': name, 'kind': kind, 'bays': list(bays)}
+
+
+class YardPlanTests(SimpleTestCase):
+    """plan_yard() against a brute-force search over every placement."""
+
+    def fewest_shunts(self, model, current, order, ibl):
+        # Every assignment of trains to bays: clear exits, IBL trains on the
+        # IBL, anyone else moved only onto a stabling track
+        departure = {train: position for position, train in enumerate(order)}
+        trains = sorted(set(current) | set(order) | set(ibl))
+        best = None
+        for bays in itertools.permutations(range(len(model)), len(trains)):
+            placement = dict(zip(trains, bays))
+            allowed = True
+            for train, bay in placement.items():
+                kind = model.tracks[model.bays[bay]['track']]['kind']
+                wanted = 'ibl' if train in ibl else 'stabling'
+                stays = model.bay_index(current.get(train)) == bay
+                if kind != wanted and (wanted == 'ibl' or not stays):
+                    allowed = False
+                    break
+            if not allowed or model.exit_sequence(placement, departure)[1]:
+                continue
+            shunts = sum(
+                1 for train, bay in placement.items()
+                if train in current and model.bay_index(current[train]) != bay
+            )
+            best = shunts if best is None else min(best, shunts)
+        return best
+
+    def test_swaps_the_first_train_out_to_the_front(self):
+        model = yard.YardModel({'tracks': [one_track('T0-0', 'T0-1', 'T0-2')]})
+        plan = yard.plan_yard(model, {'K1': 'T0-0', 'K2': 'T0-1', 'K0': 'T0-2'}, ['K0'])
+        self.assertEqual(plan['shunting_moves'], 2)
+        self.assertEqual(plan['assignments']['K0'], 'T0-0')
+        self.assertEqual(plan['blocked_departures'], [])
+
+    def test_leaves_a_clear_train_on_the_ibl(self):
+        model = yard.YardModel({'tracks': [
+            one_track('A-0', 'A-1'), one_track('I-0', 'I-1', kind='ibl', name='IBL'),
+        ]})
+        plan = yard.plan_yard(model, {'K0': 'I-0', 'K1': 'A-0'}, ['K0', 'K1'], ibl=['K2'])
+        self.assertEqual(plan['shunting_moves'], 0)
+        self.assertEqual(plan['assignments']['K2'], 'I-1')
+
+    def test_matches_brute_force_on_small_yards(self):
+        rng = random.Random(14)
+        for _ in range(300):
+            tracks = [
+                one_track(*[f'T{i}-{j}' for j in range(rng.randint(1, 3))],
+                          kind='ibl' if i == 0 and rng.random() < 0.4 else 'stabling', name=f'T{i}')
+                for i in range(rng.randint(1, 3))
+            ]
+            model = yard.YardModel({'tracks': tracks})
+            names = [bay['name'] for bay in model.bays]
+            trains = [f'K{i}' for i in range(rng.randint(1, min(5, len(names))))]
+            current = {train: bay for train, bay in zip(trains, rng.sample(names, len(trains))) if rng.random() < 0.8}
+            order = rng.sample(trains, rng.randint(0, len(trains)))
+            ibl = [train for train in trains if train not in order and rng.random() < 0.3]
+
+            best = self.fewest_shunts(model, current, order, ibl)
+            plan = yard.plan_yard(model, current, order, ibl)
+            with self.subTest(tracks=tracks, current=current, order=order, ibl=ibl):
+                if best is None:
+                    self.assertTrue(plan['unplaced'] or plan['blocked_departures'])
+                else:
+                    self.assertEqual(plan['unplaced'], [])
+                    self.assertEqual(plan['blocked_departures'], [])
+                    self.assertEqual(plan['shunting_moves'], best)
+
+
+class ImportTests(TestCase):
+    """Staging and upserting an upload."""
+
+    def setUp(self):
+        staging = tempfile.TemporaryDirectory()
+        self.addCleanup(staging.cleanup)
+        settings = override_settings(IMPORT_STAGING_ROOT=staging.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def stage(self, text):
+        upload = io.BytesIO(text.encode())
+        upload.name = 'trains.csv'
+        return importer.stage_upload(upload)
+
+    def test_later_duplicate_rows_win_and_are_counted_apart(self):
+        Train.objects.create(train_number='KM-001', train_name='Old', current_mileage=50)
+        summary = self.stage(
+            'Train Number,Train Name,Current Mileage\n'
+            'KM-001,First,100\n'
+            'km-001,Second,200\n'
+            'KM-900,New,5\n'
+            'KM-900,Newer,6\n'
+            'KM-901,Other,-1\n'
+        )
+        self.assertEqual((summary['valid_rows'], summary['rejected_rows']), (4, 1))
+
+        counts = importer.upsert_trains(summary['token'])
+        self.assertEqual(counts, {'inserted': 1, 'updated': 1, 'duplicates': 2, 'rejected': 0})
+        self.assertEqual(
+            list(Train.objects.order_by('train_number').values_list('train_number', 'train_name', 'current_mileage')),
+            [('KM-001', 'Second', 200), ('KM-900', 'Newer', 6)],
+        )
+
+
+class IntentTests(SimpleTestCase):
+
+    def test_this_week_looks_seven_days_ahead_on_any_day(self):
+        sunday = date(2026, 10, 18)
+        self.assertEqual(intents.period_range('week', sunday), (sunday, date(2026, 10, 25)))
+        self.assertEqual(intents.parse('certificates expiring this week').period, 'week')
+
+
+class InductionSolverTests(SimpleTestCase):
+    """solve() against every assignment of a few trains to the four roles."""
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(13)
+        for _ in range(200):
+            trains = int(rng.integers(1, 7))
+            matrix = rng.normal(size=(trains, len(induction.ROLES))) * 3
+            matrix[rng.random(matrix.shape) < 0.15] = induction.FORBIDDEN
+            matrix[:, induction.HOLD] = rng.normal(size=trains) * 0.5
+            capacity = [int(limit) for limit in rng.integers(0, 4, size=3)]
+            start = rng.integers(0, len(induction.ROLES), size=trains) if rng.random() < 0.5 else None
+
+            best = min(
+                sum(matrix[train, role] for train, role in enumerate(roles))
+                for roles in itertools.product(range(len(induction.ROLES)), repeat=trains)
+                if all(roles.count(role) <= capacity[role] for role in range(3))
+                and all(matrix[train, role] < induction.FORBIDDEN for train, role in enumerate(roles))
+            )
+            assignment, optimal, _ = induction.solve(matrix, capacity, start, time_budget=10)
+            with self.subTest(matrix=matrix.tolist(), capacity=capacity):
+                self.assertTrue(optimal)
+                self.assertTrue(all(np.bincount(assignment, minlength=4)[:3] <= capacity))
+                self.assertAlmostEqual(matrix[np.arange(trains), assignment].sum(), best)
+
+
+def roster_loss(sorted_scores, failed, required):
+    # Field the best required trains left; a missing one costs MISSING_TRAIN_COST
+    def roster(scores):
+        fielded = sorted(scores)[:required]
+        return sum(fielded) + (required - len(fielded)) * sweep.MISSING_TRAIN_COST
+
+    remaining = [score for position, score in enumerate(sorted_scores) if position not in failed]
+    return roster(remaining) - roster(sorted_scores)
+
+
+class SweepTests(SimpleTestCase):
+
+    def test_evaluate_block_matches_direct_rosters(self):
+        rng = np.random.default_rng(12)
+        for _ in range(100):
+            available = int(rng.integers(1, 9))
+            sorted_scores = np.sort(rng.random(available))
+            prefix = np.concatenate(([0.0], np.cumsum(sorted_scores)))
+            required = int(rng.integers(1, available + 2))
+            size = int(rng.integers(1, min(3, available) + 1))
+
+            positions = np.array(list(itertools.combinations(range(available), size)))
+            loss = sweep.evaluate_block(positions, sorted_scores, prefix, required)
+            expected = [roster_loss(sorted_scores, set(row), required) for row in positions.tolist()]
+            np.testing.assert_allclose(loss, expected, atol=1e-9)
+
+
+class SweepRunTests(TestCase):
+
+    def test_sweep_reports_the_worst_scenario(self):
+        for number in range(1, 7):
+            Train.objects.create(train_number=f'KM-{number:03d}', train_name='Test', current_mileage=number * 1000)
+        numbers, sorted_scores = sweep.eligible_fleet(ranking.load_fleet_frame())
+
+        result = sweep.sweep(size=2, required=4, workers=2)
+        losses = {
+            failed: roster_loss(sorted_scores, set(failed), 4)
+            for failed in itertools.combinations(range(len(numbers)), 2)
+        }
+        worst = max(losses, key=losses.get)
+        self.assertEqual(result['scenarios'], len(losses))
+        self.assertEqual(result['worst_shortfall'], max(0, 4 - (len(numbers) - 2)))
+        self.assertAlmostEqual(result['worst_scenario']['roster_loss'], losses[worst], places=4)
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Repeated sort values and undated trains so pages split inside ties and nulls
+        for number in range(40):
+            Train.objects.create(
+                train_number=f'KM-{number:03d}', train_name=f'Line {"ABC"[number % 3]} {number}',
+                rank=number % 7, current_mileage=(number % 5) * 1000,
+                last_service_date=None if number % 4 == 0 else date(2024, 1, 1) + timedelta(days=number % 6),
+            )
+
+    def walk(self, sort_by, search='', page_size=6):
+        rows, cursor = pagination.keyset_page(self.search(search), sort_by, None, page_size)
+        seen = [train.pk for train in rows]
+        while cursor:
+            rows, cursor = pagination.keyset_page(self.search(search), sort_by, cursor, page_size)
+            seen.extend(train.pk for train in rows)
+        return seen
+
+    def search(self, term):
+        trains = Train.objects.all()
+        if term:
+            end = term + '\uffff'
+            trains = trains.filter(train_name__gte=term, train_name__lt=end)
+        return trains
+
+    def test_pages_match_the_full_ordering(self):
+        for sort_by in pagination.SORT_KEYS:
+            for search in ('', 'line b'):
+                with self.subTest(sort_by=sort_by, search=search):
+                    expected = list(pagination.order_queryset(self.search(search), sort_by).values_list('pk', flat=True))
+                    self.assertEqual(self.walk(sort_by, search), expected)
+
+    def test_ranklist_search_is_case_insensitive_prefix(self):
+        rows, _ = get_ranklist_page('rank', 'km-01', '')
+        self.assertEqual(sorted(train.train_number for train in rows), [f'KM-{n:03d}' for n in range(10, 20)])
+
+    def test_malformed_cursors_give_the_first_page(self):
+        first, _ = pagination.keyset_page(Train.objects.all(), 'date', None, 5)
+        for cursor in ('WyJ4IiwxXQ', 'not base64!', pagination.encode_cursor(True, 1), pagination.encode_cursor(3, 'x')):
+            with self.subTest(cursor=cursor):
+                rows, _ = pagination.keyset_page(Train.objects.all(), 'date', cursor, 5)
+                self.assertEqual(rows, first)
+
+
+class HistoryTests(TestCase):
+    """Rebuilding the fleet from snapshots and deltas gives the live rows back."""
+
+    def live(self):
+        return {
+            train['id']: {field: history.json_value(train[field]) for field in history.HISTORY_FIELDS}
+            for train in Train.objects.values('id', *history.HISTORY_FIELDS)
+        }
+
+    def test_replay_matches_live_state_then_and_now(self):
+        trains = [
+            Train.objects.create(train_number=f'KM-{number:03d}', train_name='Test', current_mileage=number * 100)
+            for number in range(1, 6)
+        ]
+        trains[0].status = 'caution'
+        trains[0].save()
+        ranking.rank_fleet()
+
+        then = timezone.now()
+        expected_then = self.live()
+        self.assertIsNotNone(history.take_snapshot())
+
+        trains[1].current_mileage += 500
+        trains[1].last_service_date = date(2024, 3, 1)
+        trains[1].save()
+        Train.objects.get(pk=trains[2].pk).delete()
+        Train.objects.create(train_number='KM-099', train_name='Late')
+        ranking.rank_fleet()
+
+        self.assertEqual(history.replay(then)[0], expected_then)
+        self.assertEqual(history.replay(timezone.now())[0], self.live())
+
+
+class RankingTests(TestCase):
+
+    def setUp(self):
+        ranking.invalidate_rank_index()
+        self.addCleanup(ranking.invalidate_rank_index)
+        statuses = ('ok', 'ok', 'minor_maintenance', 'ok', 'cannot_schedule', 'ok', 'ok', 'minor_maintenance')
+        self.trains = [
+            Train.objects.create(
+                train_number=f'KM-{number:03d}', train_name='Test', status=status,
+                current_mileage=(number * 3779) % 40000, cleaning_status='Clean' if number % 3 else 'Pending',
+            )
+            for number, status in enumerate(statuses, start=1)
+        ]
+        JobCard.objects.create(train=self.trains[0], title='Brakes', description='', priority='critical')
+        JobCard.objects.create(train=self.trains[3], title='Doors', description='', priority='low')
+
+    def stored_ranks(self):
+        return dict(Train.objects.values_list('id', 'rank'))
+
+    def test_rank_fleet_orders_by_score(self):
+        frame = ranking.rank_fleet()
+        ranks = self.stored_ranks()
+        self.assertEqual(sorted(ranks.values()), list(range(1, len(self.trains) + 1)))
+        by_rank = sorted(ranks, key=ranks.get)
+        scores = dict(zip(frame['id'], frame['score']))
+        self.assertEqual([scores[pk] for pk in by_rank], sorted(scores.values()))
+
+    def test_incremental_reranks_match_a_full_scoring_pass(self):
+        ranking.rank_fleet()
+        edits = [
+            (0, 'current_mileage', '1'), (4, 'status', 'ok'), (2, 'cleaning_status', 'Pending'),
+            (6, 'status', 'cannot_schedule'), (1, 'current_mileage', '39000'), (0, 'status', 'minor_maintenance'),
+        ]
+        index = None
+        for position, field, value in edits:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertIsNone(save_train_field(self.trains[position].pk, field, value))
+
+            # The index built by the first edit serves the rest, with its own constants
+            if index is None:
+                index = ranking.get_rank_index()
+            self.assertIs(ranking.get_rank_index(), index)
+            frame = ranking.load_fleet_frame()
+            scores = ranking.compute_scores(frame, weights=index.weights, stats=index.stats)
+            expected = dict(zip(frame['id'], ranking.assign_ranks(frame, scores)))
+            with self.subTest(field=field, value=value):
+                self.assertEqual(self.stored_ranks(), expected)
+
+
+class MileageTests(TestCase):
+
+    def test_rollups_equal_the_daily_distances(self):
+        train = Train.objects.create(train_number='KM-001', train_name='Test')
+        rng = random.Random(22)
+        odometer, day = 10000, date(2024, 1, 25)
+        for _ in range(30):
+            # Mostly forward, sometimes a meter reset, sometimes a second reading that day
+            odometer = rng.randint(0, 500) if rng.random() < 0.1 else odometer + rng.randint(0, 400)
+            mileage.record_readings({train.pk: odometer}, day)
+            if rng.random() < 0.7:
+                day += timedelta(days=1)
+
+        readings = list(MileageReading.objects.filter(train=train).values_list('date', 'distance'))
+        self.assertTrue(all(distance >= 0 for _, distance in readings))
+        for period in ('week', 'month'):
+            expected = {}
+            for reading_day, distance in readings:
+                start = mileage.period_starts(reading_day)[period]
+                expected[start] = expected.get(start, 0) + distance
+            stored = dict(
+                MileageRollup.objects.filter(train=train, period=period, distance__gt=0).values_list('start', 'distance')
+            )
+            with self.subTest(period=period):
+                self.assertEqual(stored, {start: distance for start, distance in expected.items() if distance})
+
+    def test_same_day_reading_replaces_the_first(self):
+        train = Train.objects.create(train_number='KM-001', train_name='Test')
+        mileage.record_readings({train.pk: 1000}, date(2024, 3, 4))
+        mileage.record_readings({train.pk: 1300}, date(2024, 3, 5))
+        mileage.record_readings({train.pk: 1250}, date(2024, 3, 5))
+        self.assertEqual(
+            list(
+                MileageReading.objects.filter(train=train, date__year=2024)
+                .order_by('date').values_list('odometer', 'distance')
+            ),
+            [(1000, 0), (1250, 250)],
+        )
+        self.assertEqual(mileage.rollups(train, 'week'), [(date(2024, 3, 4), 250)])
+
+
+class CertificateHorizonTests(TestCase):
+
+    def horizons(self):
+        return dict(Train.objects.values_list('id', 'certificates_valid_until'))
+
+    def expected(self):
+        earliest = {}
+        for train_id, expiry in Certificate.objects.filter(expiry_date__isnull=False).values_list('train_id', 'expiry_date'):
+            earliest[train_id] = min(expiry, earliest.get(train_id, expiry))
+        return {pk: earliest.get(pk) for pk in Train.objects.values_list('id', flat=True)}
+
+    def test_horizon_follows_every_certificate_change(self):
+        trains = [Train.objects.create(train_number=f'KM-{n:03d}', train_name='Test') for n in range(3)]
+        rng = random.Random(23)
+        for step in range(40):
+            certificates_now = list(Certificate.objects.all())
+            action = rng.random()
+            if action < 0.5 or not certificates_now:
+                Certificate.objects.create(
+                    train=rng.choice(trains), name=f'Cert {step}',
+                    expiry_date=rng.choice([None, date(2026, 10, 1) + timedelta(days=rng.randint(0, 60))]),
+                )
+            elif action < 0.8:
+                certificate = rng.choice(certificates_now)
+                certificate.train = rng.choice(trains)
+                certificate.expiry_date = date(2026, 10, 1) + timedelta(days=rng.randint(0, 60))
+                certificate.save()
+            else:
+                rng.choice(certificates_now).delete()
+            with self.subTest(step=step):
+                self.assertEqual(self.horizons(), self.expected())
+
+    def test_lapsing_within_and_expired(self):
+        soon, later, lapsed = [Train.objects.create(train_number=f'KM-{n:03d}', train_name='Test') for n in range(3)]
+        today = date(2026, 10, 18)
+        Certificate.objects.create(train=soon, name='Fitness', expiry_date=today + timedelta(days=1))
+        Certificate.objects.create(train=later, name='Fitness', expiry_date=today + timedelta(days=10))
+        Certificate.objects.create(train=lapsed, name='Fitness', expiry_date=today - timedelta(days=1))
+
+        now = timezone.make_aware(timezone.datetime(2026, 10, 18, 12))
+        self.assertEqual(list(certificates.lapsing_within(72, now)), [soon])
+        self.assertEqual(list(certificates.expired(today)), [lapsed])
+
+
+class WorklistTests(TestCase):
+
+    def test_open_work_counters_follow_job_cards(self):
+        trains = [Train.objects.create(train_number=f'KM-{n:03d}', train_name='Test') for n in range(3)]
+        rng = random.Random(24)
+        priorities = list(worklist.PRIORITY_FIELDS)
+        for step in range(60):
+            cards = list(JobCard.objects.all())
+            action = rng.random()
+            if action < 0.45 or not cards:
+                JobCard.objects.create(
+                    train=rng.choice(trains), title=f'Card {step}', description='', priority=rng.choice(priorities),
+                )
+            elif action < 0.85:
+                card = rng.choice(cards)
+                card.status = rng.choice(['pending', 'in_progress', 'completed', 'cancelled'])
+                card.priority = rng.choice(priorities)
+                card.train = rng.choice(trains)
+                card.save()
+            else:
+                rng.choice(cards).delete()
+
+            for train in Train.objects.all():
+                open_cards = JobCard.objects.filter(train=train, status__in=worklist.OPEN_JOB_STATUSES)
+                with self.subTest(step=step, train=train.train_number):
+                    for priority, field in worklist.PRIORITY_FIELDS.items():
+                        self.assertEqual(getattr(train, field), open_cards.filter(priority=priority).count())
+                    oldest = open_cards.order_by('created_at').values_list('created_at', flat=True).first()
+                    self.assertEqual(train.oldest_open_job_at, oldest)
+
+        backlog = worklist.backlog()
+        self.assertEqual(
+            [row['train_number'] for row in backlog],
+            list(
+                Train.objects.filter(oldest_open_job_at__isnull=False)
+                .order_by('-open_jobs_critical', 'oldest_open_job_at', 'id').values_list('train_number', flat=True)
+            ),
+        )
+
+        open_cards = JobCard.objects.filter(status__in=worklist.OPEN_JOB_STATUSES)
+        self.assertEqual(
+            [card.pk for card in worklist.queue(limit=None)],
+            [card.pk for card in sorted(open_cards, key=lambda card: (priorities.index(card.priority), card.created_at, card.pk))],
+        )
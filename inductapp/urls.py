@@ -17,4 +17,15 @@ urlpatterns = [
     path('api/chat/', views.api_chat, name='api_chat'),
     path('api/extract_certificate/', views.api_extract_certificate, name='api_extract_certificate'),
     path('api/report/', views.api_generate_report, name='api_report'),
+    path('api/what-if/', views.api_what_if, name='api_what_if'),
+    path('api/induction-plan/', views.api_induction_plan, name='api_induction_plan'),
+    path('api/yard-plan/', views.api_yard_plan, name='api_yard_plan'),
+    path('api/fleet/stream/', views.api_fleet_stream, name='api_fleet_stream'),
+    path('api/history/roster/', views.api_roster_history, name='api_roster_history'),
+    path('api/mileage/', views.api_mileage, name='api_mileage'),
+    path('api/certificates/horizon/', views.api_certificate_horizon, name='api_certificate_horizon'),
+    path('api/worklist/', views.api_worklist, name='api_worklist'),
+    path('api/rank-fleet/', views.api_rank_fleet, name='api_rank_fleet'),
+    path('api/fault-sweep/', views.api_fault_sweep, name='api_fault_sweep'),
+    path('api/jobs/<int:job_id>/', views.api_job_status, name='api_job_status'),
 ]
\ No newline at end of file
@@ -1,108 +1,34 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.views.decorators.http import condition, require_http_methods
 from django.conf import settings
-from .models import Train, Certificate, JobCard, UserProfile, ROLE_CHOICES
+from django.db import transaction
+from django.db.models import Case, IntegerField, Prefetch, Q, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Train, Certificate, JobCard, Job, UserProfile, ROLE_CHOICES, STATUS_CHOICES
+from . import (
+    certificates, events, fleetcache, freshness, history, importer, induction, intents, jobs, mileage, ocr,
+    ranking, reports, search, simulation, worklist, yard,
+)
+from .concurrency import async_condition, async_csrf_exempt, load_session, run_in_executor
+from .pagination import keyset_page
+from .storage import blob_storage, content_hash_of
 import json
 import csv
 import io
 import pandas as pd
-from datetime import datetime, date
+from datetime import datetime, date, time
 import os
 
 
-# Mock data for demonstration
-MOCK_TRAINS = [
-    {
-        'id': 1,
-        'train_number': 'KM-001',
-        'train_name': 'Aluva Express',
-        'status': 'ok',
-        'rank': 1,
-        'current_mileage': 45320,
-        'status_notes': 'All systems operational',
-        'current_stabling_bay': 'Bay-A1',
-        'cleaning_status': 'Clean',
-        'last_service_date': '2024-01-15',
-    },
-    {
-        'id': 2,
-        'train_number': 'KM-002', 
-        'train_name': 'Kochi Central',
-        'status': 'minor_maintenance',
-        'rank': 2,
-        'current_mileage': 38750,
-        'status_notes': 'Minor brake pad replacement needed',
-        'current_stabling_bay': 'Bay-B2',
-        'cleaning_status': 'Needs cleaning',
-        'last_service_date': '2024-01-10',
-    },
-    {
-        'id': 3,
-        'train_number': 'KM-003',
-        'train_name': 'Ernakulam South',
-        'status': 'cannot_schedule',
-        'rank': 5,
-        'current_mileage': 52100,
-        'status_notes': 'Critical electrical system fault - requires immediate attention',
-        'current_stabling_bay': 'Maintenance Bay',
-        'cleaning_status': 'Clean',
-        'last_service_date': '2024-01-05',
-    },
-    {
-        'id': 4,
-        'train_number': 'KM-004',
-        'train_name': 'Marine Drive',
-        'status': 'ok',
-        'rank': 3,
-        'current_mileage': 41200,
-        'status_notes': 'Recently serviced, all systems green',
-        'current_stabling_bay': 'Bay-A2',
-        'cleaning_status': 'Clean',
-        'last_service_date': '2024-01-20',
-    },
-    {
-        'id': 5,
-        'train_number': 'KM-005',
-        'train_name': 'Kaloor Specialist',
-        'status': 'minor_maintenance',
-        'rank': 4,
-        'current_mileage': 33900,
-        'status_notes': 'Scheduled maintenance due next week',
-        'current_stabling_bay': 'Bay-B1',
-        'cleaning_status': 'Needs deep cleaning',
-        'last_service_date': '2024-01-12',
-    },
-     {
-        'id': 6,
-        'train_number': 'KM-006',
-        'train_name': 'Aluva Express',
-        'status': 'ok',
-        'rank': 1,
-        'current_mileage': 45320,
-        'status_notes': 'All systems operational',
-        'current_stabling_bay': 'Bay-A1',
-        'cleaning_status': 'Clean',
-        'last_service_date': '2024-01-15',
-    },
-]
-
-
-def get_mock_train(train_id):
-    """Get mock train data by ID."""
-    for train in MOCK_TRAINS:
-        if train['id'] == int(train_id):
-            return train
-    return None
-
-
-
 def login_view(request):
     """Handle user login with role assignment."""
     if request.method == 'POST':
@@ -150,6 +76,33 @@ def logout_view(request):
     return redirect('login')
 
 
+RANKLIST_PAGE_SIZE = 24
+
+RANKLIST_FIELDS = (
+    'id', 'train_number', 'train_name', 'status', 'rank', 'current_mileage',
+    'status_notes', 'current_stabling_bay', 'cleaning_status', 'last_service_date',
+    'certificates_valid_until',
+)
+
+
+def get_ranklist_page(sort_by, search_query, cursor):
+    """Return (trains, next_cursor) for one ranklist page."""
+    trains = Train.objects.only(*RANKLIST_FIELDS)
+
+    # Apply search filter (case-insensitive prefix match on number or name,
+    # as a range over the NOCASE columns so each side is an index seek)
+    if search_query:
+        end = search_query + '\uffff'
+        trains = trains.filter(
+            Q(train_number__gte=search_query, train_number__lt=end)
+            | Q(train_name__gte=search_query, train_name__lt=end)
+        )
+
+    # Apply sorting and keyset pagination
+    return keyset_page(trains, sort_by, cursor, page_size=RANKLIST_PAGE_SIZE)
+
+
+@condition(etag_func=freshness.ranklist_etag, last_modified_func=freshness.last_modified)
 def ranklist_view(request):
     """Display ranked list of trains with search and filtering."""
     if not request.session.get('is_authenticated', False):
@@ -158,25 +111,35 @@ def ranklist_view(request):
     # Get sorting parameter
     sort_by = request.GET.get('sort', 'rank')
     search_query = request.GET.get('search', '').strip()
-    
-    trains = MOCK_TRAINS.copy()
-    
-    # Apply search filter
-    if search_query:
-        trains = [t for t in trains if 
-                 search_query.lower() in t['train_number'].lower() or 
-                 search_query.lower() in t['train_name'].lower()]
-    
-    # Apply sorting
-    if sort_by == 'mileage':
-        trains.sort(key=lambda x: x['current_mileage'], reverse=True)
-    elif sort_by == 'date':
-        trains.sort(key=lambda x: x['last_service_date'], reverse=True)
-    else:  # Default to rank
-        trains.sort(key=lambda x: x['rank'])
-    
+    cursor = request.GET.get('after', '')
+
+    # Pages are cached per fleet version, so any data change invalidates them,
+    # and per day, since the certificate badges depend on the date
+    today, certificates_cutoff = certificates.window()
+    version = f'{fleetcache.fleet_version()}:{today.isoformat()}'
+    page_key = (version, sort_by, search_query, cursor)
+
+    rows_html = fleetcache.get_ranklist('html', *page_key)
+    if rows_html is None:
+        page = fleetcache.get_ranklist('rows', *page_key)
+        if page is None:
+            page = get_ranklist_page(sort_by, search_query, cursor)
+            fleetcache.set_ranklist('rows', *page_key, page)
+
+        trains, next_cursor = page
+        rows_html = render_to_string('inductapp/ranklist_rows.html', {
+            'trains': trains,
+            'current_sort': sort_by,
+            'search_query': search_query,
+            'next_cursor': next_cursor,
+            'is_first_page': not cursor,
+            'today': today,
+            'certificates_cutoff': certificates_cutoff,
+        })
+        fleetcache.set_ranklist('html', *page_key, str(rows_html))
+
     context = {
-        'trains': trains,
+        'rows_html': mark_safe(rows_html),
         'current_sort': sort_by,
         'search_query': search_query,
         'user_role': request.session.get('user_role', 'staff1'),
@@ -187,54 +150,52 @@ def ranklist_view(request):
 
 
 
+@condition(etag_func=freshness.train_detail_etag, last_modified_func=freshness.last_modified)
 def train_detail_view(request, train_id):
     """Display detailed train information with role-based editing."""
     if not request.session.get('is_authenticated'):
         return redirect('login')
         
-    train = get_mock_train(train_id)
-    if not train:
+    # The train, its certificates and latest job cards, cached per fleet version
+    # and per day, since whether a certificate has expired depends on the date
+    version = f'{fleetcache.fleet_version()}:{timezone.localdate().isoformat()}'
+    detail = fleetcache.get_train_detail(version, train_id)
+    if detail is None:
+        detail = get_train_detail(train_id)
+        fleetcache.set_train_detail(version, train_id, detail)
+    if not detail:
         messages.error(request, 'Train not found')
         return redirect('ranklist')
-    
+
     user_role = request.session.get('user_role', 'staff1')
     
     # Handle form submission for updates
     if request.method == 'POST':
-        # Mock update - in production, save to database
         field_name = request.POST.get('field_name')
         field_value = request.POST.get('field_value')
         
-        # Check permissions
-        can_edit = can_user_edit_field(user_role, field_name)
-        
-        if can_edit:
-            # Update mock data
-            if field_name in train:
-                train[field_name] = field_value
-                messages.success(request, f'Updated {field_name} successfully')
-            else:
-                messages.error(request, 'Invalid field')
+        # Check permissions, then update the database row (re-ranking if needed)
+        if not can_user_edit_field(user_role, field_name):
+            error, status = 'You do not have permission to edit this field', 403
+        elif field_name not in DETAIL_EDITABLE_FIELDS:
+            error, status = 'Invalid field', 400
         else:
-            messages.error(request, 'You do not have permission to edit this field')
-        
+            error, status = save_train_field(train_id, field_name, field_value), 400
+
+        # The page's inline editor posts with fetch and needs the outcome, not a redirect
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            if error:
+                return JsonResponse({'error': error}, status=status)
+            return JsonResponse({'success': True, 'field_name': field_name, 'field_value': field_value})
+
+        if error:
+            messages.error(request, error)
+        else:
+            messages.success(request, f'Updated {field_name} successfully')
         return redirect('train_detail', train_id=train_id)
     
-    # Mock certificates and job cards
-    mock_certificates = [
-        {'id': 1, 'name': 'Safety Certificate', 'upload_date': '2024-01-15', 'is_verified': True},
-        {'id': 2, 'name': 'Maintenance Record', 'upload_date': '2024-01-10', 'is_verified': False}
-    ]
-    
-    mock_job_cards = [
-        {'id': 1, 'title': 'Brake Inspection', 'status': 'completed', 'priority': 'medium'},
-        {'id': 2, 'title': 'Engine Check', 'status': 'pending', 'priority': 'high'}
-    ]
-    
     context = {
-        'train': train,
-        'certificates': mock_certificates,
-        'job_cards': mock_job_cards,
+        **detail,
         'user_role': user_role,
         'can_edit': get_user_permissions(user_role),
         'username': request.session.get('username', 'User')
@@ -243,6 +204,96 @@ def train_detail_view(request, train_id):
     return render(request, 'inductapp/train_detail.html', context)
 
 
+DETAIL_FIELDS = (
+    'id', 'train_number', 'train_name', 'status', 'rank', 'current_mileage', 'last_service_date',
+    'status_notes', 'current_stabling_bay', 'cleaning_status', 'maintenance_notes',
+    'certificates_valid_until', *worklist.WORKLOAD_FIELDS,
+)
+
+DETAIL_EDITABLE_FIELDS = (
+    'train_name', 'status', 'current_mileage', 'status_notes', 'current_stabling_bay',
+    'cleaning_status', 'maintenance_notes',
+)
+
+# Job cards shown on the detail page: open ones first, then the most recent
+DETAIL_JOB_CARDS = 50
+
+
+def get_train_detail(train_id):
+    """
+    Load the detail page context of one train in three queries (train,
+    certificates, job cards) however many documents it has; {} if missing.
+    """
+    open_first = Case(
+        When(status__in=worklist.OPEN_JOB_STATUSES, then=Value(0)),
+        default=Value(1), output_field=IntegerField(),
+    )
+    train = (
+        Train.objects.only(*DETAIL_FIELDS)
+        .prefetch_related(
+            Prefetch('certificates', queryset=Certificate.objects.only(
+                'train_id', 'name', 'issue_date', 'expiry_date', 'is_verified',
+            ).order_by('expiry_date', 'id')),
+            Prefetch('job_cards', queryset=JobCard.objects.only(
+                'train_id', 'title', 'status', 'priority', 'created_at',
+            ).annotate(open_first=open_first).order_by('open_first', '-created_at', '-id')[:DETAIL_JOB_CARDS],
+                to_attr='latest_job_cards'),
+        )
+        .filter(pk=train_id).first()
+    )
+    if train is None:
+        return {}
+
+    open_jobs = sum(getattr(train, field) for field in worklist.PRIORITY_FIELDS.values())
+    return {
+        'train': {field: getattr(train, field) for field in DETAIL_FIELDS},
+        'certificates': [
+            {
+                'id': certificate.id,
+                'name': certificate.name,
+                'issue_date': certificate.issue_date,
+                'expiry_date': certificate.expiry_date,
+                'is_verified': certificate.is_verified,
+                'is_expired': certificate.is_expired,
+            }
+            for certificate in train.certificates.all()
+        ],
+        'job_cards': [
+            {
+                'id': card.id,
+                'title': card.title,
+                'status': card.status,
+                'priority': card.priority,
+                'created_at': card.created_at,
+            }
+            for card in train.latest_job_cards
+        ],
+        'open_job_count': open_jobs,
+    }
+
+
+def save_train_field(train_id, field_name, field_value):
+    """Persist a single field edit and re-rank the train if the field affects ranking."""
+    db_train = Train.objects.filter(pk=train_id).first()
+    if db_train is None:
+        return None
+
+    if field_name == 'current_mileage':
+        try:
+            field_value = int(field_value)
+        except (TypeError, ValueError):
+            return 'Mileage must be a whole number'
+    elif field_name == 'status' and field_value not in dict(STATUS_CHOICES):
+        return 'Invalid status'
+
+    setattr(db_train, field_name, field_value)
+    with transaction.atomic():
+        db_train.save(update_fields=[field_name, 'updated_at'])
+        if field_name in ranking.RANKED_FIELDS:
+            ranking.rerank_train(db_train)
+    return None
+
+
 def can_user_edit_field(role, field_name):
     """Check if user role can edit specific field."""
     role_permissions = {
@@ -288,32 +339,45 @@ def upload_view(request):
     if request.method == 'POST' and request.FILES.get('file'):
         uploaded_file = request.FILES['file']
         
-        try:
-            # Read file based on extension
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(uploaded_file)
-            else:
-                messages.error(request, 'Please upload a CSV or Excel file')
-                return render(request, 'inductapp/upload.html', context)
-            
-            # Convert to list of dicts for template
-            preview_data = df.to_dict('records')[:10]  # Show first 10 rows
-            column_names = list(df.columns)
-            
+        if not uploaded_file.name.lower().endswith(('.csv', '.xlsx', '.xls')):
+            messages.error(request, 'Please upload a CSV or Excel file')
+            return render(request, 'inductapp/upload.html', context)
+
+        # Parsing runs on the job worker; the page polls for progress
+        job = jobs.enqueue(
+            'stage_upload', path=importer.save_raw_upload(uploaded_file), file_name=uploaded_file.name,
+        )
+        request.session['upload_job_id'] = job.pk
+        context.update({'job_id': job.pk, 'file_name': uploaded_file.name})
+
+    elif request.GET.get('job') and request.GET['job'] == str(request.session.get('upload_job_id')):
+        job = Job.objects.filter(pk=request.session['upload_job_id'], kind='stage_upload').first()
+        if job is None or not job.is_finished:
+            context.update({'job_id': request.session['upload_job_id']})
+        elif job.status == 'failed':
+            messages.error(request, f'Error reading file: {job.error.splitlines()[0]}')
+        else:
+            summary = job.result
             context.update({
-                'preview_data': preview_data,
-                'column_names': column_names,
-                'total_rows': len(df),
-                'file_name': uploaded_file.name
+                'preview_data': summary['preview'],
+                'column_names': summary['columns'],
+                'total_rows': summary['total_rows'],
+                'valid_rows': summary['valid_rows'],
+                'rejected_rows': summary['rejected_rows'],
+                'row_errors': summary['errors'],
+                'file_name': summary['file_name'],
             })
-            
-            # Store data in session for import
-            request.session['upload_data'] = df.to_dict('records')
-            
-        except Exception as e:
-            messages.error(request, f'Error reading file: {str(e)}')
+
+            # Drop any earlier staged upload that was never imported
+            previous = request.session.get('upload_token')
+            if previous and previous != summary['token']:
+                importer.discard_staged(previous)
+
+            # Only the staging token and counts go into the session
+            request.session['upload_token'] = summary['token']
+            request.session['upload_summary'] = {
+                key: summary[key] for key in ('file_name', 'total_rows', 'valid_rows', 'rejected_rows')
+            }
     
     return render(request, 'inductapp/upload.html', context)
 
@@ -321,44 +385,66 @@ def upload_view(request):
 
 # API Endpoints
 
-@csrf_exempt
-def api_import_data(request):
+@async_csrf_exempt
+async def api_import_data(request):
     """Import uploaded CSV/Excel data to database."""
     if request.method == 'POST':
-        upload_data = request.session.get('upload_data', [])
+        session = await load_session(request)
+        token = session.get('upload_token')
+        summary = session.get('upload_summary', {})
         
-        if not upload_data:
+        if not token or not summary.get('valid_rows'):
             return JsonResponse({'error': 'No data to import'}, status=400)
         
-        # Mock import process - replace with actual DB operations
-        imported_count = len(upload_data)
+        # The upsert and re-rank run on the job worker
+        job = await jobs.aenqueue('import_trains', token=token, **summary)
         
-        # Clear session data
-        request.session.pop('upload_data', None)
+        # The staged file now belongs to the job
+        session.pop('upload_token', None)
+        session.pop('upload_summary', None)
         
         return JsonResponse({
             'success': True,
-            'message': f'Successfully imported {imported_count} records',
-            'imported_count': imported_count
-        })
+            'message': f'Importing {summary["valid_rows"]} records',
+            'job_id': job.pk,
+        }, status=202)
     
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 
-@csrf_exempt  
-def api_chat(request):
+@async_csrf_exempt
+async def api_chat(request):
     """Handle chatbot conversations."""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
             user_message = data.get('message', '').strip()
             
-            # Mock AI responses - replace with actual AI integration
+            # Fleet queries ("top 5 by mileage") come back as a table
+            result = await run_in_executor(intents.answer, user_message) if user_message else None
+            if result:
+                return JsonResponse({
+                    'success': True,
+                    **result,
+                    'timestamp': datetime.now().isoformat()
+                })
+            
+            # Other questions about the fleet are answered from the search index
+            answer = await run_in_executor(search.answer, user_message) if user_message else None
+            if answer:
+                return JsonResponse({
+                    'success': True,
+                    'response': answer['response'],
+                    'results': answer['results'],
+                    'timestamp': datetime.now().isoformat()
+                })
+            
+            # Small talk and questions the index has nothing for
             mock_responses = {
                 'hello': 'Hello! I\'m the Kochi Metro AI assistant. How can I help you today?',
                 'trains': 'I can help you with train information, maintenance schedules, and operational queries.',
                 'status': 'You can check train status on the ranklist page. Red means critical issues, orange is minor maintenance, and green is ready for service.',
-                'help': 'I can assist with: train status, maintenance queries, certificate verification, and general metro operations questions.',
+                'help': 'Ask me about the fleet, e.g. "which trains have brake issues" or "HVAC faults". I search train notes, job cards and certificates.',
                 'default': 'I understand you\'re asking about metro operations. Could you be more specific about what information you need?'
             }
             
@@ -381,85 +467,390 @@ def api_chat(request):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 
-@csrf_exempt
-def api_extract_certificate(request):
+@async_csrf_exempt
+async def api_extract_certificate(request):
     """Extract data from uploaded certificates using AI OCR."""
-    if request.method == 'POST' and request.FILES.get('certificate'):
-        uploaded_file = request.FILES['certificate']
+    # Parsing the multipart body spools the upload to disk
+    uploaded_file = None
+    if request.method == 'POST':
+        try:
+            ocr.engine_class()
+        except ocr.OCRUnavailable as e:
+            return JsonResponse({'error': f'Certificate extraction is unavailable: {e}'}, status=503)
+        uploaded_file = await run_in_executor(lambda: request.FILES.get('certificate'))
+
+    if uploaded_file:
+        # Stored once under its content hash; the hash doubles as the OCR cache key
+        file_name = await run_in_executor(blob_storage().save, f'temp/{uploaded_file.name}', uploaded_file)
         
-        # Save file temporarily
-        file_name = default_storage.save(f'temp/{uploaded_file.name}', ContentFile(uploaded_file.read()))
+        # Identical bytes were already extracted: answer from the cache
+        extraction = await ocr.alookup(content_hash_of(file_name))
+        if extraction:
+            return JsonResponse({'success': True, **ocr.to_response(extraction, cached=True)})
         
-        # Mock AI extraction - replace with actual OCR/ML integration
-        mock_extracted_data = {
-            'certificate_type': 'Safety Compliance Certificate',
-            'issued_to': 'Kochi Metro Rail Corporation',
-            'issue_date': '2024-01-15',
-            'expiry_date': '2025-01-15',
-            'certificate_number': 'KM-SAFETY-2024-001',
-            'issuing_authority': 'Railway Safety Commissioner',
-            'train_number': 'KM-001',
-            'compliance_status': 'VALID',
-            'extracted_fields': {
-                'safety_rating': 'A+',
-                'last_inspection': '2024-01-10',
-                'next_inspection': '2024-07-10'
-            }
-        }
+        # Extraction runs on the job worker; the page polls for the result
+        job = await jobs.aenqueue('extract_certificate', file_path=file_name)
         
         return JsonResponse({
             'success': True,
-            'extracted_data': mock_extracted_data,
+            'job_id': job.pk,
             'file_path': file_name,
-            'confidence_score': 0.95
-        })
+        }, status=202)
     
     return JsonResponse({'error': 'No file uploaded'}, status=400)
 
 
 
-# inductapp/views.py
+@async_csrf_exempt
+async def api_rank_fleet(request):
+    """Queue a re-rank of the whole fleet; poll /api/jobs/<id>/ for the result."""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    session = await load_session(request)
+    if not session.get('is_authenticated'):
+        return JsonResponse({'error': 'Login required'}, status=403)
 
-from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, JsonResponse
-from .models import Train # Make sure Train is imported
-import csv
-import io
-from datetime import datetime
+    job = await jobs.aenqueue('rank_fleet')
+    return JsonResponse({'success': True, 'message': 'Ranking fleet', 'job_id': job.pk}, status=202)
+
+
+@async_csrf_exempt
+async def api_fault_sweep(request):
+    """
+    Queue a contingency sweep; poll /api/jobs/<id>/ for the result.
+
+    POST JSON: {"size": 2, "required": 18, "top": 10}, all optional (see sweep.py).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+
+    try:
+        data = json.loads(request.body or '{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    options = {key: data[key] for key in ('size', 'required', 'top') if data.get(key) is not None}
+    if not all(isinstance(value, int) and not isinstance(value, bool) and value > 0 for value in options.values()):
+        return JsonResponse({'error': 'size, required and top must be positive integers'}, status=400)
+
+    job = await jobs.aenqueue('fault_sweep', **options)
+    return JsonResponse({'success': True, 'message': 'Evaluating scenarios', 'job_id': job.pk}, status=202)
+
+
+def api_job_status(request, job_id):
+    """Report the progress and result of a background job."""
+    job = Job.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+
+    return JsonResponse({
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'result': job.result if job.status == 'succeeded' else None,
+        'error': job.error.splitlines()[0] if job.error else '',
+    })
+
+
+@csrf_exempt
+def api_what_if(request):
+    """
+    Simulate train faults and return the re-ranked roster.
+
+    POST JSON: {"faults": [{"train": "KM-003", "status": "cannot_schedule"}, ...],
+    "refresh": false}. Nothing is saved.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+
+    try:
+        data = json.loads(request.body or '{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    faults = data.get('faults', [])
+    if not isinstance(faults, list):
+        return JsonResponse({'error': 'faults must be a list'}, status=400)
+
+    snapshot = simulation.get_snapshot(refresh=bool(data.get('refresh')))
+    try:
+        result = simulation.simulate(snapshot, faults)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({'success': True, **result})
+
+
+@csrf_exempt
+def api_induction_plan(request):
+    """
+    Solve or fetch the service / standby / IBL plan for a night.
+
+    GET ?date=YYYY-MM-DD returns the stored plan. POST JSON {"date", "required",
+    "standby", "ibl_bays", "maintenance_slots", "time_budget"} solves and saves it.
+    """
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body or '{}')
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    else:
+        data = request.GET
+
+    try:
+        service_date = date.fromisoformat(data['date']) if data.get('date') else None
+        options = {
+            name: int(data[name]) for name in ('required', 'standby', 'ibl_bays', 'maintenance_slots')
+            if data.get(name) not in (None, '')
+        }
+        if data.get('time_budget'):
+            options['time_budget'] = min(float(data['time_budget']), 30.0)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Invalid date or capacity'}, status=400)
 
+    if request.method != 'POST':
+        plan = induction.stored_plan(service_date or induction.next_service_date())
+        if plan is None:
+            return JsonResponse({'error': 'No plan for that date'}, status=404)
+        return JsonResponse({'success': True, **plan})
 
+    return JsonResponse({'success': True, **induction.plan_induction(service_date, **options)})
 
 
 @csrf_exempt
-def api_generate_report(request):
-    """Generate and download reports from the database."""
+def api_yard_plan(request):
+    """
+    Compute depot bay assignments and the morning exit sequence.
+
+    GET ?date=YYYY-MM-DD plans the stored induction plan for that night.
+    POST JSON {"order": [train numbers, first out first], "ibl": [...]}
+    plans an explicit order against the trains' current bays.
+    """
+    try:
+        yard_model = yard.get_yard()
+    except (OSError, ValueError, KeyError) as e:
+        return JsonResponse({'error': f'Depot yard config is unusable: {e}'}, status=500)
+
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body or '{}')
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        order, ibl = data.get('order', []), data.get('ibl', [])
+        if not isinstance(order, list) or not isinstance(ibl, list):
+            return JsonResponse({'error': 'order and ibl must be lists'}, status=400)
+
+        current = dict(Train.objects.exclude(current_stabling_bay='').values_list('train_number', 'current_stabling_bay'))
+        return JsonResponse({'success': True, **yard.plan_yard(yard_model, current, order, ibl)})
+
+    try:
+        service_date = date.fromisoformat(request.GET['date']) if request.GET.get('date') else induction.next_service_date()
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be in YYYY-MM-DD format'}, status=400)
+
+    result = yard.plan_for_induction(service_date, yard_model)
+    if result is None:
+        return JsonResponse({'error': 'No induction plan for that date'}, status=404)
+    return JsonResponse({'success': True, **result})
+
+
+def api_roster_history(request):
+    """
+    Rebuild the fleet and its ranks as they were at a moment.
+
+    GET ?at=<ISO datetime> (or a date, meaning the end of that day, local
+    time); the latest state if omitted. Add &train=<number> for one train.
+    """
+    at = request.GET.get('at')
+    when = parse_datetime(at) if at else timezone.now()
+    if at and when is None:
+        try:
+            when = datetime.combine(date.fromisoformat(at), time.max)
+        except ValueError:
+            return JsonResponse({'error': 'at must be an ISO date or datetime'}, status=400)
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+
+    try:
+        result = history.roster_at(when)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=404)
+
+    number = request.GET.get('train')
+    if number:
+        result['trains'] = [train for train in result['trains'] if train.get('train_number') == number]
+    return JsonResponse({'success': True, **result})
+
+
+def api_mileage(request):
+    """
+    Mileage wear for every train: km since last service, recent daily
+    average and projected date of the next mileage-based service.
+
+    GET ?train=<number>&period=week|month adds that train's rollups.
+    """
+    wear = mileage.fleet_wear()
+    trains = Train.objects.order_by('rank', 'train_number').values_list('pk', 'train_number', 'current_mileage')
+    rows = [
+        {
+            'train_number': number,
+            'current_mileage': current,
+            'km_since_service': _round_or_none(wear.at[pk, 'km_since_service']),
+            'daily_km': _round_or_none(wear.at[pk, 'daily_km'], 1),
+            'threshold_date': None if pd.isna(wear.at[pk, 'threshold_date']) else wear.at[pk, 'threshold_date'].date().isoformat(),
+        }
+        for pk, number, current in trains if pk in wear.index
+    ]
+    result = {'success': True, 'service_interval_km': mileage.service_interval(), 'trains': rows}
+
+    number = request.GET.get('train')
+    if number:
+        period = request.GET.get('period', 'week')
+        if period not in ('week', 'month'):
+            return JsonResponse({'error': 'period must be week or month'}, status=400)
+        train = get_object_or_404(Train, train_number=number)
+        result['rollups'] = [
+            {'start': start.isoformat(), 'distance': distance}
+            for start, distance in mileage.rollups(train, period)
+        ]
+    return JsonResponse(result)
+
+
+def api_certificate_horizon(request):
+    """
+    Trains that become unschedulable through certificate expiry.
+
+    GET ?hours=72: trains whose earliest certificate lapses within that
+    many hours, plus the trains already out on an expired certificate.
+    """
+    try:
+        hours = int(request.GET.get('hours', certificates.DEFAULT_WINDOW_HOURS))
+    except ValueError:
+        return JsonResponse({'error': 'hours must be a whole number'}, status=400)
+    if not 0 < hours <= 24 * 366:
+        return JsonResponse({'error': 'hours must be between 1 and 8784'}, status=400)
+
+    fields = ('train_number', 'train_name', 'status', 'rank', 'certificates_valid_until')
+
+    def rows(trains):
+        return [
+            {**row, 'certificates_valid_until': row['certificates_valid_until'].isoformat()}
+            for row in trains.values(*fields)
+        ]
+
+    return JsonResponse({
+        'success': True,
+        'hours': hours,
+        'lapsing': rows(certificates.lapsing_within(hours)),
+        'expired': rows(certificates.expired()),
+    })
+
+
+def api_worklist(request):
+    """
+    The depot worklist: open job cards fleet-wide, most urgent first, and
+    the trains carrying open work.
+
+    GET ?priority=critical (repeatable) narrows the cards; ?limit=<n> caps them.
+    """
+    priorities = request.GET.getlist('priority')
+    unknown = set(priorities) - set(worklist.PRIORITY_FIELDS)
+    if unknown:
+        return JsonResponse({'error': f'Unknown priority: {", ".join(sorted(unknown))}'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 100)), 1), 1000)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a whole number'}, status=400)
+
+    cards = [
+        {
+            'id': card.id,
+            'train_number': card.train.train_number,
+            'title': card.title,
+            'priority': card.priority,
+            'status': card.status,
+            'created_at': card.created_at.isoformat(),
+        }
+        for card in worklist.queue(priorities, limit)
+    ]
+    return JsonResponse({'success': True, 'cards': cards, 'trains': worklist.backlog()})
+
+
+def _round_or_none(value, digits=0):
+    if pd.isna(value):
+        return None
+    return round(float(value), digits) if digits else int(round(value))
+
+
+def api_fleet_stream(request):
+    """
+    Stream live train deltas as Server-Sent Events.
+
+    Resumes after the Last-Event-ID header (sent by EventSource on
+    reconnect) or ?since=<event id>; otherwise starts from now.
+    """
+    if not request.session.get('is_authenticated'):
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    after = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    try:
+        after = int(after) if after else events.latest_id()
+    except ValueError:
+        return JsonResponse({'error': 'Invalid event id'}, status=400)
+
+    # ASGI servers need an async iterator; WSGI servers a blocking one
+    content = events.astream(after) if isinstance(request, ASGIRequest) else events.stream(after)
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@async_csrf_exempt
+@async_condition(etag_func=freshness.report_etag, last_modified_func=freshness.last_modified)
+async def api_generate_report(request):
+    """
+    Generate and download reports from the database.
+
+    Query parameters: format (csv, xlsx, parquet, ndjson), columns
+    (comma-separated) and updated_from/updated_to (YYYY-MM-DD), which keep
+    trains whose latest update falls in that range.
+    """
     
     # This view now accepts GET requests
     if request.method == 'GET':
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in reports.FORMATS:
+            return JsonResponse({'error': f'Unsupported format "{export_format}"'}, status=400)
+
         try:
-            # Get data from the DATABASE, not mock data
-            trains = Train.objects.all().values(
-                'rank', 'train_number', 'train_name', 'status', 
-                'current_mileage', 'cleaning_status', 
-                'current_stabling_bay', 'status_notes'
+            columns = reports.parse_columns(request.GET.get('columns'))
+            trains = reports.filter_updated_between(
+                Train.objects.all(), request.GET.get('updated_from'), request.GET.get('updated_to')
             )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        try:
+            # Get data from the DATABASE, not mock data
+            trains = trains.values(*columns)
             
-            if not trains:
+            if not await trains.aexists():
                 return JsonResponse({'error': 'No train data to report'}, status=404)
 
-            # Generate CSV in memory
-            output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=trains[0].keys())
-            writer.writeheader()
-            writer.writerows(trains)
-            
-            # Create the HttpResponse object with the correct content-type header.
-            response = HttpResponse(output.getvalue(), content_type='text/csv')
-            filename = f'metro_trains_report_{datetime.now().strftime("%Y%m%d")}.csv'
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            
-            return response
+            # Stream row by row instead of building the report in memory
+            filename = f'metro_trains_report_{datetime.now().strftime("%Y%m%d")}'
+            if isinstance(request, ASGIRequest):
+                return await reports.abuild_response(trains, columns, export_format, filename)
+
+            # WSGI iterates the response synchronously once the view returns
+            rows = trains.iterator(chunk_size=reports.CHUNK_SIZE)
+            return await run_in_executor(reports.build_response, rows, columns, export_format, filename)
 
+        except RuntimeError as e:
+            return JsonResponse({'error': str(e)}, status=501)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
@@ -0,0 +1,88 @@
+"""
+Open maintenance work per train and the fleet-wide worklist.
+
+Each train carries its open (pending or in-progress) job card counts by
+priority and when its oldest open card was raised. The JobCard signals
+recompute them inside the job card's own save or delete transaction, so
+the ranking's maintenance term and the depot worklist read the backlog
+straight off the train rows instead of aggregating job cards per train.
+"""
+from django.db.models import Case, Count, IntegerField, Min, Value, When
+from django.utils import timezone
+
+from .models import JobCard, Train
+
+
+OPEN_JOB_STATUSES = ('pending', 'in_progress')
+
+# Most urgent first; the Train field holding each priority's open count
+PRIORITY_FIELDS = {
+    'critical': 'open_jobs_critical',
+    'high': 'open_jobs_high',
+    'medium': 'open_jobs_medium',
+    'low': 'open_jobs_low',
+}
+
+WORKLOAD_FIELDS = (*PRIORITY_FIELDS.values(), 'oldest_open_job_at')
+
+
+def refresh_workloads(train_ids):
+    """Recompute the open-work fields of the given trains (one aggregate query, one update)."""
+    train_ids = {pk for pk in train_ids if pk is not None}
+    if not train_ids:
+        return
+    empty = dict.fromkeys(PRIORITY_FIELDS.values(), 0)
+    trains = {pk: Train(pk=pk, oldest_open_job_at=None, **empty) for pk in train_ids}
+
+    groups = (
+        JobCard.objects.filter(train_id__in=train_ids, status__in=OPEN_JOB_STATUSES)
+        .order_by().values_list('train_id', 'priority')
+        .annotate(n=Count('id'), oldest=Min('created_at'))
+    )
+    for train_id, priority, n, oldest in groups:
+        train = trains[train_id]
+        # Free-text priorities outside the choices count as medium
+        field = PRIORITY_FIELDS.get(priority, PRIORITY_FIELDS['medium'])
+        setattr(train, field, getattr(train, field) + n)
+        if train.oldest_open_job_at is None or oldest < train.oldest_open_job_at:
+            train.oldest_open_job_at = oldest
+
+    # bulk_update sends no Train signals: these fields are derived, not edits
+    Train.objects.bulk_update(trains.values(), WORKLOAD_FIELDS, batch_size=500)
+
+
+def backlog(limit=None):
+    """
+    Trains with open work, most critical cards first, then longest waiting.
+
+    One query over train_open_work_idx; rows are dicts with the open counts
+    and the age in days of the oldest open card.
+    """
+    now = timezone.now()
+    trains = (
+        Train.objects.filter(oldest_open_job_at__isnull=False)
+        .order_by('-open_jobs_critical', 'oldest_open_job_at', 'id')
+        .values('train_number', 'status', 'rank', *WORKLOAD_FIELDS)
+    )
+    rows = list(trains[:limit] if limit else trains)
+    for row in rows:
+        oldest = row.pop('oldest_open_job_at')
+        row['oldest_open_days'] = (now - oldest).days
+        row['open_jobs'] = {priority: row.pop(field) for priority, field in PRIORITY_FIELDS.items()}
+    return rows
+
+
+def queue(priorities=None, limit=100):
+    """Open job cards across the fleet, most urgent priority first and oldest first within it."""
+    severity = Case(
+        *[When(priority=priority, then=Value(position)) for position, priority in enumerate(PRIORITY_FIELDS)],
+        default=Value(len(PRIORITY_FIELDS)), output_field=IntegerField(),
+    )
+    cards = (
+        JobCard.objects.select_related('train')
+        .only('title', 'status', 'priority', 'created_at', 'train__train_number')
+        .filter(status__in=OPEN_JOB_STATUSES)
+    )
+    if priorities:
+        cards = cards.filter(priority__in=priorities)
+    return list(cards.annotate(severity=severity).order_by('severity', 'created_at', 'id')[:limit])
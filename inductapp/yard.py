@@ -0,0 +1,406 @@
+"""
+Depot yard model and shunting minimiser.
+
+The yard is read from a JSON config (DEPOT_YARD_CONFIG): tracks of a given
+kind ('stabling' or 'ibl'), each a dead-end siding listing its bays from
+the exit end. A train can only leave once every bay in front of it on its
+track is empty, so the config is precomputed into an index of bay ->
+(track, position), front/back adjacency and a bitmask of the bays that
+block each bay.
+
+plan_yard() takes the induction order and the trains' current bays. A
+placement is clear when every track reads in departure order from the exit
+end. Given the trains left in place, matching the others into the gaps
+between them by earliest deadline is exact, so the fewest-shunt plan is
+found by iterative deepening over which trains stay (IBL trains must be on
+an IBL track; anyone else may stay where they stand). The heuristic plan
+bounds that search: on every track keep the longest run whose departures
+never decrease, fill the gaps, and shunt one more kept train next to a gap
+while some train has no bay. The heuristic plan is used as is when the
+search would exceed EXACT_SEARCH_LIMIT candidates or the trains cannot
+all fit.
+"""
+import bisect
+import json
+import os
+from functools import lru_cache
+
+from django.conf import settings
+
+from .models import InductionPlan, Train
+
+
+NEVER = float('inf')
+
+# The exact search enumerates subsets of each track's trains and gives up
+# (keeping the heuristic plan) after this many candidate placements
+EXACT_TRACK_OCCUPANTS = 8
+EXACT_SEARCH_LIMIT = 5000
+
+TRACK_KINDS = ('stabling', 'ibl')
+
+
+class YardModel:
+    """Precomputed bay index for one depot yard config."""
+
+    def __init__(self, config):
+        self.depot = config.get('depot', '')
+        self.tracks = []
+        self.bays = []
+        self.index = {}
+        for track in config['tracks']:
+            if track.get('kind', 'stabling') not in TRACK_KINDS:
+                raise ValueError(f'Unknown track kind "{track.get("kind")}"')
+            if not track.get('bays'):
+                raise ValueError(f'Track "{track["name"]}" has no bays')
+            first = len(self.bays)
+            for position, bay in enumerate(track['bays']):
+                if bay in self.index:
+                    raise ValueError(f'Bay "{bay}" is listed twice')
+                self.index[bay] = len(self.bays)
+                self.bays.append({'name': bay, 'track': len(self.tracks), 'position': position})
+            self.tracks.append({
+                'name': track['name'],
+                'kind': track.get('kind', 'stabling'),
+                'bays': list(range(first, len(self.bays))),
+            })
+
+        self.capacity = {kind: 0 for kind in TRACK_KINDS}
+        for track in self.tracks:
+            self.capacity[track['kind']] += len(track['bays'])
+
+        # Adjacency along each siding and the bays in front of each bay
+        self.front = [None] * len(self.bays)
+        self.back = [None] * len(self.bays)
+        self.blockers = [0] * len(self.bays)
+        for track in self.tracks:
+            for ahead, behind in zip(track['bays'], track['bays'][1:]):
+                self.front[behind] = ahead
+                self.back[ahead] = behind
+                self.blockers[behind] = self.blockers[ahead] | (1 << ahead)
+
+    def __len__(self):
+        return len(self.bays)
+
+    def bay_index(self, name):
+        return self.index.get((name or '').strip())
+
+    def exit_sequence(self, placement, departure):
+        """
+        Return (sequence, blocked) for trains leaving in departure order.
+
+        placement maps train -> bay index; blocked lists the trains that
+        would need a shunt because an occupied bay was in front of them.
+        """
+        occupied = 0
+        for bay in placement.values():
+            occupied |= 1 << bay
+
+        sequence, blocked = [], []
+        leaving = sorted((t for t in placement if departure.get(t, NEVER) < NEVER), key=departure.get)
+        for train in leaving:
+            bay = placement[train]
+            if occupied & self.blockers[bay]:
+                blocked.append(train)
+            occupied &= ~(1 << bay)
+            sequence.append({'train_number': train, 'bay': self.bays[bay]['name']})
+        return sequence, blocked
+
+
+def _keep_in_place(occupants, departure):
+    # Longest subsequence (front to back) whose departures never decrease
+    tails, tail_items, parents = [], [], []
+    for position, (bay, train) in enumerate(occupants):
+        value = departure.get(train, NEVER)
+        slot = bisect.bisect_right(tails, value)
+        if slot == len(tails):
+            tails.append(value)
+            tail_items.append(position)
+        else:
+            tails[slot] = value
+            tail_items[slot] = position
+        parents.append(tail_items[slot - 1] if slot else None)
+
+    kept = set()
+    position = tail_items[-1] if tail_items else None
+    while position is not None:
+        kept.add(occupants[position][1])
+        position = parents[position]
+    return kept
+
+
+def plan_yard(yard, current, order, ibl=()):
+    """
+    Compute bay assignments and the exit sequence for an induction order.
+
+    current maps train number -> current bay name (trains outside the yard
+    may be omitted); order lists departing train numbers, first out first;
+    ibl names trains that must stand on an IBL track. Returns a
+    JSON-serialisable dict.
+    """
+    departure = {train: position for position, train in enumerate(order)}
+    ibl = set(ibl)
+    wanted_kind = {train: ('ibl' if train in ibl else 'stabling') for train in set(current) | set(order) | ibl}
+
+    arriving = [train for train in list(order) + sorted(ibl) if yard.bay_index(current.get(train)) is None]
+
+    # bay -> train standing there; a second train claiming the same bay must move
+    standing = {}
+    for train, name in sorted(current.items()):
+        bay = yard.bay_index(name)
+        if bay is None:
+            continue
+        if bay in standing:
+            arriving.append(train)
+        else:
+            standing[bay] = train
+
+    # Searching for fewer shunts is pointless if the yard is simply too small
+    # (other trains may stay on an IBL track, so only IBL demand is per kind)
+    demand = {kind: 0 for kind in TRACK_KINDS}
+    for train in set(arriving) | set(standing.values()):
+        demand[wanted_kind[train]] += 1
+    fits = demand['ibl'] <= yard.capacity['ibl'] and sum(demand.values()) <= len(yard)
+
+    placement, unplaced = _plan_greedy(yard, standing, arriving, departure, wanted_kind, demand, fits)
+    if fits:
+        fewer_than = _shunts(standing, placement) if not unplaced else len(standing) + 1
+        exact = _plan_exact(yard, standing, arriving, departure, wanted_kind, fewer_than)
+        if exact is not None:
+            placement, unplaced = exact, []
+
+    moves = []
+    for train, bay in sorted(placement.items()):
+        origin = current.get(train)
+        if yard.bay_index(origin) != bay:
+            moves.append({
+                'train_number': train,
+                'from': origin if yard.bay_index(origin) is not None else None,
+                'to': yard.bays[bay]['name'],
+            })
+
+    sequence, blocked = yard.exit_sequence(placement, departure)
+    return {
+        'depot': yard.depot,
+        'assignments': {train: yard.bays[bay]['name'] for train, bay in sorted(placement.items())},
+        'exit_sequence': sequence,
+        'moves': moves,
+        'shunting_moves': sum(1 for move in moves if move['from']),
+        'arrivals': sum(1 for move in moves if not move['from']),
+        'blocked_departures': blocked,
+        'unplaced': sorted(unplaced),
+    }
+
+
+def _shunts(standing, placement):
+    return sum(1 for bay, train in standing.items() if placement.get(train) != bay)
+
+
+def _plan_greedy(yard, standing, arriving, departure, wanted_kind, demand, fits):
+    """
+    Heuristic placement: keep the longest consistent run of each track, fill
+    the gaps, and shunt one more kept train while some train has no bay.
+
+    Returns (placement, unplaced).
+    """
+    # Other trains may stay on an IBL track while the IBL trains leave it bays to spare
+    spare = yard.capacity['ibl'] - demand['ibl']
+    placement, to_place = {}, list(arriving)
+    for track in yard.tracks:
+        occupants = [(bay, standing[bay]) for bay in track['bays'] if bay in standing]
+        eligible = []
+        for bay, train in occupants:
+            if wanted_kind[train] != track['kind']:
+                if track['kind'] != 'ibl' or spare <= 0:
+                    continue
+                spare -= 1
+            eligible.append((bay, train))
+        kept = _keep_in_place(eligible, departure)
+        for bay, train in occupants:
+            if train in kept:
+                placement[train] = bay
+            else:
+                to_place.append(train)
+
+    # When the kept trains leave no consistent room, shunt one more and retry
+    while True:
+        placed, unplaced, evict = _fill_gaps(yard, placement, to_place, departure, wanted_kind)
+        if not unplaced or evict is None or not fits:
+            break
+        del placement[evict]
+        to_place.append(evict)
+    placement.update(placed)
+    return placement, unplaced
+
+
+def _plan_exact(yard, standing, arriving, departure, wanted_kind, fewer_than):
+    """
+    Placement with the fewest shunts, if it needs fewer than fewer_than.
+
+    Iterative deepening over the set of trains left in place: for each
+    shunt count from a per-track lower bound up, every consistent choice of
+    kept trains is tried and the rest are matched into the gaps (an exact
+    test, see _fill_gaps). Returns None when nothing better exists, or when
+    the yard is too large to search within EXACT_SEARCH_LIMIT attempts.
+    """
+    # Per track: shunt count -> the kept runs (front to back) that leave it consistent
+    options = []
+    for track in yard.tracks:
+        occupants = [(bay, standing[bay]) for bay in track['bays'] if bay in standing]
+        if len(occupants) > EXACT_TRACK_OCCUPANTS:
+            return None
+        # IBL trains off the IBL must move; anyone else may stay where they are
+        must_move = [
+            bit for bit, (_, train) in enumerate(occupants)
+            if wanted_kind[train] == 'ibl' and track['kind'] != 'ibl'
+        ]
+        by_shunts = {}
+        for mask in range(1 << len(occupants)):
+            if any(mask >> bit & 1 for bit in must_move):
+                continue
+            kept = [occupant for bit, occupant in enumerate(occupants) if mask >> bit & 1]
+            values = [departure.get(train, NEVER) for _, train in kept]
+            if all(a <= b for a, b in zip(values, values[1:])):
+                by_shunts.setdefault(len(occupants) - len(kept), []).append(kept)
+        options.append(by_shunts)
+
+    # floor[i]: fewest shunts tracks i.. can need
+    floor = [0] * (len(options) + 1)
+    for index in range(len(options) - 1, -1, -1):
+        floor[index] = floor[index + 1] + min(options[index])
+
+    attempts = 0
+    for shunts in range(floor[0], fewer_than):
+        for kept in _kept_runs(options, floor, 0, shunts):
+            attempts += 1
+            if attempts > EXACT_SEARCH_LIMIT:
+                return None
+            placement = {train: bay for bay, train in kept}
+            moving = list(arriving) + [train for train in standing.values() if train not in placement]
+            placed, unplaced, _ = _fill_gaps(yard, placement, moving, departure, wanted_kind)
+            if not unplaced:
+                placement.update(placed)
+                return placement
+    return None
+
+
+def _kept_runs(options, floor, index, shunts):
+    # Every combination of per-track kept runs from track index on with exactly shunts shunted
+    if index == len(options):
+        yield []
+        return
+    for count, runs in options[index].items():
+        if count + floor[index + 1] > shunts:
+            continue
+        if index + 1 == len(options) and count != shunts:
+            continue
+        for run in runs:
+            for rest in _kept_runs(options, floor, index + 1, shunts - count):
+                yield run + rest
+
+
+def _fill_gaps(yard, placement, to_place, departure, wanted_kind):
+    """
+    Place trains into the free bays around the kept ones.
+
+    Returns (placed, unplaced, evict): new placements, trains with no
+    consistent bay, and the kept train whose removal would widen the
+    tightest gap (None when no kept train can be moved).
+    """
+    # Free bays grouped into gaps between kept trains, each with a departure window
+    holders = {bay: train for train, bay in placement.items()}
+    gaps = []
+    for track in yard.tracks:
+        kept = [None] + [holders[bay] for bay in track['bays'] if bay in holders] + [None]
+        free, gap_index = [], 0
+        for bay in track['bays'] + [None]:
+            if bay is not None and bay not in holders:
+                free.append(bay)
+                continue
+            if free:
+                front, behind = kept[gap_index], kept[gap_index + 1]
+                gaps.append({
+                    'kind': track['kind'],
+                    'free': free,
+                    'front': front,
+                    'behind': behind,
+                    'low': _departs(front, departure, -1),
+                    'high': _departs(behind, departure, NEVER),
+                    # Windows if the train in front / behind were shunted away
+                    'wider_low': _departs(kept[gap_index - 1] if gap_index else None, departure, -1),
+                    'wider_high': _departs(kept[gap_index + 2] if behind else None, departure, NEVER),
+                })
+            free, gap_index = [], gap_index + 1
+
+    # Earliest-deadline matching: first departures first, into the tightest gap
+    placed, unplaced = {}, []
+    for train in sorted(set(to_place), key=lambda t: (departure.get(t, NEVER), t)):
+        value = departure.get(train, NEVER)
+        fits = [
+            gap for gap in gaps
+            if gap['free'] and gap['kind'] == wanted_kind[train] and gap['low'] <= value <= gap['high']
+        ]
+        if not fits:
+            unplaced.append(train)
+            continue
+        gap = min(fits, key=lambda g: g['high'])
+        placed[train] = gap['free'].pop(0)
+        gap['low'] = value
+
+    # Prefer shunting a train whose removal opens a window for the first unplaced train
+    evict = None
+    if unplaced:
+        train = unplaced[0]
+        value = departure.get(train, NEVER)
+        candidates = []
+        for gap in gaps:
+            if gap['kind'] != wanted_kind[train]:
+                continue
+            if gap['front']:
+                candidates.append((not gap['wider_low'] <= value <= gap['high'], gap['front']))
+            if gap['behind']:
+                candidates.append((not gap['low'] <= value <= gap['wider_high'], gap['behind']))
+        if candidates:
+            evict = min(candidates)[1]
+    return placed, unplaced, evict
+
+
+def _departs(train, departure, default):
+    if train is None:
+        return default
+    return departure.get(train, NEVER)
+
+
+def plan_for_induction(service_date, yard=None):
+    """
+    Plan the yard for a stored induction plan.
+
+    Service trains leave first in rank order, then standby trains; IBL
+    trains must stand on the IBL. Returns None if there is no plan.
+    """
+    plan = InductionPlan.objects.filter(service_date=service_date).first()
+    if plan is None:
+        return None
+
+    trains = Train.objects.order_by('rank', 'train_number').values_list('id', 'train_number', 'current_stabling_bay')
+    roles = plan.assignments
+    order = [number for pk, number, _ in trains if roles.get(str(pk)) == 'service']
+    order += [number for pk, number, _ in trains if roles.get(str(pk)) == 'standby']
+    ibl = [number for pk, number, _ in trains if roles.get(str(pk)) == 'ibl']
+    current = {number: bay for _, number, bay in trains if bay}
+
+    result = plan_yard(yard or get_yard(), current, order, ibl)
+    result['service_date'] = service_date.isoformat()
+    return result
+
+
+@lru_cache(maxsize=4)
+def _load(path, mtime):
+    with open(path) as handle:
+        return YardModel(json.load(handle))
+
+
+def get_yard(path=None):
+    """Return the yard model for DEPOT_YARD_CONFIG, reloaded when the file changes."""
+    path = str(path or getattr(settings, 'DEPOT_YARD_CONFIG', settings.BASE_DIR / 'metro_induction' / 'depot_yard.json'))
+    return _load(path, os.path.getmtime(path))
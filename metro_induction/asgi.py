@@ -0,0 +1,17 @@
+"""
+ASGI config for metro_induction project.
+
+The API views (chat, certificate extraction, import, reports) are async
+and the live fleet stream (/api/fleet/stream/) holds one long-lived
+connection per open page, so a single ASGI process serves many concurrent
+uploads and sessions. Serve with an ASGI server, e.g.
+uvicorn metro_induction.asgi:application.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'metro_induction.settings')
+
+application = get_asgi_application()
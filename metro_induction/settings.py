@@ -99,6 +99,28 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Caches: the fleet version counter is shared by the web and job worker
+# processes; rendered ranklist pages are kept per process, LRU-evicted
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'ranklist': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ranklist',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 500},
+    },
+    'fleet': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'fleet',
+        'TIMEOUT': None,
+    },
+}
+
+# Validated upload rows are staged here between preview and import
+IMPORT_STAGING_ROOT = BASE_DIR / 'staging' / 'imports'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -109,4 +131,16 @@ LOGOUT_REDIRECT_URL = '/login/'
 
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024   # 10MB
\ No newline at end of file
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024   # 10MB
+# Background job worker (python manage.py run_jobs)
+JOB_WORKER_THREADS = 4
+JOB_POLL_INTERVAL = 1.0
+
+# Certificate OCR: engine class and page-level process pool size.
+# Tesseract needs pytesseract, Pillow and pdf2image; inductapp.ocr.StubEngine
+# returns the same sample certificate for every file (tests and demos only).
+OCR_ENGINE = 'inductapp.ocr.TesseractEngine'
+OCR_WORKERS = 4
+
+# Depot yard layout (tracks and bays) used to plan shunting
+DEPOT_YARD_CONFIG = BASE_DIR / 'metro_induction' / 'depot_yard.json'
@@ -65,6 +65,7 @@ function initializeChatbot() {
             hideTypingIndicator();
             if (data.success) {
                 addMessageToChat(data.response, 'bot');
+                if (data.table) addTableToChat(data.table);
             } else {
                 addMessageToChat('Sorry, I encountered an error. Please try again.', 'bot');
             }
@@ -87,6 +88,36 @@ function initializeChatbot() {
         chatMessages.scrollTop = chatMessages.scrollHeight;
     }
 
+    // Structured answers: {columns: [...], rows: [[...], ...]}
+    function addTableToChat(table) {
+        if (!table.rows.length) return;
+        const wrapper = document.createElement('div');
+        wrapper.className = 'message bot-message';
+        const element = document.createElement('table');
+        element.className = 'table table-sm table-striped chat-table mb-0';
+
+        const head = element.createTHead().insertRow();
+        table.columns.forEach(column => {
+            const cell = document.createElement('th');
+            cell.textContent = column;
+            head.appendChild(cell);
+        });
+        const body = element.createTBody();
+        table.rows.forEach(row => {
+            const tableRow = body.insertRow();
+            row.forEach(value => {
+                tableRow.insertCell().textContent = value === null ? '—' : value;
+            });
+        });
+
+        const content = document.createElement('div');
+        content.className = 'message-content table-responsive';
+        content.appendChild(element);
+        wrapper.appendChild(content);
+        chatMessages.appendChild(wrapper);
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    }
+
     function showTypingIndicator() {
         const typingElement = document.createElement('div');
         typingElement.className = 'message bot-message typing-indicator';
@@ -348,13 +379,49 @@ function hideLoading(element) {
     }
 }
 
+// Background jobs: poll /api/jobs/<id>/ until the job finishes
+function pollJob(jobId, onProgress, interval = 1000) {
+    return new Promise((resolve, reject) => {
+        function check() {
+            fetch(`/api/jobs/${jobId}/`)
+            .then(response => response.json())
+            .then(job => {
+                if (job.status === 'succeeded') {
+                    resolve(job);
+                } else if (job.status === 'failed' || job.error === 'Job not found') {
+                    reject(new Error(job.error || 'Job failed'));
+                } else {
+                    if (onProgress) onProgress(job);
+                    setTimeout(check, interval);
+                }
+            })
+            .catch(reject);
+        }
+        check();
+    });
+}
+
+// Live fleet deltas: handlers maps an event name (update, rank, delete, reload) to a callback
+function subscribeFleet(handlers) {
+    if (!window.EventSource) return null;
+    // The browser reconnects on its own and resends Last-Event-ID
+    const source = new EventSource('/api/fleet/stream/');
+    Object.keys(handlers).forEach(name => {
+        source.addEventListener(name, event => handlers[name](JSON.parse(event.data)));
+    });
+    window.addEventListener('beforeunload', () => source.close());
+    return source;
+}
+
 // Export functions for global access
 window.MetroApp = {
     showAlert,
     showLoading,
     hideLoading,
     getCsrfToken,
-    escapeHtml
+    escapeHtml,
+    pollJob,
+    subscribeFleet
 };
 
 // Add custom CSS for typing indicator